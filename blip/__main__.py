@@ -1,10 +1,32 @@
 import argparse
 
+def cmd_trace_vcd(argv):
+    from blip.sim.btrace import TraceReader
+    with TraceReader(argv.input) as reader:
+        reader.to_vcd(argv.output)
+
+def cmd_specs_compile(argv):
+    from blip.component import spec_registry
+    path = spec_registry.compile(argv.o)
+    print(f"Compiled {len(spec_registry.index())} spec files to {path}")
+
 parser = argparse.ArgumentParser("blip")
 subparsers = parser.add_subparsers(dest="cmd", help="Commands")
 check_parser = subparsers.add_parser("example", help="Run an example")
 check_parser.add_argument("name", nargs="*")
 check_parser.add_argument("--list", action="store_true", default=False)
+trace_vcd_parser = subparsers.add_parser("trace-vcd", help="Convert a binary trace to VCD")
+trace_vcd_parser.add_argument("input", help="Binary trace path")
+trace_vcd_parser.add_argument("output", help="VCD output path")
+trace_vcd_parser.set_defaults(func=cmd_trace_vcd)
+specs_parser = subparsers.add_parser("specs", help="Manage component specs")
+specs_subparsers = specs_parser.add_subparsers(dest="specs_cmd", required=True)
+specs_compile_parser = specs_subparsers.add_parser("compile", help="Write a precompiled spec index for fast loading")
+specs_compile_parser.add_argument("-o", metavar="path", help="Index output path, defaults to build/cache/specs.index")
+specs_compile_parser.set_defaults(func=cmd_specs_compile)
 argv = parser.parse_args()
 
-print(argv)
+if hasattr(argv, "func"):
+    argv.func(argv)
+else:
+    print(argv)
@@ -1,11 +1,17 @@
 from abc import ABC, abstractmethod
-from blip.arch.pll import Pll, PllClock
-from amaranth.sim import Simulator
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from amaranth.sim import Simulator
+    from blip.arch.pll import Pll, PllClock
 
 class Arch(ABC):
+    # PLLs created by `create_pll()`, in order
+    plls: list["Pll"]
+
     @abstractmethod
-    def create_pll(self, clki_freq: float, clkos: list[PllClock]) -> Pll:
+    def create_pll(self, clki_freq: float, clkos: list["PllClock"]) -> "Pll":
         ...
 
-    def setup_simulator(self, sim: Simulator):
+    def setup_simulator(self, sim: "Simulator"):
         pass
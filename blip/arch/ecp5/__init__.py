@@ -1,7 +1,28 @@
 from blip.arch import Arch
 from blip.arch.pll import Pll, PllClock
-from .ecp5_pll import Ecp5Pll
+from .ecp5_pll import Ecp5Pll, find_config_cached
+from .ecp5_multi_pll import Ecp5MultiPll, PllPlan, plan_plls
 
 class Ecp5Arch(Arch):
+    def __init__(self, *, pll_count: int = 4):
+        self.pll_count = pll_count
+        self.plls: list[Pll] = []
+
+    def plan_plls(self, clki_freq: float, clkos: list[PllClock], **kwargs) -> PllPlan:
+        """Partition `clkos` across the available PLLs, see `PllPlanner`"""
+
+        plan = plan_plls(clki_freq, clkos, max_plls=self.pll_count, **kwargs)
+        if not plan:
+            raise ValueError(f"Could not plan PLLs for {len(clkos)} clock outputs")
+        return plan
+
     def create_pll(self, clki_freq: float, clkos: list[PllClock]):
-        return Ecp5Pll(clki_freq, clkos)
+        # A single PLL is preferred, clocks it can't generate are planned
+        # across multiple PLLs like requests for more than three clocks
+        if len(clkos) <= 3 and find_config_cached(clki_freq, clkos):
+            pll = Ecp5Pll(clki_freq, clkos)
+        else:
+            pll = Ecp5MultiPll(clki_freq, clkos, self.plan_plls(clki_freq, clkos))
+        # Created PLLs are kept to match timing results to their clocks
+        self.plls.append(pll)
+        return pll
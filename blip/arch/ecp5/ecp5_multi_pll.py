@@ -0,0 +1,260 @@
+from amaranth import *
+from amaranth.build import Platform
+from blip.arch.pll import Pll, PllClock, PllSignature
+from .ecp5_pll import Ecp5Pll, Config, find_config_cached, find_config_op_cached, clki_hzs
+from dataclasses import dataclass
+from typing import Iterable, Optional
+import dataclasses
+import math
+
+@dataclass
+class PllGroupPlan:
+    """Configuration of a single PLL in a `PllPlan`
+
+    clko_indices: Indices of the requested clocks in output order
+    source: Index of the requested clock used as the input, `None` for `clki`
+    ref_hz: Input clock frequency
+    feedback: Feedback path passed to `Ecp5Pll`
+    config: Solved configuration
+    """
+
+    clko_indices: list[int]
+    source: Optional[int]
+    ref_hz: float
+    feedback: str
+    config: Config
+
+@dataclass
+class PllPlan:
+    groups: list[PllGroupPlan]
+    error: float
+
+def set_partitions(n: int, max_size: int, block_count: int):
+    """Generate partitions of `range(n)` into exactly `block_count` blocks"""
+
+    blocks: list[list[int]] = []
+
+    def recurse(index: int):
+        # Not enough elements left to fill the remaining blocks
+        if block_count - len(blocks) > n - index:
+            return
+        if index == n:
+            yield [list(b) for b in blocks]
+            return
+        for block in blocks:
+            if len(block) < max_size:
+                block.append(index)
+                yield from recurse(index + 1)
+                block.pop()
+        if len(blocks) < block_count:
+            blocks.append([index])
+            yield from recurse(index + 1)
+            blocks.pop()
+
+    yield from recurse(0)
+
+class PllPlanner:
+    """Partition requested clocks across multiple ECP5 PLLs
+
+    clki_freq: Input clock frequency
+    clkos: Output clock frequency/tolerance requests
+    max_plls: Number of PLLs available on the device
+    cascade: Allow feeding PLLs from the outputs of other PLLs
+    use_os3: Allow using CLKOS3 as an output with feedback through CLKOP
+    max_solves: Maximum number of distinct groups of clocks to solve after
+        a plan has been found, the search returns the best plan found so far
+        once it's exceeded
+
+    The search looks for the smallest number of PLLs that can satisfy all the
+    requested clocks and the partition with the lowest total error within
+    that. Individual PLL solutions are memoized per group of clocks and input
+    frequency, so the search only solves each distinct group once, and the
+    solutions are further shared across runs by `config_cache`.
+
+    Before searching, clocks that can't be generated directly from `clki`
+    are found by solving them alone and in pairs, since any group containing
+    a clock contains a feasible single or pair with it. Those clocks need
+    cascaded PLLs, which bounds the number of PLLs from below and rules out
+    requests without any directly generated clock. The same check skips
+    cascaded groups before solving them, see `may_solve()`. Requests without
+    any plan are only rejected once every partition has been tried.
+    """
+
+    def __init__(self, clki_freq: float, clkos: Iterable[PllClock], *,
+            max_plls: int = 4, cascade: bool = True, use_os3: bool = True, max_solves: int = 32):
+        self.clki_freq = clki_freq
+        self.clkos = list(clkos)
+        self.max_plls = max_plls
+        self.cascade = cascade
+        self.use_os3 = use_os3
+        self.max_solves = max_solves
+        self.solutions: dict[tuple[tuple[int, ...], float], Optional[PllGroupPlan]] = { }
+
+    def solve_group(self, block: tuple[int, ...], ref_hz: float, source: Optional[int]):
+        # Solutions don't depend on the source, only on its frequency
+        key = (block, ref_hz)
+        if key not in self.solutions:
+            self.solutions[key] = self._solve_group(block, ref_hz)
+        best = self.solutions[key]
+        return dataclasses.replace(best, source=source) if best else None
+
+    def _solve_group(self, block: tuple[int, ...], ref_hz: float) -> Optional[PllGroupPlan]:
+        best = None
+        if ref_hz in clki_hzs:
+            if len(block) <= 3:
+                config = find_config_cached(ref_hz, [self.clkos[i] for i in block])
+                if config:
+                    best = PllGroupPlan(list(block), None, ref_hz, "os3", config)
+
+            # Try each clock as the CLKOP feedback clock
+            if self.use_os3:
+                for op_index in block:
+                    order = [op_index] + [i for i in block if i != op_index]
+                    config = find_config_op_cached(ref_hz, [self.clkos[i] for i in order])
+                    if config and (not best or config.error < best.config.error):
+                        best = PllGroupPlan(order, None, ref_hz, "op", config)
+
+        return best
+
+    def may_solve(self, block: tuple[int, ...], ref_hz: float) -> bool:
+        """Whether every clock of `block` is in a feasible single or pair at `ref_hz`"""
+        if len(block) <= 2:
+            return True
+        for i in block:
+            if self.solve_group((i,), ref_hz, None):
+                continue
+            if not any(self.solve_group(tuple(sorted((i, k))), ref_hz, None) for k in block if k != i):
+                return False
+        return True
+
+    def indirect_clocks(self) -> set[int]:
+        """Clocks that can't be in any group fed directly from `clki`"""
+        indirect = set()
+        for i in range(len(self.clkos)):
+            if self.solve_group((i,), self.clki_freq, None):
+                continue
+            if not any(self.solve_group(tuple(sorted((i, k))), self.clki_freq, None)
+                    for k in range(len(self.clkos)) if k != i):
+                indirect.add(i)
+        return indirect
+
+    def solve_partition(self, partition: list[list[int]], bound: float):
+        groups = []
+        failed = []
+        error = 0.0
+        for block in partition:
+            direct = not self.indirect.intersection(block)
+            group = self.solve_group(tuple(block), self.clki_freq, None) if direct else None
+            if group:
+                groups.append(group)
+                error += group.config.error
+                if error >= bound:
+                    return None
+            else:
+                failed.append(block)
+
+        if failed and not self.cascade:
+            return None
+
+        # Feed the remaining groups from outputs of directly fed ones
+        direct = list(groups)
+        for block in failed:
+            best = None
+            for src_group in direct:
+                for src_index, src_hz in zip(src_group.clko_indices, src_group.config.clko_hzs):
+                    if not self.may_solve(tuple(block), src_hz):
+                        continue
+                    group = self.solve_group(tuple(block), src_hz, src_index)
+                    if group and (not best or group.config.error < best.config.error):
+                        best = group
+            if not best:
+                return None
+            groups.append(best)
+            error += best.config.error
+            if error >= bound:
+                return None
+
+        return PllPlan(groups, error)
+
+    def plan(self) -> Optional[PllPlan]:
+        n = len(self.clkos)
+        max_size = 4 if self.use_os3 else 3
+        self.indirect = self.indirect_clocks()
+        min_plls = math.ceil(n / max_size)
+        if self.indirect:
+            if not self.cascade or len(self.indirect) == n:
+                return None
+            min_plls = max(min_plls, 1 + math.ceil(len(self.indirect) / max_size))
+
+        for block_count in range(min_plls, min(self.max_plls, n) + 1):
+            best = None
+            for partition in set_partitions(n, max_size, block_count):
+                plan = self.solve_partition(partition, best.error if best else math.inf)
+                if plan:
+                    if not best:
+                        found_solves = len(self.solutions)
+                    best = plan
+                # Nothing beats an exact plan, and improving one is bounded
+                if best and (best.error == 0.0 or len(self.solutions) - found_solves > self.max_solves):
+                    break
+            if best:
+                return best
+        return None
+
+def plan_plls(clki_freq: float, clkos: Iterable[PllClock], **kwargs) -> Optional[PllPlan]:
+    """Plan multiple PLLs for `clkos`, see `PllPlanner` for the arguments"""
+    return PllPlanner(clki_freq, clkos, **kwargs).plan()
+
+class Ecp5MultiPll(Pll):
+    def __init__(self, clki_freq: float, clkos: Iterable[PllClock], plan: PllPlan):
+        """Lattice ECP5 clock generator using multiple PLLs
+
+        clki_freq: Input clock frequency
+        clkos: Output clock frequency/tolerance requests
+        plan: PLL configurations from `plan_plls()`
+
+        Output clocks are in the order of `clkos` regardless of which PLL
+        they are generated by. `o_locked` is asserted once all PLLs are locked.
+        """
+
+        clkos = list(clkos)
+        super().__init__(PllSignature(len(clkos)))
+
+        self.clki_hz = clki_freq
+        self.clkos = clkos
+        self.plan = plan
+
+        self.o_locked = Signal()
+
+        self.plls = [
+            Ecp5Pll(group.ref_hz, [clkos[i] for i in group.clko_indices], feedback=group.feedback)
+            for group in plan.groups
+        ]
+
+    def clock_outputs(self):
+        # Constraints are added on the outputs of the individual PLLs
+        return [output for pll in self.plls for output in pll.clock_outputs()]
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        # Map requested clocks to the PLL output generating them
+        outputs = { }
+        for pll, group in zip(self.plls, self.plan.groups):
+            for o_clk, index in zip(pll.o_clk, group.clko_indices):
+                outputs[index] = o_clk
+
+        for n, (pll, group) in enumerate(zip(self.plls, self.plan.groups)):
+            m.submodules[f"pll{n}"] = pll
+            i_clk = self.i_clk if group.source is None else outputs[group.source]
+            m.d.comb += [
+                pll.i_clk.eq(i_clk),
+                pll.i_rst.eq(self.i_rst),
+            ]
+
+        for index, o_clk in enumerate(self.o_clk):
+            m.d.comb += o_clk.eq(outputs[index])
+
+        m.d.comb += self.o_locked.eq(Cat(pll.o_locked for pll in self.plls).all())
+
+        return m
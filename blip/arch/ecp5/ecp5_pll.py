@@ -1,9 +1,12 @@
 from amaranth import *
 from amaranth.build import Platform
 from blip.arch.pll import Pll, PllClock, PllSignature
-from typing import Iterable
-from itertools import product
+from blip.cache import Cache
+from typing import Iterable, Callable, Optional
 from collections import namedtuple
+import heapq
+import math
+import numpy as np
 
 MHz = 1e6
 
@@ -15,6 +18,9 @@ class FloatRange:
     def __contains__(self, val):
         return self.lo <= val <= self.hi
 
+    def mask(self, vals: np.ndarray) -> np.ndarray:
+        return (self.lo <= vals) & (vals <= self.hi)
+
 clki_hzs = FloatRange( 10.000*MHz, 400.000*MHz)
 clko_hzs = FloatRange(  3.125*MHz, 400.000*MHz)
 vco_hzs  = FloatRange(400.000*MHz, 800.000*MHz)
@@ -23,66 +29,308 @@ fb_hzs   = FloatRange( 10.000*MHz, 400.000*MHz)
 ref_divs = range(1, 128 + 1)
 fb_divs  = range(1, 128 + 1)
 
-clko_names = ["CLKOP", "CLKOS", "CLKOS2"]
+clko_names = ["CLKOP", "CLKOS", "CLKOS2", "CLKOS3"]
+
+# Feedback paths, either through CLKOS3 fixed to the VCO frequency or through
+# CLKOP which frees CLKOS3 to be used as an output
+feedback_paths = {
+    "os3": "INT_OS3",
+    "op": "INT_OP",
+}
 
 Config = namedtuple("Config", "error ref_div fb_div clko_divs clko_hzs")
 
+# Bump when `find_config()` may return different results for the same inputs
+solver_version = 1
+
+config_cache = Cache("ecp5_pll", solver_version)
+
 def find_config(ref_hz: float, clkos: Iterable[PllClock]):
     """Find PLL configuration for ECP5
 
     See documentation on Ecp5Pll for more information.
     """
 
-    # Iterate all possible reference and feedback divisor
-    # values to find the optimal configuration
-    best_config = None
+    clkos = list(clkos)
+
+    # Enumerate all possible reference and feedback divisor pairs
+    # as flat arrays, ordered by `ref_div` first to match `Config`
+    ref_div, fb_div = np.meshgrid(np.array(ref_divs), np.array(fb_divs), indexing="ij")
+    ref_div, fb_div = ref_div.ravel(), fb_div.ravel()
+    fb_hz = ref_hz / ref_div
+    vco_hz = fb_hz * fb_div
+
+    # Keep only the pairs where the resulting frequencies are
+    # within the allowed limits
+    valid = fb_hzs.mask(fb_hz) & vco_hzs.mask(vco_hz)
+    ref_div, fb_div, vco_hz = ref_div[valid], fb_div[valid], vco_hz[valid]
+
+    # Find the nearest divisors for each output clock and
+    # measure total error and that individual errors are
+    # within the supplied tolerances
+    div_fudges = np.arange(-2, 2 + 1)[:, None]
+    clk_divs = []
+    clk_hzs = []
+    error = np.zeros_like(vco_hz)
+    for clko in clkos:
+        out_div = np.clip(np.rint(vco_hz / clko.frequency) + div_fudges, 1, 128)
+        out_hz = vco_hz / out_div
+        out_err = (out_hz - clko.frequency) / clko.frequency
+        out_err2 = out_err * out_err
+        in_tolerance = (clko.tolerance_below() <= out_err) & (out_err <= clko.tolerance_above())
+
+        # Pick the first fudge with the lowest error, like a strict `<` would
+        out_err2 = np.where(in_tolerance, out_err2, np.inf)
+        best = np.argmin(out_err2, axis=0)[None, :]
+        valid = np.any(in_tolerance, axis=0)
+
+        clk_divs.append(np.take_along_axis(out_div, best, axis=0)[0])
+        clk_hzs.append(np.take_along_axis(out_hz, best, axis=0)[0])
+        error = error + np.take_along_axis(out_err2, best, axis=0)[0] * clko.error_weight
+        error = np.where(valid, error, np.inf)
+
+    # Select the config with the lowest error, `argmin()` returns the first
+    # one so ties are broken by the divisors as in comparing `Config` tuples
+    if not np.any(np.isfinite(error)):
+        return None
+    ix = int(np.argmin(error))
+
+    return Config(
+        float(error[ix]), int(ref_div[ix]), int(fb_div[ix]),
+        [int(divs[ix]) for divs in clk_divs],
+        [float(hzs[ix]) for hzs in clk_hzs])
+
+def solve_output_div(vco_hz: float, clko: PllClock):
+    """Find the output divisor with the lowest error within tolerance
+
+    Returns `(out_div, out_hz, out_err2)` or `None` if no divisor fits.
+
+    The output frequency `vco_hz / out_div` is monotonic in `out_div`, so the
+    tolerance maps to a contiguous divisor interval and the lowest error is at
+    the divisor nearest to `vco_hz / frequency` clamped to that interval.
+    Candidates are checked with the same arithmetic as `find_config()` with
+    ties resolved towards the smaller divisor.
+    """
+    return _solve_output_div(vco_hz, clko.frequency, clko.tolerance_below(), clko.tolerance_above())
+
+def _best_output_div(vco_hz: float, freq: float, tol_below: float, tol_above: float, out_divs):
+    best = None
+    for out_div in out_divs:
+        out_div = min(max(out_div, 1), 128)
+        out_hz = vco_hz / out_div
+        out_err = (out_hz - freq) / freq
+        out_err2 = out_err * out_err
+        if tol_below <= out_err <= tol_above:
+            if best is None or out_err2 < best[2]:
+                best = (out_div, out_hz, out_err2)
+    return best
+
+def _solve_output_div(vco_hz: float, freq: float, tol_below: float, tol_above: float):
+    # The nearest divisors on either side are optimal if they are in tolerance
+    ratio = vco_hz / freq
+    best = _best_output_div(vco_hz, freq, tol_below, tol_above, (math.floor(ratio), math.ceil(ratio)))
+    if best:
+        return best
+
+    # Otherwise try the edges of the tolerance interval
+    out_divs = []
+    if tol_above > -1.0:
+        div_lo = ratio / (1.0 + tol_above)
+        out_divs += [math.floor(div_lo), math.ceil(div_lo)]
+    if tol_below > -1.0:
+        div_hi = ratio / (1.0 + tol_below)
+        out_divs += [math.floor(div_hi), math.ceil(div_hi)]
+    return _best_output_div(vco_hz, freq, tol_below, tol_above, sorted(out_divs))
+
+def dominates(a: list[float], b: list[float]):
+    return all(x <= y for x, y in zip(a, b)) and any(x < y for x, y in zip(a, b))
+
+def find_configs(ref_hz: float, clkos: Iterable[PllClock], *, k: int = 1, pareto: bool = False):
+    """Find the `k` best PLL configurations for ECP5 in `Config` order
+
+    With `pareto=True` returns instead every configuration where no other one
+    has lower or equal error for all clocks, useful if the error weights of
+    the clocks conflict.
+
+    Unlike `find_config()` this does not score the whole divisor grid: the
+    legal `fb_div` values for each `ref_div` form a single interval due to
+    `vco_hzs`, output divisors are solved in closed form and candidates are
+    abandoned as soon as their partial error can't make it into the results.
+    The output divisors are not limited to the neighborhood of the nearest
+    one, so the results are never worse than the ones of `find_config()`.
+    """
+
+    clkos = list(clkos)
+    clk_params = [(clko.frequency, clko.tolerance_below(), clko.tolerance_above(), clko.error_weight)
+        for clko in clkos]
+
+    # Max-heap of the `k` best configs using negated sort keys, as configs are
+    # visited in increasing divisor order ties never replace existing ones
+    best: list = []
+    front: list[tuple[list[float], Config]] = []
 
-    for ref_div, fb_div in product(ref_divs, fb_divs):
+    for ref_div in ref_divs:
         fb_hz = ref_hz / ref_div
-        vco_hz = fb_hz * fb_div
+        if fb_hz not in fb_hzs:
+            continue
+
+        # Widen the interval by one to not lose any values to rounding
+        fb_lo = max(math.ceil(vco_hzs.lo / fb_hz) - 1, fb_divs.start)
+        fb_hi = min(math.floor(vco_hzs.hi / fb_hz) + 1, fb_divs.stop - 1)
+        for fb_div in range(fb_lo, fb_hi + 1):
+            vco_hz = fb_hz * fb_div
+            if vco_hz not in vco_hzs:
+                continue
+
+            bound = -best[0][0][0] if len(best) >= k and not pareto else math.inf
+
+            clk_divs = []
+            clk_hzs = []
+            clk_errs = []
+            error = 0.0
+            for freq, tol_below, tol_above, weight in clk_params:
+                solution = _solve_output_div(vco_hz, freq, tol_below, tol_above)
+                if not solution:
+                    break
+                out_div, out_hz, out_err2 = solution
+                clk_divs.append(out_div)
+                clk_hzs.append(out_hz)
+                clk_errs.append(out_err2)
+                error += out_err2 * weight
+                if error >= bound:
+                    break
+            else:
+                config = Config(error, ref_div, fb_div, clk_divs, clk_hzs)
+                if pareto:
+                    if any(dominates(errs, clk_errs) or errs == clk_errs for errs, _ in front):
+                        continue
+                    front = [(errs, c) for errs, c in front if not dominates(clk_errs, errs)]
+                    front.append((clk_errs, config))
+                else:
+                    item = ((-error, -ref_div, -fb_div), config)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    else:
+                        heapq.heapreplace(best, item)
+
+    if pareto:
+        return sorted(c for _, c in front)
+    else:
+        return sorted(c for _, c in best)
+
+def find_config_op(ref_hz: float, clkos: Iterable[PllClock]):
+    """Find PLL configuration for ECP5 with feedback through CLKOP
+
+    The first clock is used as CLKOP and the feedback, so its frequency is
+    `ref_hz / ref_div * fb_div` and the VCO runs at a multiple of it given by
+    its output divisor in `Config.clko_divs[0]`. Up to three other clocks can
+    then be derived from the VCO as usual, including CLKOS3.
+    """
 
-        # Check that the resulting frequencies are within
-        # the allowed limits
-        if fb_hz not in fb_hzs or vco_hz not in vco_hzs:
+    clkos = list(clkos)
+    op_clko, clkos = clkos[0], clkos[1:]
+    clk_params = [(clko.frequency, clko.tolerance_below(), clko.tolerance_above(), clko.error_weight)
+        for clko in clkos]
+
+    best_config = None
+
+    for ref_div in ref_divs:
+        fb_hz = ref_hz / ref_div
+        if fb_hz not in fb_hzs:
             continue
 
-        # Find the nearest divisors for each output clock and
-        # measure total error and that individual errors are
-        # within the supplied tolerances
-        clk_divs = []
-        clk_hzs = []
-        error = 0.0
-        for clko in clkos:
-            best_div, best_hz, best_err2 = 0, 0, 0
-            for div_fudge in range(-2, 2 + 1):
-                out_div = min(max(round(vco_hz / clko.frequency) + div_fudge, 1), 128)
-                out_hz = vco_hz / out_div
-                out_err = (out_hz - clko.frequency) / clko.frequency
-                out_err2 = out_err * out_err
-                if clko.tolerance_below() <= out_err <= clko.tolerance_above():
-                    if best_div == 0 or out_err2 < best_err2:
-                        best_div, best_hz, best_err2 = out_div, out_hz, out_err2
-            if best_div == 0:
-                break # Skip following `else` block
-            clk_divs.append(best_div)
-            clk_hzs.append(best_hz)
-            error += best_err2 * clko.error_weight
-        else:
-            # Select this config if the error (or divisors if equal) is
-            # lower than the previously found best one
-            config = Config(error, ref_div, fb_div, clk_divs, clk_hzs)
-            if not best_config or config < best_config:
-                best_config = config
-    
+        # CLKOP is locked to `fb_hz` so only feedback divisors that produce
+        # a frequency within the tolerance need to be considered
+        op_lo = op_clko.frequency * (1.0 + op_clko.tolerance_below())
+        op_hi = op_clko.frequency * (1.0 + op_clko.tolerance_above())
+        fb_lo = max(math.floor(op_lo / fb_hz), fb_divs.start)
+        fb_hi = min(math.ceil(op_hi / fb_hz), fb_divs.stop - 1)
+        for fb_div in range(fb_lo, fb_hi + 1):
+            op_hz = fb_hz * fb_div
+            op_err = (op_hz - op_clko.frequency) / op_clko.frequency
+            if op_hz not in clko_hzs:
+                continue
+            if not (op_clko.tolerance_below() <= op_err <= op_clko.tolerance_above()):
+                continue
+
+            op_error = op_err * op_err * op_clko.error_weight
+            if best_config and op_error > best_config.error:
+                continue
+
+            div_lo = max(math.ceil(vco_hzs.lo / op_hz) - 1, 1)
+            div_hi = min(math.floor(vco_hzs.hi / op_hz) + 1, 128)
+            for op_div in range(div_lo, div_hi + 1):
+                vco_hz = op_hz * op_div
+                if vco_hz not in vco_hzs:
+                    continue
+
+                clk_divs = [op_div]
+                clk_hzs = [op_hz]
+                error = op_error
+                for freq, tol_below, tol_above, weight in clk_params:
+                    solution = _solve_output_div(vco_hz, freq, tol_below, tol_above)
+                    if not solution:
+                        break
+                    out_div, out_hz, out_err2 = solution
+                    clk_divs.append(out_div)
+                    clk_hzs.append(out_hz)
+                    error += out_err2 * weight
+                else:
+                    config = Config(error, ref_div, fb_div, clk_divs, clk_hzs)
+                    if not best_config or config < best_config:
+                        best_config = config
+
     return best_config
 
+def config_vco_hz(ref_hz: float, config: Config, *, feedback: str = "os3") -> float:
+    """VCO frequency of `config` for a PLL with the `feedback` path it was found for
+
+    With `feedback="os3"` the feedback clock runs at the VCO frequency, with
+    `feedback="op"` it is CLKOP, which divides the VCO by `clko_divs[0]`.
+    """
+    fb_hz = ref_hz / config.ref_div * config.fb_div
+    if feedback == "op":
+        return fb_hz * config.clko_divs[0]
+    else:
+        return fb_hz
+
+def clock_key(clko: PllClock):
+    return (float(clko.frequency), float(clko.tolerance_below()),
+        float(clko.tolerance_above()), float(clko.error_weight))
+
+def find_config_cached(ref_hz: float, clkos: Iterable[PllClock]):
+    """Memoized `find_config()`, see `config_cache.stats` for hit rates"""
+
+    clkos = list(clkos)
+    key = (float(ref_hz), tuple(clock_key(clko) for clko in clkos))
+    return config_cache.get(key, lambda: find_config(ref_hz, clkos))
+
+def find_configs_cached(ref_hz: float, clkos: Iterable[PllClock], *, k: int = 1, pareto: bool = False):
+    """Memoized `find_configs()`, shares `config_cache` with `find_config_cached()`"""
+
+    clkos = list(clkos)
+    key = ("find_configs", k, pareto, float(ref_hz), tuple(clock_key(clko) for clko in clkos))
+    return config_cache.get(key, lambda: find_configs(ref_hz, clkos, k=k, pareto=pareto))
+
+def find_config_op_cached(ref_hz: float, clkos: Iterable[PllClock]):
+    """Memoized `find_config_op()`, shares `config_cache` with `find_config_cached()`"""
+
+    clkos = list(clkos)
+    key = ("find_config_op", float(ref_hz), tuple(clock_key(clko) for clko in clkos))
+    return config_cache.get(key, lambda: find_config_op(ref_hz, clkos))
+
 class Ecp5Pll(Pll):
 
-    def __init__(self, clki_freq: float, clkos: Iterable[PllClock]):
+    def __init__(self, clki_freq: float, clkos: Iterable[PllClock], *, feedback: str = "os3",
+            select: Optional[Callable[[list[Config]], Config]] = None, candidates: int = 16):
         """Lattice ECP5 Phase-Locked Loop clock generator
 
         clki_freq: Input clock frequency
-        clkos: Output clock frequency/tolerance requests (max 3)
+        clkos: Output clock frequency/tolerance requests (max 3, or 4 with `feedback="op"`)
+        feedback: Feedback path, see `feedback_paths`
+        select: Optional function to pick a config from the best `candidates`
+            ones, eg. `lambda cs: max(cs, key=lambda c: config_vco_hz(clki_freq, c))`
+            to prefer a higher VCO frequency, only with `feedback="os3"`
 
         Internal structure:
 
@@ -118,10 +366,25 @@ class Ecp5Pll(Pll):
         With a potential chosen {VCO} frequency we solve the optimal output
         clock divisors and check that they are within the requested tolerances.
         Finally we select the configuration with the lowest error, if any.
+
+        With `select` the candidates are found using `find_configs()` which
+        considers every output divisor within the tolerances.
+
+        With `feedback="op"` the feedback is taken from CLKOP instead of the
+        VCO, see `find_config_op()`, which allows using CLKOS3 as an output.
+
+        Solved configurations are memoized in `config_cache`, both in-process
+        and on disk under `build/cache`, so identical requests are only solved
+        once across runs.
         """
 
         # Check that the inputs are reasonable
-        if not (1 <= len(clkos) <= 3):
+        if feedback not in feedback_paths:
+            raise ValueError(f"Bad feedback path: {feedback}")
+        if select and feedback != "os3":
+            raise ValueError(f"Config selection is not supported with feedback path: {feedback}")
+        max_clkos = 4 if feedback == "op" else 3
+        if not (1 <= len(clkos) <= max_clkos):
             raise ValueError(f"Bad amount of clock outputs: {len(clkos)}")
         if clki_freq not in clki_hzs:
             raise ValueError(f"Bad input clock frequency: {clki_freq}")
@@ -133,12 +396,19 @@ class Ecp5Pll(Pll):
 
         self.clki_hz = clki_freq
         self.clkos = list(clkos)
+        self.feedback = feedback
 
         # Extra output signals
         self.o_vco = Signal()
         self.o_locked = Signal()
 
-        config = find_config(clki_freq, clkos)
+        if feedback == "op":
+            config = find_config_op_cached(clki_freq, clkos)
+        elif select:
+            configs = find_configs_cached(clki_freq, clkos, k=candidates)
+            config = select(configs) if configs else None
+        else:
+            config = find_config_cached(clki_freq, clkos)
         if not config:
             raise ValueError("Could not find a PLL configuration")
         self.config = config
@@ -159,19 +429,22 @@ class Ecp5Pll(Pll):
             "i_CLKI": self.i_clk,
             "i_RST": self.i_rst,
             "o_LOCK": self.o_locked,
-            "o_CLKOS3": self.o_vco,
 
-            # Configure feedback using CLKOS3 with fixed divisor 1
-            "p_FEEDBK_PATH": "INT_OS3", # CLKOS3?
-            "p_CLKOS3_ENABLE": "ENABLED",
-            "p_CLKOS3_DIV": "1",
+            "p_FEEDBK_PATH": feedback_paths[self.feedback],
             "p_CLKI_DIV": str(self.config.ref_div),
             "p_CLKFB_DIV": str(self.config.fb_div),
         }
 
+        if self.feedback == "os3":
+            # Configure feedback using CLKOS3 with fixed divisor 1
+            params.update({
+                "o_CLKOS3": self.o_vco,
+                "p_CLKOS3_ENABLE": "ENABLED",
+                "p_CLKOS3_DIV": "1",
+            })
+
         # Enable requested clocks
         # TODO: Phase?
-        # TODO: Allow using CLKOS3 (complicates the configuration search though..)
         for o_clk, div, hz, name in zip(self.o_clk, self.config.clko_divs, self.config.clko_hzs, clko_names):
             params[f"p_{name}_ENABLE"] = "ENABLED"
             params[f"p_{name}_DIV"] = str(div)
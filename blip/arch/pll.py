@@ -41,3 +41,8 @@ class Pll(wiring.Component):
     i_clk: Signal
     i_rst: Signal
     o_clk: list[Signal]
+    clkos: list[PllClock]
+
+    def clock_outputs(self) -> list[Tuple[PllClock, Signal]]:
+        """Requested clocks with the signals generating them, used to match timing results"""
+        return list(zip(self.clkos, self.o_clk))
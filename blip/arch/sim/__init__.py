@@ -4,25 +4,61 @@ from .sim_pll import SimPll
 from typing import Callable, Any
 from amaranth import *
 from amaranth.sim import Simulator
+import heapq
+
+# Simulator time resolution
+fs_per_s = 10**15
+
+def half_period_fs(freq: float):
+    """Returns the exact half period in femtoseconds if it's integral"""
+    half_fs = fs_per_s / (2 * freq)
+    return int(half_fs) if half_fs == int(half_fs) else None
+
+def fs_to_delay(fs: int) -> float:
+    # `Simulator.add_clock()` truncates to femtoseconds, bias to the middle
+    # of the femtosecond so that the round-trip through seconds is exact
+    return (fs + 0.5) / fs_per_s
 
 class SimArch(Arch):
-    hooks: list[Callable[[Simulator], None]] = []
+    def __init__(self):
+        self.hooks: list[Callable[[Simulator], None]] = []
+        self.clocks: list[tuple[Signal, float]] = []
+        self.plls: list[Pll] = []
 
     def _add_clock(self, signal: Signal, freq: float):
+        self.clocks.append((signal, freq))
+
+    def _add_native_clock(self, sim: Simulator, signal: Signal, half_fs: int, index: int):
+        # `Simulator.add_clock()` only drives clock domains, so wrap the
+        # signal in a dummy domain that is not part of the design
+        domain = ClockDomain(f"simarch_clk{index}", local=True, reset_less=True)
+        domain.clk = signal
+        sim.add_clock(fs_to_delay(2 * half_fs), phase=fs_to_delay(half_fs), domain=domain)
+
+    def _add_clock_scheduler(self, sim: Simulator, clocks: list[tuple[Signal, float]]):
+        from blip.sim import engine
+
         async def clock_process(ctx):
-            t_ck = 0.5 / freq
+            # Heap of `(edge_fs, index, edge_count)`, edge times are computed
+            # from the edge count so they don't accumulate rounding errors
+            half_fs = [fs_per_s / (2 * freq) for _, freq in clocks]
+            edges = [(round(h), index, 1) for index, h in enumerate(half_fs)]
+            heapq.heapify(edges)
             while True:
-                await ctx.delay(t_ck)
-                ctx.set(signal, 1)
-                await ctx.delay(t_ck)
-                ctx.set(signal, 0)
+                edge_fs = edges[0][0]
+                # `ctx.delay()` rounds to femtoseconds, wait exactly until the
+                # edge from the actual time
+                await ctx.delay((edge_fs - engine.now_fs(sim)) / fs_per_s)
+                while edges[0][0] == edge_fs:
+                    _, index, count = edges[0]
+                    ctx.set(clocks[index][0], count & 1)
+                    heapq.heapreplace(edges, (round((count + 1) * half_fs[index]), index, count + 1))
 
-        def hook_clock(sim: Simulator):
-            sim.add_process(clock_process)
-        self.hooks.append(hook_clock)
+        sim.add_process(clock_process)
 
     def create_pll(self, clki_freq: float, clkos: list[PllClock]):
         pll = SimPll(clki_freq, clkos)
+        self.plls.append(pll)
 
         for clk, clko in zip(pll.o_clk, clkos):
             self._add_clock(clk, clko.frequency)
@@ -30,5 +66,21 @@ class SimArch(Arch):
         return pll
 
     def setup_simulator(self, sim: Simulator):
+        # Clocks with an exact femtosecond half period can be driven by the
+        # simulator natively, the rest are scheduled by a single process
+        scheduled = []
+        for index, (signal, freq) in enumerate(self.clocks):
+            half_fs = half_period_fs(freq)
+            if half_fs:
+                self._add_native_clock(sim, signal, half_fs, index)
+            else:
+                scheduled.append((signal, freq))
+        if scheduled:
+            self._add_clock_scheduler(sim, scheduled)
+
         for hook in self.hooks:
             hook(sim)
+
+        # Clocks are registered again when the next simulator elaborates the design
+        self.clocks.clear()
+        self.hooks.clear()
@@ -6,6 +6,7 @@ from typing import Iterable
 class SimPll(Pll):
     def __init__(self, clki_freq: float, clkos: Iterable[PllClock]):
         super().__init__(PllSignature(len(clkos)))
+        self.clkos = list(clkos)
 
     def elaborate(self, platform: Platform):
         m = Module()
@@ -1,36 +1,31 @@
 from blip.arch import Arch
-from amaranth.build import Platform
-from amaranth.lib.io import Pin
-from amaranth.sim import Simulator
 from abc import ABC, abstractmethod
-from typing import Optional
-from blip.component import ComponentSpec, BoardSpec
+from typing import Optional, TYPE_CHECKING
+from blip.component import ComponentSpec, BoardSpec, spec_registry
+from blip.registry import LazyRegistry
 import os
 
-_boards: dict[str, "Board"] = { }
+if TYPE_CHECKING:
+    from amaranth.lib import wiring
+    from blip.timing import ClockTiming
+    from amaranth.lib.io import Pin
+    from blip.sim import BoardSimulator, TraceOptions, ProfileOptions
+
+# Board modules are imported when a board using them is created, other
+# packages can add boards through the `blip.boards` entry point group
+_boards = LazyRegistry("blip.boards", {
+    "ulx3s_85f": "blip.board.ulx3s:ulx3s_85f",
+    "sim": "blip.board.sim:sim_board",
+})
 
 def board_definition(name):
     def decorator(func):
-        _boards[name] = func
+        _boards.register(name, func)
         return func
     return decorator
 
 def search_board(name: str):
-    filename = name
-    if not filename.lower().endswith(".toml"):
-        filename = f"{filename}.toml"
-
-    self_path = os.path.dirname(__file__)
-    specs_path = os.path.join(self_path, "..", "specs")
-    specs_path = os.path.normpath(specs_path)
-    boards_path = os.path.join(specs_path, "board")
-
-    for root, dirs, files in os.walk(boards_path):
-        for file in files:
-            if file == filename:
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, specs_path)
-                yield rel_path.replace("\\", "/")
+    yield from spec_registry.find(name, kind="board")
 
 def resolve_board_path(name: str):
     if "/" in name:
@@ -47,9 +42,27 @@ class Board(ABC):
     platform: Optional[type]
 
     @abstractmethod
-    def get_led(self, index: int) -> Pin:
+    def get_led(self, index: int) -> "Pin":
         ...
 
+    def get_sdram(self, name: str = "sdram", *, domain: str = "sync") -> "wiring.Component":
+        """SDRAM chip of the board component `name` clocked by `domain`
+
+        Returns a component with a `bus` member to connect to the bus of a
+        `blip.component.sdram.controller.SdramController`. Raises
+        `LookupError` if the board has no such SDRAM.
+        """
+        raise LookupError(f"board {self.spec.info.name} has no SDRAM '{name}'")
+
+    def get_uart(self, index: int = 0):
+        """Serial port `index` of the board, `tx.o` sends and `rx.i` receives
+
+        The port can be used with `blip.component.uart.UartTx`, eg. to read
+        `blip.component.perf.PerfCounters` on hardware. Raises `LookupError`
+        if the board has no such UART.
+        """
+        raise LookupError(f"board {self.spec.info.name} has no UART {index}")
+
     def create(spec: BoardSpec, *, sim=False) -> "Board":
         if sim:
             from blip.board.sim import sim_board
@@ -63,9 +76,38 @@ class Board(ABC):
         assert isinstance(spec, BoardSpec)
         return Board.create(spec, sim=sim)
 
-    def simulate(self, m, *, engine="pysim") -> Simulator:
-        sim = Simulator(m, engine=engine)
+    def simulate(self, m, *, engine="pysim", trace: Optional["TraceOptions"] = None,
+            profile: Optional["ProfileOptions"] = None) -> "BoardSimulator":
+        """Simulate `m` on the board
+
+        profile: Profile the simulation, see `blip.sim.profile`
+        """
+        from blip.sim import BoardSimulator
+        sim = BoardSimulator(m, engine=engine, trace=trace, profile=profile)
         self.arch.setup_simulator(sim)
         return sim
 
-import blip.board.ulx3s
+    def build(self, m, *, build_dir: str, cache=True, **kwargs):
+        """Build `m` for the board platform reusing cached products, see `blip.build.build()`"""
+        from blip.build import build, build_cache
+        assert self.platform, "attempting to build without a platform"
+        # Only keep the PLLs created by elaborating this build for `timing()`
+        self.arch.plls.clear()
+        return build(self.platform, m, build_dir=build_dir, key=repr(self.spec),
+            cache=build_cache if cache else None, **kwargs)
+
+    def timing(self, build_dir: str, name: str = "top") -> list["ClockTiming"]:
+        """Fmax of every clock from the nextpnr log of the last `build()` in `build_dir`
+
+        Clocks generated by PLLs of the board arch are matched to the
+        `PllClock` that requested them. Returns an empty list if there is no
+        log, eg. for toolchains other than nextpnr.
+        """
+        from blip.timing import parse_nextpnr_log, match_clocks
+        try:
+            with open(os.path.join(build_dir, f"{name}.tim"), errors="replace") as f:
+                timings = parse_nextpnr_log(f.read())
+        except FileNotFoundError:
+            return []
+        match_clocks(timings, self.platform, self.arch.plls)
+        return timings
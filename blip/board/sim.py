@@ -1,9 +1,33 @@
+from amaranth import *
 from amaranth.build import Platform
 from amaranth.sim import Simulator
+from amaranth.lib import wiring
 from amaranth.lib.io import SimulationPort
+from amaranth.lib.wiring import In
 from blip.component import BoardSpec
+from blip.component.sdram import SdramSpec
 from blip.board import Board, board_definition
 from blip.arch.sim import SimArch
+from types import SimpleNamespace
+
+class SimSdram(wiring.Component):
+    """SDRAM pins of `SimBoard` driven by a `blip.sim.sdram.SdramModel`
+
+    The model is added to every simulator elaborating the component.
+    """
+
+    def __init__(self, arch: SimArch, spec: SdramSpec, domain: str):
+        from blip.component.sdram.controller import SdramBusSignature
+        from blip.sim.sdram import SdramModel
+        super().__init__({ "bus": In(SdramBusSignature(spec)) })
+        self.arch = arch
+        self.domain = domain
+        self.model = SdramModel(spec, self.bus, domain=domain)
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+        self.arch.hooks.append(self.model.attach)
+        return m
 
 class SimBoard(Board):
     def __init__(self, spec: BoardSpec):
@@ -11,6 +35,8 @@ class SimBoard(Board):
         self.platform = None
         self.spec = spec
         self.leds: dict[int, SimulationPort] = { }
+        self.sdrams: dict[str, SimSdram] = { }
+        self.uarts: dict[int, SimpleNamespace] = { }
 
     def get_led(self, index: int):
         led = self.leds.get(index)
@@ -20,6 +46,30 @@ class SimBoard(Board):
         self.leds[index] = led
         return led
 
+    def get_sdram(self, name: str = "sdram", *, domain: str = "sync") -> SimSdram:
+        sdram = self.sdrams.get(name)
+        if sdram:
+            if sdram.domain != domain:
+                raise ValueError(f"SDRAM '{name}' is already clocked by domain '{sdram.domain}'")
+            return sdram
+        spec = self.spec.components.get(name)
+        if not isinstance(spec, SdramSpec):
+            raise LookupError(f"board {self.spec.info.name} has no SDRAM '{name}'")
+        sdram = SimSdram(self.arch, spec, domain)
+        self.sdrams[name] = sdram
+        return sdram
+
+    def get_uart(self, index: int = 0) -> SimpleNamespace:
+        uart = self.uarts.get(index)
+        if uart:
+            return uart
+        uart = SimpleNamespace(
+            tx=SimulationPort("o", 1, name=f"uart{index}_tx"),
+            rx=SimulationPort("i", 1, name=f"uart{index}_rx"),
+        )
+        self.uarts[index] = uart
+        return uart
+
 @board_definition("sim")
 def sim_board(spec: BoardSpec):
     return SimBoard(spec)
@@ -1,18 +1,93 @@
 from . import Board, board_definition
+from amaranth import *
 from amaranth.build import Platform
+from amaranth.lib import io, wiring
+from amaranth.lib.wiring import In
 from blip.arch.ecp5 import Ecp5Arch
 from blip.component import BoardSpec
+from blip.component.sdram import SdramSpec
+
+class Ulx3sSdram(wiring.Component):
+    """SDRAM of the ULX3S through the `sdram` resource of the platform, clocked by `domain`
+
+    The SDRAM clock is the inverted `domain` clock from a DDR output
+    register, so the chip samples commands and write data in the middle of
+    the cycle they're driven in. Read data is captured on the falling edge of
+    `domain`, which is within the data valid window of the chip as long as
+    its access time is below a clock period, and is seen by the controller at
+    the same rising edge as with an ideal chip, so `read_delay` is 0.
+    """
+
+    def __init__(self, platform: Platform, spec: SdramSpec, domain: str):
+        from blip.component.sdram.controller import SdramBusSignature
+        super().__init__({ "bus": In(SdramBusSignature(spec)) })
+        self.platform = platform
+        self.domain = domain
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        pins = self.platform.request("sdram", 0, dir={ "clk": "-" })
+        bus = self.bus
+
+        m.submodules.clk = clk = io.DDRBuffer("o", pins.clk, o_domain=self.domain)
+        m.d.comb += [
+            clk.o[0].eq(0),
+            clk.o[1].eq(1),
+        ]
+
+        fall = f"{self.domain}_fall"
+        m.domains += ClockDomain(fall, clk_edge="neg", reset_less=True, local=True)
+        dq_i = Signal.like(bus.dq_i)
+        m.d.comb += ClockSignal(fall).eq(ClockSignal(self.domain))
+        m.d[fall] += dq_i.eq(pins.dq.i)
+
+        m.d.comb += [
+            pins.clk_en.o.eq(bus.clk_en),
+            pins.cs.o.eq(bus.cs),
+            pins.ras.o.eq(bus.ras),
+            pins.cas.o.eq(bus.cas),
+            pins.we.o.eq(bus.we),
+            pins.ba.o.eq(bus.ba),
+            pins.a.o.eq(bus.a),
+            pins.dq.o.eq(bus.dq_o),
+            pins.dq.oe.eq(bus.dq_oe),
+            bus.dq_i.eq(dq_i),
+            pins.dqm.o.eq(bus.dqm),
+        ]
+
+        return m
 
 class Ulx3sBoard(Board):
     def __init__(self, platform: Platform, spec: BoardSpec):
         self.arch = Ecp5Arch()
         self.platform = platform
         self.spec = spec
+        self.sdrams: dict[str, Ulx3sSdram] = { }
 
     def get_led(self, index: int):
         assert 0 <= index < 8
         return self.platform.request("led", index)
 
+    def get_sdram(self, name: str = "sdram", *, domain: str = "sync") -> Ulx3sSdram:
+        sdram = self.sdrams.get(name)
+        if sdram:
+            if sdram.domain != domain:
+                raise ValueError(f"SDRAM '{name}' is already clocked by domain '{sdram.domain}'")
+            return sdram
+        spec = self.spec.components.get(name)
+        if name != "sdram" or not isinstance(spec, SdramSpec):
+            raise LookupError(f"board {self.spec.info.name} has no SDRAM '{name}'")
+        sdram = Ulx3sSdram(self.platform, spec, domain)
+        self.sdrams[name] = sdram
+        return sdram
+
+    def get_uart(self, index: int = 0):
+        # Connected to the FTDI chip, which is also used to program the FPGA
+        if index != 0:
+            raise LookupError(f"board {self.spec.info.name} has no UART {index}")
+        return self.platform.request("uart", index)
+
 @board_definition("ulx3s_85f")
 def ulx3s_85f(spec: BoardSpec):
     from amaranth_boards.ulx3s import ULX3S_85F_Platform
@@ -0,0 +1,189 @@
+from amaranth.build import Platform
+from amaranth.build.run import BuildPlan, LocalBuildProducts
+from amaranth._toolchain import tool_env_var, require_tool
+from blip.cache import CacheStats
+from typing import Any, Callable, Optional
+import blip.cache
+import hashlib
+import json
+import os
+import shutil
+
+# Bump when the layout of cached build products changes
+build_cache_version = 1
+
+# Files written around the toolchain by the build runner, not products
+ignored_files = {"build.log"}
+
+def snapshot(build_dir: str) -> dict[str, int]:
+    """Modification times of the files in `build_dir` by relative path"""
+
+    files = { }
+    for root, dirs, names in os.walk(build_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, build_dir).replace("\\", "/")
+            files[rel_path] = os.stat(path).st_mtime_ns
+    return files
+
+def toolchain_env(platform: Platform) -> dict[str, str]:
+    """Environment variables that select the toolchain used by `platform`"""
+
+    names = [platform._toolchain_env_var]
+    names += [tool_env_var(tool) for tool in platform.required_tools]
+    return { name: os.environ[name] for name in names if name in os.environ }
+
+class BuildCache:
+    """Content-addressed store of toolchain build products
+
+    name: Subdirectory of `blip.cache.get_cache_root()` to store entries in
+    max_bytes: Maximum total size of the stored products
+
+    Builds are keyed by the digest of the `BuildPlan`, which covers the
+    generated RTLIL/Verilog, the constraint files including clock constraints
+    added by PLLs and the build script with the toolchain options, along with
+    any extra key such as the board spec. Entries are directories holding the
+    files produced by the build, the least recently used ones are evicted
+    based on the modification time of their manifest.
+    """
+
+    def __init__(self, name: str = "build", *, max_bytes: int = 2 * 1024**3):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+
+    def path(self) -> str:
+        return os.path.join(blip.cache.get_cache_root(), self.name)
+
+    def key(self, plan: BuildPlan, extra: Any = ()) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(repr((build_cache_version, extra)).encode("utf-8"))
+        hasher.update(plan.digest())
+        return hasher.hexdigest()
+
+    def restore(self, digest: str, build_dir: str) -> bool:
+        """Copy cached products of `digest` to `build_dir`, returns `False` on a miss"""
+
+        entry_path = os.path.join(self.path(), digest)
+        manifest_path = os.path.join(entry_path, "manifest.json")
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            for filename in manifest["files"]:
+                dst_path = os.path.join(build_dir, filename)
+                os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+                shutil.copyfile(os.path.join(entry_path, filename), dst_path)
+            os.utime(manifest_path)
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def store(self, digest: str, plan: BuildPlan, build_dir: str, before: dict[str, int]):
+        """Store the files produced by executing `plan` in `build_dir`
+
+        before: `snapshot()` of `build_dir` before executing, files that
+            were not created or modified by the build are not stored
+        """
+
+        files = [
+            path for path, mtime in snapshot(build_dir).items()
+            if path not in plan.files and path not in ignored_files and before.get(path) != mtime
+        ]
+
+        entry_path = os.path.join(self.path(), digest)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            size = 0
+            for filename in files:
+                dst_path = os.path.join(tmp_path, filename)
+                os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                shutil.copyfile(os.path.join(build_dir, filename), dst_path)
+                size += os.path.getsize(dst_path)
+            os.makedirs(tmp_path, exist_ok=True)
+            with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+                json.dump({ "files": files, "size": size }, f)
+            # Another process may have stored the same build concurrently
+            if os.path.isdir(entry_path):
+                shutil.rmtree(tmp_path)
+            else:
+                os.rename(tmp_path, entry_path)
+            self._evict()
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """List `(last_used, size, path)` of the stored builds"""
+
+        entries = []
+        if not os.path.isdir(self.path()):
+            return entries
+        with os.scandir(self.path()) as it:
+            for entry in it:
+                manifest_path = os.path.join(entry.path, "manifest.json")
+                try:
+                    with open(manifest_path) as f:
+                        size = json.load(f)["size"]
+                    entries.append((os.stat(manifest_path).st_mtime, size, entry.path))
+                except (OSError, ValueError, KeyError):
+                    pass
+        return entries
+
+    def _evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def execute(self, plan: BuildPlan, build_dir: str, *, extra: Any = (),
+            on_miss: Optional[Callable[[], None]] = None) -> LocalBuildProducts:
+        """Execute `plan` in `build_dir` unless the products are already cached
+
+        on_miss: Called before executing the plan on a cache miss
+        """
+
+        digest = self.key(plan, extra)
+        plan.extract(build_dir)
+        if self.restore(digest, build_dir):
+            self.stats.disk_hits += 1
+            return LocalBuildProducts(os.path.abspath(build_dir))
+
+        self.stats.misses += 1
+        if on_miss:
+            on_miss()
+        before = snapshot(build_dir)
+        products = plan.execute_local(build_dir)
+        self.store(digest, plan, build_dir, before)
+        return products
+
+    def clear(self):
+        self.stats = CacheStats()
+        shutil.rmtree(self.path(), ignore_errors=True)
+
+build_cache = BuildCache()
+
+def build(platform: Platform, elaboratable, *, build_dir: str, name: str = "top",
+        key: Any = (), cache: Optional[BuildCache] = build_cache, **kwargs) -> LocalBuildProducts:
+    """Build `elaboratable` like `Platform.build()` reusing cached products
+
+    platform: Platform to build for
+    build_dir: Directory to place the build files and products in
+    name: Name of the toplevel, used for the product filenames
+    key: Extra values to key the build with, eg. the board spec
+    cache: Build cache to use, `None` to always run the toolchain
+    """
+
+    plan = platform.prepare(elaboratable, name, **kwargs)
+    if cache is None:
+        return plan.execute_local(build_dir)
+
+    def check_tools():
+        # Same upfront check as `Platform.build()`, only needed on a miss
+        if platform._toolchain_env_var not in os.environ:
+            for tool in platform.required_tools:
+                require_tool(tool)
+
+    extra = (key, sorted(toolchain_env(platform).items()))
+    return cache.execute(plan, build_dir, extra=extra, on_miss=check_tools)
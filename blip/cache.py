@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+import hashlib
+import os
+import pickle
+
+# Root directory for on-disk caches if set, see `get_cache_root()`
+cache_root: Optional[str] = None
+
+def get_cache_root() -> str:
+    """Root directory for on-disk caches
+
+    Either `cache_root`, `$BLIP_CACHE_DIR` or `build/cache` relative to the
+    working directory like the rest of the `build/` outputs. Looked up on
+    every use so the environment can be changed after import.
+    """
+    return cache_root or os.environ.get("BLIP_CACHE_DIR") or os.path.join("build", "cache")
+
+def hash_key(key: Any) -> str:
+    """Hash a key consisting of nested tuples of plain values"""
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.memory_hits + self.disk_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.lookups
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+_missing = object()
+
+class Cache:
+    """Two-level cache with an in-process LRU and a persistent store
+
+    name: Subdirectory of `get_cache_root()` to store entries in
+    version: Version of the cached computation, part of every key
+    max_memory: Maximum number of entries to keep in memory
+    max_disk: Maximum number of entries to keep on disk, `0` to disable
+
+    Disk entries are pickled to files named by the hash of their key, the
+    least recently used ones are evicted based on their modification time.
+    """
+
+    def __init__(self, name: str, version: int, *, max_memory=1024, max_disk=4096):
+        self.name = name
+        self.version = version
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.memory: OrderedDict[str, Any] = OrderedDict()
+        self.stats = CacheStats()
+
+    def path(self) -> str:
+        return os.path.join(get_cache_root(), self.name)
+
+    def _load_disk(self, digest: str):
+        path = os.path.join(self.path(), f"{digest}.pickle")
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return _missing
+
+    def _store_disk(self, digest: str, value):
+        dir_path = self.path()
+        path = os.path.join(dir_path, f"{digest}.pickle")
+        try:
+            os.makedirs(dir_path, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        dir_path = self.path()
+        entries = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.name.endswith(".pickle"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        if len(entries) <= self.max_disk:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_disk]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, key: Any, compute: Callable[[], Any]):
+        """Return the cached value for `key` or `compute()` and store it"""
+
+        digest = hash_key((self.version, key))
+
+        value = self.memory.get(digest, _missing)
+        if value is not _missing:
+            self.memory.move_to_end(digest)
+            self.stats.memory_hits += 1
+            return value
+
+        if self.max_disk > 0:
+            value = self._load_disk(digest)
+        if value is not _missing:
+            self.stats.disk_hits += 1
+        else:
+            self.stats.misses += 1
+            value = compute()
+            if self.max_disk > 0:
+                self._store_disk(digest, value)
+
+        self.memory[digest] = value
+        if len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+        return value
+
+    def clear(self, *, disk=False):
+        self.memory.clear()
+        self.stats = CacheStats()
+        if disk and os.path.isdir(self.path()):
+            for name in os.listdir(self.path()):
+                if name.endswith(".pickle"):
+                    os.remove(os.path.join(self.path(), name))
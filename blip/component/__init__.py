@@ -1,13 +1,16 @@
 from dataclasses import dataclass, replace
 from typing import Optional
-import os
-import tomllib
+from blip.registry import LazyRegistry
 
-component_types = { }
+# Component type modules are imported when a spec of the type is parsed,
+# other packages can add types through the `blip.component_types` entry points
+component_types = LazyRegistry("blip.component_types", {
+    "sdram": "blip.component.sdram:SdramSpec",
+})
 
 def component_type(name: str):
     def decorator(func):
-        component_types[name] = func
+        component_types.register(name, func)
         return func
     return decorator
 
@@ -31,30 +34,12 @@ class ComponentSpec:
         return component_types[type_].parse(data, info)
 
     def load(name: str) -> "ComponentSpec":
-        path = name
-        if not path.lower().endswith(".toml"):
-            path = f"{path}.toml"
-
-        self_path = os.path.dirname(__file__)
-        specs_path = os.path.join(self_path, "..", "specs")
-        specs_path = os.path.normpath(specs_path)
-        spec_path = os.path.join(specs_path, path)
-
-        with open(spec_path, "rb") as f:
-            data = tomllib.load(f)
-            return ComponentSpec.parse(data)
+        """Load a spec relative to `blip/specs`, cached by `spec_registry`"""
+        return spec_registry.load(name)
 
 def resolve_component(data) -> ComponentSpec:
-    if isinstance(data, str):
-        return ComponentSpec.load(data)
-    elif isinstance(data, list):
-        base = resolve_component(data[0])
-        for cd in data[1:]:
-            other = resolve_component(cd)
-            base = base.merge(other)
-        return base
-    else:
-        raise RuntimeError(f"cannot resolve component for {type(data)}")
+    """Load a spec by path or merge a list of them, cached by `spec_registry`"""
+    return spec_registry.resolve(data)
 
 @component_type("board")
 @dataclass
@@ -75,5 +60,4 @@ class BoardSpec(ComponentSpec):
     def merge(self, other):
         raise RuntimeError("cannot merge boards")
 
-# Required to register component types
-import blip.component.sdram
+from blip.component.registry import SpecRegistry, spec_registry
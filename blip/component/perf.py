@@ -0,0 +1,391 @@
+"""Performance counters and trace buffers
+
+`PerfCounters` collects named instrumentation from any clock domain of a
+design and reads it out as a `PerfSnapshot`, either from a simulation
+testbench with `PerfCounters.read()` or on hardware through `PerfUart` and
+`PerfCounters.read_stream()`.
+
+    perf = PerfCounters(enabled=config.perf)
+    perf.counter("requests", ctrl.i_valid & ctrl.o_ready, domain="sdram")
+    perf.histogram("latency", latency, valid=first, bins=16, bin_width=4, domain="sdram")
+    perf.trace("addr", ctrl.i_addr, valid=ctrl.i_valid & ctrl.o_ready, depth=32, domain="sdram")
+    m.submodules.perf = perf
+
+Disabled instrumentation is not elaborated at all and reads back as zero.
+"""
+
+from amaranth import *
+from amaranth.build import Platform
+from amaranth.lib import wiring
+from amaranth.lib.cdc import FFSynchronizer
+from amaranth.lib.memory import Memory
+from amaranth.lib.wiring import In, Out
+from blip.component.uart import UartTx, uart_divisor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Optional, Union
+
+# Start of a `PerfUart` frame, followed by the slot count and the slots
+frame_magic = b"PERF"
+
+@dataclass
+class PerfItem:
+    """Registered instrumentation, occupying `slots` readout slots from `index`
+
+    kind: `"counter"`, `"value"`, `"histogram"` or `"trace"`
+    """
+
+    name: str
+    kind: str
+    domain: str
+    index: int
+    slots: int
+    enabled: bool
+    args: dict = field(default_factory=dict)
+
+@dataclass
+class PerfSnapshot:
+    """Values of all instrumentation at one point in time
+
+    counters: Counters and sampled values by name
+    histograms: Counts of every bin by name
+    traces: Captured entries by name, oldest first
+    """
+
+    counters: dict[str, int]
+    histograms: dict[str, list[int]]
+    traces: dict[str, list[int]]
+
+    def __getitem__(self, name: str):
+        for values in (self.counters, self.histograms, self.traces):
+            if name in values:
+                return values[name]
+        raise KeyError(name)
+
+class PerfCounters(Elaboratable):
+    """Named counters, histograms and trace buffers with a common readout
+
+    domain: Clock domain of the readout
+    bits: Width of counters and readout slots
+    enabled: Whether instrumentation is elaborated, either for all of it
+        or by name
+
+    Every item is assigned consecutive readout slots, counters and values
+    take one, histograms one per bin and traces one for the number of
+    entries and one per entry. Items are read out through a snapshot:
+
+        i_hold: Request a snapshot, keep high while reading
+        o_ready: Snapshot taken, slots are stable until `i_hold` is released
+        o_idle: Previous snapshot released, a new one may be requested
+        i_index, o_value: Slot to read and its value
+
+    Each clock domain copies its counters to shadow registers once it sees
+    the synchronized `i_hold` and acknowledges through another synchronizer,
+    so the readout only ever sees registers that are not changing. Traces
+    stop recording while a snapshot is held.
+    """
+
+    def __init__(self, *, domain: str = "sync", bits: int = 32,
+            enabled: Union[bool, Iterable[str]] = True):
+        self.domain = domain
+        self.bits = bits
+        self.enabled = enabled if isinstance(enabled, bool) else set(enabled)
+        self.items: list[PerfItem] = []
+        self.slots = 0
+
+        self.i_hold = Signal()
+        self.o_ready = Signal()
+        self.o_idle = Signal()
+        self.i_index = Signal(16)
+        self.o_value = Signal(bits)
+
+    def is_enabled(self, name: str) -> bool:
+        return self.enabled if isinstance(self.enabled, bool) else name in self.enabled
+
+    def add(self, name: str, kind: str, domain: str, slots: int, **args) -> PerfItem:
+        if any(item.name == name for item in self.items):
+            raise ValueError(f"Duplicate performance counter: {name}")
+        item = PerfItem(name, kind, domain, self.slots, slots, self.is_enabled(name), args)
+        self.items.append(item)
+        self.slots += slots
+        return item
+
+    def check_width(self, name: str, value: Value):
+        if len(value) > self.bits:
+            raise ValueError(f"{name} is wider than {self.bits} bits")
+
+    def counter(self, name: str, event: Value = C(1), *, domain: str = "sync"):
+        """Count the cycles of `domain` in which `event` is high, every cycle by default"""
+        self.add(name, "counter", domain, 1, event=Value.cast(event))
+
+    def value(self, name: str, value: Value, *, domain: str = "sync"):
+        """Sample `value`, eg. a maximum kept by the design"""
+        value = Value.cast(value)
+        self.check_width(name, value)
+        self.add(name, "value", domain, 1, value=value)
+
+    def histogram(self, name: str, value: Value, *, valid: Value = C(1), bins: int,
+            bin_width: int = 1, domain: str = "sync"):
+        """Count `value` in `bins` bins of `bin_width`, the last one counting everything above
+
+        bin_width: Power of 2
+        """
+        if bins < 1 or bin_width < 1 or bin_width & (bin_width - 1):
+            raise ValueError(f"Bad histogram {name}: {bins} bins of {bin_width}")
+        self.add(name, "histogram", domain, bins, value=Value.cast(value), valid=Value.cast(valid),
+            bin_width=bin_width)
+
+    def trace(self, name: str, data: Value, *, valid: Value = C(1), depth: int = 16,
+            domain: str = "sync"):
+        """Record the last `depth` values of `data` in cycles where `valid` is high"""
+        data = Value.cast(data)
+        self.check_width(name, data)
+        if depth < 1:
+            raise ValueError(f"Bad trace depth {depth} for {name}")
+        self.add(name, "trace", domain, depth + 1, data=data, valid=Value.cast(valid), depth=depth)
+
+    # Readout
+
+    def decode(self, values: list[int]) -> PerfSnapshot:
+        """Convert the values of all slots to a snapshot"""
+        if len(values) != self.slots:
+            raise ValueError(f"Expected {self.slots} slots, got {len(values)}")
+        snapshot = PerfSnapshot({ }, { }, { })
+        for item in self.items:
+            slots = values[item.index:item.index + item.slots]
+            if item.kind in ("counter", "value"):
+                snapshot.counters[item.name] = slots[0]
+            elif item.kind == "histogram":
+                snapshot.histograms[item.name] = slots
+            else:
+                snapshot.traces[item.name] = slots[1:1 + min(slots[0], item.args["depth"])]
+        return snapshot
+
+    async def read(self, ctx) -> PerfSnapshot:
+        """Take a snapshot from a simulation testbench"""
+        tick = ctx.tick(self.domain)
+        while not ctx.get(self.o_idle):
+            await tick
+        ctx.set(self.i_hold, 1)
+        while not ctx.get(self.o_ready):
+            await tick
+        values = []
+        for index in range(self.slots):
+            ctx.set(self.i_index, index)
+            values.append(ctx.get(self.o_value))
+        ctx.set(self.i_hold, 0)
+        return self.decode(values)
+
+    def read_stream(self, stream: BinaryIO) -> PerfSnapshot:
+        """Read the next `PerfUart` frame from `stream`, eg. a serial port"""
+        window = b""
+        while window != frame_magic:
+            byte = stream.read(1)
+            if not byte:
+                raise EOFError("No performance counter frame found")
+            window = (window + byte)[-len(frame_magic):]
+        slot_bytes = (self.bits + 7) // 8
+        header = stream.read(2)
+        size = int.from_bytes(header, "little") * slot_bytes
+        data = stream.read(size)
+        if len(header) != 2 or len(data) != size:
+            raise EOFError("Truncated performance counter frame")
+        return self.decode([int.from_bytes(data[i:i + slot_bytes], "little")
+            for i in range(0, len(data), slot_bytes)])
+
+    # Hardware
+
+    def elaborate_item(self, m: Module, item: PerfItem, capture: Value, held: Value) -> list[Value]:
+        """Add the logic of `item` in its domain and return its slots
+
+        capture: Copy counters to their shadows
+        held: A snapshot is held, traces stop recording
+        """
+        domain = item.domain
+        args = item.args
+        slots = []
+
+        if item.kind == "counter":
+            count = Signal(self.bits, name=f"{item.name}_count")
+            shadow = Signal(self.bits, name=f"{item.name}_shadow")
+            with m.If(args["event"]):
+                m.d[domain] += count.eq(count + 1)
+            with m.If(capture):
+                m.d[domain] += shadow.eq(count)
+            slots.append(shadow)
+
+        elif item.kind == "value":
+            shadow = Signal(self.bits, name=f"{item.name}_shadow")
+            with m.If(capture):
+                m.d[domain] += shadow.eq(args["value"])
+            slots.append(shadow)
+
+        elif item.kind == "histogram":
+            shift = args["bin_width"].bit_length() - 1
+            bin_index = args["value"] >> shift
+            for n in range(item.slots):
+                count = Signal(self.bits, name=f"{item.name}_bin{n}")
+                shadow = Signal(self.bits, name=f"{item.name}_bin{n}_shadow")
+                hit = bin_index >= n if n == item.slots - 1 else bin_index == n
+                with m.If(args["valid"] & hit):
+                    m.d[domain] += count.eq(count + 1)
+                with m.If(capture):
+                    m.d[domain] += shadow.eq(count)
+                slots.append(shadow)
+
+        else:
+            depth = args["depth"]
+            data = args["data"]
+            memory = Memory(shape=len(data), depth=depth, init=[])
+            m.submodules[f"{item.name}_memory"] = memory
+            write = memory.write_port(domain=domain)
+            read = memory.read_port(domain="comb")
+
+            # Entries only change while not held, so they can be read directly
+            pointer = Signal(range(depth), name=f"{item.name}_pointer")
+            written = Signal(range(depth + 1), name=f"{item.name}_written")
+            m.d.comb += [
+                write.addr.eq(pointer),
+                write.data.eq(data),
+                write.en.eq(args["valid"] & ~held),
+            ]
+            with m.If(write.en):
+                m.d[domain] += pointer.eq(Mux(pointer == depth - 1, 0, pointer + 1))
+                with m.If(written != depth):
+                    m.d[domain] += written.eq(written + 1)
+
+            # Oldest entry first
+            entry = self.i_index - (item.index + 1)
+            oldest = Mux(written == depth, pointer, 0)
+            addr = oldest + entry
+            m.d.comb += read.addr.eq(Mux(addr >= depth, addr - depth, addr))
+            slots.append(written)
+            slots.extend([read.data] * depth)
+
+        return slots
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        items = [item for item in self.items if item.enabled]
+        domains = list(dict.fromkeys(item.domain for item in items))
+        slots: list[Optional[Value]] = [None] * self.slots
+
+        acks = []
+        for domain in domains:
+            hold = Signal(name=f"perf_{domain}_hold")
+            held = Signal(name=f"perf_{domain}_held")
+            ack = Signal(name=f"perf_{domain}_ack")
+            m.submodules[f"hold_{domain}"] = FFSynchronizer(self.i_hold, hold, o_domain=domain)
+            m.d[domain] += held.eq(hold)
+            m.submodules[f"ack_{domain}"] = FFSynchronizer(held, ack, o_domain=self.domain)
+            acks.append(ack)
+
+            # Shadows are captured as `hold` rises and stable once `held` is
+            for item in items:
+                if item.domain == domain:
+                    slots[item.index:item.index + item.slots] = self.elaborate_item(m, item,
+                        hold & ~held, held)
+
+        m.d.comb += [
+            self.o_ready.eq(self.i_hold & Cat(acks).all()),
+            self.o_idle.eq(~Cat(acks).any()),
+        ]
+
+        with m.Switch(self.i_index):
+            for index, value in enumerate(slots):
+                if value is not None:
+                    with m.Case(index):
+                        m.d.comb += self.o_value.eq(value)
+
+        return m
+
+class PerfUart(wiring.Component):
+    """Sends snapshots of `perf` over a UART every `interval` seconds
+
+    perf: Counters to read, in the `sync` domain
+    frequency: Frequency of the `sync` domain
+    baud_rate: UART baud rate
+
+    Frames are `frame_magic`, the slot count as 2 bytes and every slot in
+    `(perf.bits + 7) // 8` bytes, little-endian. Traces are held while a
+    frame is sent.
+
+        o_tx: Serial output
+    """
+
+    def __init__(self, perf: PerfCounters, frequency: float, *, baud_rate: int = 115200,
+            interval: float = 1.0):
+        if perf.domain != "sync":
+            raise ValueError(f"Counters must be read out in the sync domain, not {perf.domain}")
+        self.perf = perf
+        self.divisor = uart_divisor(frequency, baud_rate)
+        self.interval = max(round(frequency * interval), 1)
+        super().__init__({
+            "o_tx": Out(1, init=1),
+        })
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        perf = self.perf
+        m.submodules.tx = tx = UartTx(self.divisor)
+        m.d.comb += self.o_tx.eq(tx.o_tx)
+
+        slot_bytes = (perf.bits + 7) // 8
+        header = frame_magic + perf.slots.to_bytes(2, "little")
+        timer = Signal(range(self.interval), init=self.interval - 1)
+        index = Signal(range(max(len(header), perf.slots) + 1))
+        byte = Signal(range(slot_bytes))
+
+        with m.If(timer != 0):
+            m.d.sync += timer.eq(timer - 1)
+
+        with m.FSM():
+            with m.State("WAIT"):
+                with m.If((timer == 0) & perf.o_idle):
+                    m.d.sync += [
+                        timer.eq(self.interval - 1),
+                        perf.i_hold.eq(1),
+                        index.eq(0),
+                    ]
+                    m.next = "HOLD"
+
+            with m.State("HOLD"):
+                with m.If(perf.o_ready):
+                    m.next = "HEADER"
+
+            with m.State("HEADER"):
+                m.d.comb += [
+                    tx.i_valid.eq(1),
+                    tx.i_data.eq(Array(Const(b, 8) for b in header)[index]),
+                ]
+                with m.If(tx.o_ready):
+                    m.d.sync += index.eq(index + 1)
+                    with m.If(index == len(header) - 1):
+                        m.d.sync += [
+                            index.eq(0),
+                            byte.eq(0),
+                        ]
+                        m.next = "SLOTS" if perf.slots else "DONE"
+
+            with m.State("SLOTS"):
+                m.d.comb += [
+                    perf.i_index.eq(index),
+                    tx.i_valid.eq(1),
+                    tx.i_data.eq(perf.o_value.word_select(byte, 8) if slot_bytes > 1 else perf.o_value),
+                ]
+                with m.If(tx.o_ready):
+                    m.d.sync += byte.eq(byte + 1)
+                    with m.If(byte == slot_bytes - 1):
+                        m.d.sync += [
+                            byte.eq(0),
+                            index.eq(index + 1),
+                        ]
+                        with m.If(index == perf.slots - 1):
+                            m.next = "DONE"
+
+            with m.State("DONE"):
+                m.d.sync += perf.i_hold.eq(0)
+                m.next = "WAIT"
+
+        return m
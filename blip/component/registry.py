@@ -0,0 +1,250 @@
+from blip.component import ComponentSpec
+from blip.cache import CacheStats
+from typing import Any, Optional
+import blip.cache
+import blip.component
+import hashlib
+import os
+import pickle
+import tomllib
+
+default_specs_path = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "specs"))
+
+# Precompiled index written by `blip specs compile`, bump the version when
+# the layout of the index or the spec classes change
+spec_index_magic = b"BLIPSPEC"
+spec_index_version = 1
+
+def default_index_path() -> str:
+    return os.path.join(blip.cache.get_cache_root(), "specs.index")
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def spec_filename(name: str) -> str:
+    if not name.lower().endswith(".toml"):
+        name = f"{name}.toml"
+    return name.replace("\\", "/")
+
+class SpecRegistry:
+    """Index and cache of the component specs under `specs_path`
+
+    Spec files are indexed by filename once, parsed specs are memoized by
+    the paths and modification times of the files they were loaded from and
+    merged specs from `resolve()` by the list of files they are merged from,
+    so editing a spec invalidates everything that depends on it. Cached specs
+    are shared so they must not be mutated.
+
+    Specs missing from the cache are first looked up from the precompiled
+    index at `index_path`, if it exists, and only parsed from TOML if the
+    index is missing them or any of the files they depend on has changed.
+    """
+
+    def __init__(self, specs_path: str = default_specs_path, *, index_path: Optional[str] = None):
+        self.specs_path = specs_path
+        self.index_path = index_path
+        self.compiled: Optional[dict[str, Any]] = None
+        self.files: Optional[dict[str, list[str]]] = None
+        self.specs: dict[str, tuple[tuple[tuple[str, int], ...], ComponentSpec]] = { }
+        self.merged: dict[Any, ComponentSpec] = { }
+        self.load_stats = CacheStats()
+        self.resolve_stats = CacheStats()
+        # Dependencies of the specs currently being parsed
+        self._deps: list[list[tuple[str, int]]] = []
+
+    def index(self) -> dict[str, list[str]]:
+        """Map from spec filenames to their paths relative to `specs_path`"""
+
+        if self.files is None:
+            self.files = { }
+            for root, dirs, files in os.walk(self.specs_path):
+                dirs.sort()
+                for file in sorted(files):
+                    if file.lower().endswith(".toml"):
+                        rel_path = os.path.relpath(os.path.join(root, file), self.specs_path)
+                        self.files.setdefault(file, []).append(rel_path.replace("\\", "/"))
+        return self.files
+
+    def find(self, name: str, *, kind: Optional[str] = None) -> list[str]:
+        """Find spec paths by filename, optionally only under the `kind` directory"""
+
+        filename = spec_filename(name)
+        paths = self.index().get(filename)
+        if paths is None:
+            # Spec may have been added after indexing
+            self.files = None
+            paths = self.index().get(filename, [])
+        if kind:
+            paths = [p for p in paths if p.startswith(f"{kind}/")]
+        return paths
+
+    def _mtime(self, path: str) -> int:
+        return os.stat(os.path.join(self.specs_path, path)).st_mtime_ns
+
+    def _valid(self, deps) -> bool:
+        try:
+            return all(self._mtime(path) == mtime for path, mtime in deps)
+        except OSError:
+            return False
+
+    def load(self, name: str) -> ComponentSpec:
+        """Load a spec by path relative to `specs_path`, `.toml` is optional"""
+
+        path = spec_filename(name)
+        cached = self.specs.get(path)
+        if cached and self._valid(cached[0]):
+            self.load_stats.memory_hits += 1
+            deps, spec = cached
+        elif compiled := self._load_compiled(path):
+            self.load_stats.disk_hits += 1
+            deps, spec = compiled
+            self.specs[path] = compiled
+        else:
+            self.load_stats.misses += 1
+            self._deps.append([(path, self._mtime(path))])
+            try:
+                with open(os.path.join(self.specs_path, path), "rb") as f:
+                    data = tomllib.load(f)
+                spec = ComponentSpec.parse(data)
+            finally:
+                deps = tuple(self._deps.pop())
+            self.specs[path] = (deps, spec)
+
+        if self._deps:
+            self._deps[-1].extend(deps)
+        return spec
+
+    def _resolve_key(self, data):
+        if isinstance(data, str):
+            path = spec_filename(data)
+            return (path, self._mtime(path))
+        elif isinstance(data, list):
+            return tuple(self._resolve_key(d) for d in data)
+        else:
+            raise RuntimeError(f"cannot resolve component for {type(data)}")
+
+    def resolve(self, data) -> ComponentSpec:
+        """Load a spec by path or merge a list of them in order"""
+
+        if isinstance(data, str):
+            return self.load(data)
+
+        # Load the parts first to validate and record them as dependencies
+        parts = [self.resolve(d) for d in data]
+        key = self._resolve_key(data)
+        spec = self.merged.get(key)
+        if spec is not None:
+            self.resolve_stats.memory_hits += 1
+            return spec
+
+        self.resolve_stats.misses += 1
+        spec = parts[0]
+        for part in parts[1:]:
+            spec = spec.merge(part)
+        self.merged[key] = spec
+        return spec
+
+    def _compiled_index(self) -> dict[str, Any]:
+        if self.compiled is None:
+            self.compiled = { "specs": { }, "sources": { } }
+            index_path = self.index_path or default_index_path()
+            try:
+                with open(index_path, "rb") as f:
+                    if f.read(len(spec_index_magic)) != spec_index_magic:
+                        return self.compiled
+                    index = pickle.load(f)
+                if (index["version"] == spec_index_version
+                        and os.path.samefile(index["specs_path"], self.specs_path)):
+                    self.compiled = index
+            except (OSError, EOFError, KeyError, pickle.UnpicklingError, AttributeError, ImportError):
+                pass
+        return self.compiled
+
+    def _source_valid(self, path: str) -> Optional[int]:
+        """Check a source file against the index, returns its mtime if unchanged"""
+
+        source = self._compiled_index()["sources"].get(path)
+        if not source:
+            return None
+        digest, size, mtime = source
+        try:
+            st = os.stat(os.path.join(self.specs_path, path))
+        except OSError:
+            return None
+        # Only hash files that have been touched since compiling
+        if (st.st_size, st.st_mtime_ns) != (size, mtime):
+            if st.st_size != size or file_digest(os.path.join(self.specs_path, path)) != digest:
+                return None
+        return st.st_mtime_ns
+
+    def _load_compiled(self, path: str):
+        entry = self._compiled_index()["specs"].get(path)
+        if not entry:
+            return None
+        dep_paths, spec = entry
+        deps = []
+        for dep_path in dep_paths:
+            mtime = self._source_valid(dep_path)
+            if mtime is None:
+                return None
+            deps.append((dep_path, mtime))
+        return tuple(deps), spec
+
+    def compile(self, index_path: Optional[str] = None) -> str:
+        """Parse every spec and write them to a precompiled index
+
+        Returns the path of the written index, `default_index_path()` unless
+        specified. Specs are stored resolved with the paths of all the files
+        they were loaded from, which are checked against their hashes when
+        loading from the index.
+        """
+
+        registry = SpecRegistry(self.specs_path)
+        registry.compiled = { "specs": { }, "sources": { } }
+        prev_registry = blip.component.spec_registry
+        blip.component.spec_registry = registry
+        try:
+            for paths in registry.index().values():
+                for path in paths:
+                    registry.load(path)
+        finally:
+            blip.component.spec_registry = prev_registry
+
+        specs = { }
+        sources = { }
+        for path, (deps, spec) in registry.specs.items():
+            specs[path] = (tuple(dict.fromkeys(p for p, _ in deps)), spec)
+            for dep_path, mtime in deps:
+                full_path = os.path.join(self.specs_path, dep_path)
+                sources[dep_path] = (file_digest(full_path), os.path.getsize(full_path), mtime)
+
+        index = {
+            "version": spec_index_version,
+            "specs_path": os.path.abspath(self.specs_path),
+            "specs": specs,
+            "sources": sources,
+        }
+        index_path = index_path or self.index_path or default_index_path()
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(spec_index_magic)
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+
+        self.compiled = None
+        return index_path
+
+    def invalidate(self):
+        self.files = None
+        self.compiled = None
+        self.specs.clear()
+        self.merged.clear()
+
+    def report(self) -> str:
+        return (f"specs: {self.load_stats.misses} loaded, {self.load_stats.memory_hits} cached, "
+            f"{self.load_stats.disk_hits} from index, "
+            f"merged: {self.resolve_stats.misses} merged, {self.resolve_stats.memory_hits} cached")
+
+spec_registry = SpecRegistry()
@@ -0,0 +1,152 @@
+from blip.arch.pll import PllClock
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.timing import SdramCycles, cas_latency, compile_timings_cached, frequency_range
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+import math
+
+# Cycles added by the controller to every access, registering the request
+# to the command bus and the read data to the response
+controller_latency = 2
+
+objectives = ("bandwidth", "latency")
+
+@dataclass
+class AccessPattern:
+    """Traffic to choose the SDRAM clock for
+
+    burst_length: Words per access
+    row_hit_rate: Fraction of accesses to an already open row
+    read_fraction: Fraction of accesses that are reads
+    interleaved: Row misses overlap with transfers in other banks, as
+        scheduled by `SdramController`
+    """
+
+    burst_length: int = 8
+    row_hit_rate: float = 0.9
+    read_fraction: float = 1.0
+    interleaved: bool = True
+
+@dataclass
+class SdramClockPlan:
+    """SDRAM clock chosen by `optimize_sdram_clock()`
+
+    frequency: Achieved SDRAM clock frequency in Hz
+    cycles: Timings at `frequency` with the chosen CAS latency
+    config: Configuration returned by the PLL solver
+    bandwidth: Estimated sustained bandwidth in bytes per second
+    latency: Estimated read latency to the first word in seconds
+    """
+
+    frequency: float
+    cycles: SdramCycles
+    config: Any
+    bandwidth: float
+    latency: float
+
+    @property
+    def cl(self) -> int:
+        return self.cycles.cl
+
+def estimate_performance(spec: SdramSpec, cycles: SdramCycles, pattern: AccessPattern) -> tuple[float, float]:
+    """Estimate `(bandwidth, latency)` of `pattern` in bytes per second and seconds
+
+    Every access transfers a burst, a row miss adds a precharge and an
+    activate, switching from reading to writing waits for the read data to
+    leave the bus and refreshes take the bus for `t_rp + t_rc` every
+    `t_refi`. With interleaving the row misses only limit the bandwidth
+    when the banks can't keep up, every bank opens a row at most every `t_rc`.
+    """
+
+    bl = pattern.burst_length
+    miss = 1.0 - pattern.row_hit_rate
+    reads = pattern.read_fraction
+    turnaround = reads * (1.0 - reads) * (cycles.cl + 1)
+    if pattern.interleaved:
+        burst_cycles = max(bl + turnaround, miss * cycles.t_rc / (1 << spec.bank_bits))
+    else:
+        burst_cycles = bl + turnaround + miss * (cycles.t_rp + cycles.t_rcd)
+    refresh = (cycles.t_rp + cycles.t_rc) / cycles.t_refi
+
+    bandwidth = cycles.frequency * bl * spec.data_bits / 8 / burst_cycles * (1.0 - refresh)
+    latency_cycles = controller_latency + cycles.cl + miss * (cycles.t_rp + cycles.t_rcd)
+    return bandwidth, latency_cycles / cycles.frequency
+
+def candidate_frequencies(lo: float, hi: float, step: float) -> list[float]:
+    """Frequencies from `hi` down to `lo` in `step`s, always including both"""
+    count = math.floor((hi - lo) / step + 1e-9)
+    freqs = [hi - i * step for i in range(count + 1)]
+    if freqs[-1] != lo:
+        freqs.append(lo)
+    return freqs
+
+def default_solver():
+    from blip.arch.ecp5.ecp5_pll import find_config_cached
+    return find_config_cached
+
+def optimize_sdram_clock(spec: SdramSpec, clki_freq: float, pattern: Optional[AccessPattern] = None, *,
+        objective: str = "bandwidth", max_frequency: Optional[float] = None,
+        clkos: Iterable[PllClock] = (), step: float = 1e6, tolerance: float = 0.02,
+        solver: Optional[Callable] = None) -> SdramClockPlan:
+    """Choose the SDRAM clock frequency and CAS latency for `pattern`
+
+    clki_freq: PLL input frequency
+    objective: `"bandwidth"` to maximize the sustained bandwidth or
+        `"latency"` to minimize the read latency, the other one breaks ties
+    max_frequency: Highest frequency the design can run at
+    clkos: Other clocks generated by the same PLL, the SDRAM clock is added
+        as the first output
+    step: Distance between the candidate frequencies in Hz
+    tolerance: How far below a candidate the PLL output may be
+    solver: `find_config()` compatible PLL solver, by default the memoized
+        ECP5 one
+
+    For every CAS latency the frequencies allowed by `t_ck` are searched
+    from the fastest down, each candidate is solved with the PLL and the
+    timings are compiled at the frequency the PLL actually achieves, which
+    is never above the candidate. Raises `ValueError` if no candidate can be
+    generated.
+    """
+
+    if objective not in objectives:
+        raise ValueError(f"Bad objective: {objective}")
+    pattern = pattern or AccessPattern()
+    solver = solver or default_solver()
+    clkos = list(clkos)
+
+    best = None
+    best_score = None
+    for mode, timings in spec.timing.items():
+        cl = cas_latency(mode)
+        lo, hi = frequency_range(timings)
+        hi = min(hi, max_frequency or math.inf)
+        if math.isinf(hi):
+            raise ValueError(f"SDRAM {spec.info.name} has no maximum frequency, set `max_frequency`")
+        lo = max(lo, step)
+        if lo > hi:
+            continue
+
+        seen = set()
+        for freq in candidate_frequencies(lo, hi, step):
+            config = solver(clki_freq, [PllClock(freq, (-tolerance, 0.0))] + clkos)
+            if config is None or config.clko_hzs[0] in seen:
+                continue
+            achieved = config.clko_hzs[0]
+            seen.add(achieved)
+            try:
+                cycles = compile_timings_cached(spec, achieved, cl=cl)
+            except ValueError:
+                continue
+
+            bandwidth, latency = estimate_performance(spec, cycles, pattern)
+            if objective == "bandwidth":
+                score = (bandwidth, -latency, -config.error)
+            else:
+                score = (-latency, bandwidth, -config.error)
+            if best_score is None or score > best_score:
+                best_score = score
+                best = SdramClockPlan(achieved, cycles, config, bandwidth, latency)
+
+    if best is None:
+        raise ValueError(f"No clock for SDRAM {spec.info.name} can be generated from {clki_freq / 1e6:g}MHz")
+    return best
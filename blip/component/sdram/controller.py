@@ -0,0 +1,510 @@
+from amaranth import *
+from amaranth.build import Platform
+from amaranth.lib import data, enum, wiring
+from amaranth.lib.wiring import In, Out
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.refresh import RefreshScheduler, jedec_max_postponed
+from blip.component.sdram.timing import SdramCycles, compile_timings_cached, min_cycles
+from typing import Optional
+
+class Command(enum.Enum, shape=3):
+    """SDRAM commands as active-high `(ras, cas, we)` with chip select asserted"""
+
+    NOP = 0b000
+    BURST_TERMINATE = 0b001
+    READ = 0b010
+    WRITE = 0b011
+    ACTIVE = 0b100
+    PRECHARGE = 0b101
+    REFRESH = 0b110
+    MODE_REGISTER_SET = 0b111
+
+def address_bits(spec: SdramSpec) -> int:
+    """Width of the SDRAM address bus"""
+    bits = max(spec.row_bits, spec.col_bits)
+    if spec.auto_precharge_bit is not None:
+        bits = max(bits, spec.auto_precharge_bit + 1)
+    return bits
+
+class SdramBusSignature(wiring.Signature):
+    """SDRAM chip pins, active-high as the `sdram` resource of `amaranth_boards`"""
+
+    def __init__(self, spec: SdramSpec):
+        super().__init__({
+            "clk_en": Out(1),
+            "cs": Out(1),
+            "ras": Out(1),
+            "cas": Out(1),
+            "we": Out(1),
+            "ba": Out(spec.bank_bits),
+            "a": Out(address_bits(spec)),
+            "dq_o": Out(spec.data_bits),
+            "dq_oe": Out(1),
+            "dq_i": In(spec.data_bits),
+            "dqm": Out(max(spec.data_bits // 8, 1)),
+        })
+
+class WaitCounters:
+    """Down counters for timing constraints, zero when the constraint is met
+
+    Loading a counter never shortens the wait, so a command only has to
+    load the constraints it imposes.
+    """
+
+    def __init__(self):
+        # Signals are not hashable, key by identity
+        self.loads: dict[int, tuple[Signal, list[tuple[Value, int]]]] = { }
+
+    def counter(self, max_value: int, name: str) -> Signal:
+        counter = Signal(range(max_value + 1), name=name)
+        self.loads[id(counter)] = (counter, [])
+        return counter
+
+    def load(self, counter: Signal, cond: Value, cycles: int):
+        """Require `cycles` cycles between a command issued on `cond` and the next"""
+        if cycles > 1:
+            self.loads[id(counter)][1].append((cond, cycles - 1))
+
+    def elaborate(self, m: Module):
+        for counter, loads in self.loads.values():
+            value = Mux(counter != 0, counter - 1, 0)
+            for cond, cycles in loads:
+                value = Mux(cond & (value < cycles), cycles, value)
+            m.d.sync += counter.eq(value)
+
+class SdramController(wiring.Component):
+    """SDR SDRAM controller with a reordering request queue
+
+    spec: SDRAM chip
+    frequency: Frequency of the `sync` domain, which also clocks the SDRAM
+    cl: CAS latency, by default the lowest one supported at `frequency`
+    burst_length: Words per request, 1, 2, 4 or 8
+    queue_depth: Number of requests to reorder
+    tag_bits: Width of request tags returned with read data
+    read_delay: Extra cycles from the SDRAM driving read data to `dq_i`,
+        eg. from I/O registers
+    init_wait: Power-up delay before initialization in nanoseconds
+    init_refreshes: AUTO REFRESH commands during initialization
+    starvation_limit: Times a request may be bypassed by younger ones
+    max_postponed: Refreshes that may be postponed while requests are
+        waiting, see `RefreshScheduler`
+
+    Requests:
+
+        i_valid, o_ready: Handshake, requests are accepted when both are high
+        i_addr: Word address, aligned to `burst_length`
+        i_write: Write `i_wdata` instead of reading
+        i_tag: Tag returned with the read data or write acknowledgement
+        i_wdata: Write data, the first word in the lowest bits
+
+    Responses, which must be accepted when valid:
+
+        o_rvalid, o_rlast: Read data word, last word of the burst
+        o_rtag, o_rdata: Tag of the request and the data word
+        o_wack, o_wtag: Write request with tag issued to the SDRAM
+
+    All cycle counts are derived from the timings of `spec`, see
+    `compile_timings()`. Words are addressed as `row | bank | column` from
+    the most significant bit, so that sequential accesses continue in the
+    next bank at row boundaries.
+
+    Rows are kept open until a request needs another row in the same bank
+    or the SDRAM is refreshed. Refreshes are issued when the queue is empty
+    and postponed while it isn't, up to `max_postponed` or as few as needed
+    to close rows within `t_ras_max`, see `refresh`. Each cycle the oldest
+    request hitting an open row is issued, requests to other rows in the
+    same bank are bypassed. While a burst is transferring data the command
+    bus is free to activate and precharge other banks, so with enough
+    requests in the queue the data bus is kept busy. Requests to the same row are never reordered, so every
+    address is accessed in request order.
+    """
+
+    def __init__(self, spec: SdramSpec, frequency: float, *, cl: Optional[int] = None,
+            burst_length: int = 8, queue_depth: int = 4, tag_bits: int = 4, read_delay: int = 0,
+            init_wait: float = 200_000.0, init_refreshes: int = 8, starvation_limit: int = 16,
+            max_postponed: int = jedec_max_postponed):
+
+        if burst_length not in (1, 2, 4, 8) or burst_length > (1 << spec.col_bits):
+            raise ValueError(f"Bad burst length: {burst_length}")
+        if queue_depth < 1:
+            raise ValueError(f"Bad queue depth: {queue_depth}")
+        if spec.auto_precharge_bit is None:
+            raise ValueError(f"SDRAM {spec.info.name} has no auto precharge bit")
+
+        self.spec = spec
+        self.cycles = compile_timings_cached(spec, frequency, cl=cl)
+        self.burst_length = burst_length
+        self.queue_depth = queue_depth
+        self.tag_bits = tag_bits
+        self.read_delay = read_delay
+        self.init_cycles = min_cycles(init_wait, 1e9 / frequency)
+        self.init_refreshes = init_refreshes
+        self.starvation_limit = starvation_limit
+        self.refresh_interval, self.max_postponed = self.refresh_schedule(max_postponed)
+        self.refresh = RefreshScheduler(spec, frequency, cl=self.cycles.cl,
+            max_postponed=self.max_postponed, interval=self.refresh_interval)
+
+        self.mode = self.mode_register()
+        if self.mode >> address_bits(spec):
+            raise ValueError(f"Mode register does not fit the address bus: {self.mode:#x}")
+
+        super().__init__({
+            "i_valid": In(1),
+            "o_ready": Out(1),
+            "i_addr": In(spec.row_bits + spec.bank_bits + spec.col_bits),
+            "i_write": In(1),
+            "i_tag": In(tag_bits),
+            "i_wdata": In(spec.data_bits * burst_length),
+            "o_rvalid": Out(1),
+            "o_rlast": Out(1),
+            "o_rtag": Out(tag_bits),
+            "o_rdata": Out(spec.data_bits),
+            "o_wack": Out(1),
+            "o_wtag": Out(tag_bits),
+            "o_init_done": Out(1),
+            "bus": Out(SdramBusSignature(spec)),
+        })
+
+    def mode_register(self) -> int:
+        """Sequential bursts of `burst_length` for reads and writes at the CAS latency"""
+        return (self.burst_length.bit_length() - 1) | (self.cycles.cl << 4)
+
+    def refresh_schedule(self, max_postponed: int) -> tuple[int, int]:
+        """Refresh interval and postponed refreshes keeping rows open at most `t_ras_max`
+
+        A row opened right after a refresh is closed by the precharge of the
+        next one, at most `max_postponed + 1` intervals later, which may wait
+        for `t_ras` or the write recovery of a burst.
+        """
+        cycles = self.cycles
+        if cycles.t_ras_max is None:
+            return cycles.t_refi, max_postponed
+        close = max(cycles.t_ras, self.burst_length + cycles.t_wr) + 1
+        if cycles.t_ras_max <= close:
+            raise ValueError(f"SDRAM {self.spec.info.name} t_ras max is too short")
+        interval = min(cycles.t_refi, cycles.t_ras_max - close)
+        return interval, min(max_postponed, (cycles.t_ras_max - close) // interval - 1)
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        spec = self.spec
+        cycles: SdramCycles = self.cycles
+        bl = self.burst_length
+        burst_bits = bl.bit_length() - 1
+        banks = 1 << spec.bank_bits
+        depth = self.queue_depth
+
+        entry_layout = data.StructLayout({
+            "write": 1,
+            "bank": spec.bank_bits,
+            "row": spec.row_bits,
+            "col": spec.col_bits - burst_bits,
+            "tag": self.tag_bits,
+            "wdata": spec.data_bits * bl,
+            "age": range(self.starvation_limit + 1),
+        })
+
+        # Request queue, oldest first and compacted on removal
+        slots = [Signal(entry_layout, name=f"slot{i}") for i in range(depth)]
+        valid = Signal(depth)
+
+        bank_open = Array(Signal(name=f"bank{b}_open") for b in range(banks))
+        bank_row = Array(Signal(spec.row_bits, name=f"bank{b}_row") for b in range(banks))
+
+        waits = WaitCounters()
+        max_wait = max(cycles.t_rc, cycles.t_ras, cycles.t_rp, cycles.t_rcd, cycles.t_mrd,
+            cycles.t_rrd, bl + cycles.t_wr, bl + cycles.cl + 1)
+        act_wait = Array(waits.counter(max_wait, f"bank{b}_act_wait") for b in range(banks))
+        rcd_wait = Array(waits.counter(max_wait, f"bank{b}_rcd_wait") for b in range(banks))
+        pre_wait = Array(waits.counter(max_wait, f"bank{b}_pre_wait") for b in range(banks))
+        rrd_wait = waits.counter(max_wait, "rrd_wait")
+        read_wait = waits.counter(max_wait, "read_wait")
+        write_wait = waits.counter(max_wait, "write_wait")
+        mrd_wait = waits.counter(max_wait, "mrd_wait")
+
+        # Commands decided this cycle, registered to the bus
+        issue_col = Signal()
+        issue_act = Signal()
+        issue_pre = Signal()
+        issue_pre_all = Signal()
+        issue_ref = Signal()
+        issue_mode = Signal()
+        col_entry = Signal(entry_layout)
+        act_entry = Signal(entry_layout)
+        pre_bank = Signal(spec.bank_bits)
+
+        any_open = Cat(bank_open[b] for b in range(banks)).any()
+        all_act_ready = Cat(act_wait[b] == 0 for b in range(banks)).all()
+        all_pre_ready = Cat(~bank_open[b] | (pre_wait[b] == 0) for b in range(banks)).all()
+
+        # Scheduling
+        hit = Signal(depth)
+        col_ok = Signal(depth)
+        act_ok = Signal(depth)
+        for i, slot in enumerate(slots):
+            older = range(i)
+            same_bank = [valid[j] & (slots[j].bank == slot.bank) for j in older]
+            same_row = [same_bank[j] & (slots[j].row == slot.row) for j in older]
+            starved = [same_bank[j] & (slots[j].age == self.starvation_limit) for j in older]
+            m.d.comb += [
+                hit[i].eq(valid[i] & bank_open[slot.bank] & (bank_row[slot.bank] == slot.row)),
+                col_ok[i].eq(hit[i] & ~Cat(same_row).any() & ~Cat(starved).any()
+                    & (rcd_wait[slot.bank] == 0)
+                    & Mux(slot.write, write_wait == 0, read_wait == 0)),
+                act_ok[i].eq(valid[i] & ~Cat(same_bank).any() & ~bank_open[slot.bank]
+                    & (act_wait[slot.bank] == 0) & (rrd_wait == 0)),
+            ]
+
+        pre_ok = Signal(banks)
+        for b in range(banks):
+            in_bank = [valid[i] & (slot.bank == b) for i, slot in enumerate(slots)]
+            bank_miss = Cat(in_bank[i] & ~hit[i] for i in range(depth)).any()
+            bank_hit = Cat(in_bank[i] & hit[i] for i in range(depth)).any()
+            bank_starved = Cat(in_bank[i] & ~hit[i] & (slot.age == self.starvation_limit)
+                for i, slot in enumerate(slots)).any()
+            m.d.comb += pre_ok[b].eq(bank_open[b] & bank_miss & (~bank_hit | bank_starved)
+                & (pre_wait[b] == 0))
+
+        # Oldest first, later assignments take priority
+        col_sel = Signal(depth)
+        act_sel = Signal(depth)
+        for i in reversed(range(depth)):
+            with m.If(col_ok[i]):
+                m.d.comb += col_sel.eq(1 << i)
+            with m.If(act_ok[i]):
+                m.d.comb += act_sel.eq(1 << i)
+        for i in range(depth):
+            with m.If(col_sel[i]):
+                m.d.comb += col_entry.eq(slots[i])
+            with m.If(act_sel[i]):
+                m.d.comb += act_entry.eq(slots[i])
+        for b in reversed(range(banks)):
+            with m.If(pre_ok[b]):
+                m.d.comb += pre_bank.eq(b)
+
+        # Periodic refresh, once started by closing the rows it is completed
+        # even if requests arrive
+        running = Signal()
+        refreshing = Signal()
+        refresh = self.refresh
+        m.submodules.refresh = EnableInserter(running)(refresh)
+        m.d.comb += [
+            refresh.i_idle.eq(~valid.any()),
+            refresh.i_refresh.eq(issue_ref),
+        ]
+        with m.If(issue_pre_all):
+            m.d.sync += refreshing.eq(running)
+        with m.If(issue_ref):
+            m.d.sync += refreshing.eq(0)
+
+        power_up = Signal(range(self.init_cycles + 1), init=self.init_cycles)
+        init_refreshes = Signal(range(self.init_refreshes + 1), init=self.init_refreshes)
+
+        with m.FSM():
+            with m.State("POWER_UP"):
+                m.d.sync += power_up.eq(power_up - 1)
+                with m.If(power_up == 0):
+                    m.next = "PRECHARGE"
+
+            with m.State("PRECHARGE"):
+                m.d.comb += issue_pre_all.eq(1)
+                m.next = "REFRESH"
+
+            with m.State("REFRESH"):
+                with m.If(all_act_ready):
+                    with m.If(init_refreshes == 0):
+                        m.next = "MODE"
+                    with m.Else():
+                        m.d.comb += issue_ref.eq(1)
+                        m.d.sync += init_refreshes.eq(init_refreshes - 1)
+
+            with m.State("MODE"):
+                with m.If(all_act_ready):
+                    m.d.comb += issue_mode.eq(1)
+                    m.next = "MODE_WAIT"
+
+            with m.State("MODE_WAIT"):
+                with m.If(mrd_wait == 0):
+                    m.next = "RUN"
+
+            with m.State("RUN"):
+                m.d.comb += [
+                    self.o_init_done.eq(1),
+                    self.o_ready.eq(~valid[depth - 1]),
+                    running.eq(1),
+                ]
+
+                with m.If(refresh.o_request | refreshing):
+                    with m.If(any_open):
+                        m.d.comb += issue_pre_all.eq(all_pre_ready)
+                    with m.Else():
+                        m.d.comb += issue_ref.eq(all_act_ready)
+                with m.Elif(col_sel.any()):
+                    m.d.comb += issue_col.eq(1)
+                with m.Elif(act_sel.any()):
+                    m.d.comb += issue_act.eq(1)
+                with m.Elif(pre_ok.any()):
+                    m.d.comb += issue_pre.eq(1)
+
+        # Timing constraints imposed by the issued commands
+        issue_read = issue_col & ~col_entry.write
+        issue_write = issue_col & col_entry.write
+        for b in range(banks):
+            act_b = issue_act & (act_entry.bank == b)
+            pre_b = issue_pre_all | (issue_pre & (pre_bank == b))
+            waits.load(rcd_wait[b], act_b, cycles.t_rcd)
+            waits.load(pre_wait[b], act_b, cycles.t_ras)
+            waits.load(act_wait[b], act_b, cycles.t_rc)
+            waits.load(act_wait[b], pre_b, cycles.t_rp)
+            waits.load(act_wait[b], issue_ref, cycles.t_rc)
+            waits.load(pre_wait[b], issue_read & (col_entry.bank == b), bl)
+            waits.load(pre_wait[b], issue_write & (col_entry.bank == b), bl + cycles.t_wr - 1)
+        waits.load(rrd_wait, issue_act, cycles.t_rrd)
+        waits.load(read_wait, issue_col, bl)
+        waits.load(write_wait, issue_write, bl)
+        # Bus turnaround after the read data
+        waits.load(write_wait, issue_read, bl + cycles.cl + 1)
+        waits.load(mrd_wait, issue_mode, cycles.t_mrd)
+        waits.elaborate(m)
+
+        # Bank state
+        with m.If(issue_act):
+            m.d.sync += [
+                bank_open[act_entry.bank].eq(1),
+                bank_row[act_entry.bank].eq(act_entry.row),
+            ]
+        with m.If(issue_pre):
+            m.d.sync += bank_open[pre_bank].eq(0)
+        with m.If(issue_pre_all):
+            m.d.sync += [bank_open[b].eq(0) for b in range(banks)]
+
+        # Queue, remove the issued request and append the accepted one
+        valid_next = Signal(depth)
+        for k in range(depth):
+            removed = issue_col & col_sel[:k + 1].any()
+            with m.If(removed):
+                if k + 1 < depth:
+                    m.d.sync += slots[k].eq(slots[k + 1])
+                    m.d.comb += valid_next[k].eq(valid[k + 1])
+            with m.Else():
+                m.d.comb += valid_next[k].eq(valid[k])
+                with m.If(issue_col & col_sel[k + 1:].any() & (slots[k].age != self.starvation_limit)):
+                    m.d.sync += slots[k].age.eq(slots[k].age + 1)
+        m.d.sync += valid.eq(valid_next)
+
+        addr_col = self.i_addr[:spec.col_bits]
+        addr_bank = self.i_addr[spec.col_bits:spec.col_bits + spec.bank_bits]
+        addr_row = self.i_addr[spec.col_bits + spec.bank_bits:]
+        with m.If(self.i_valid & self.o_ready):
+            for k in range(depth):
+                with m.If(~valid_next[k] & (valid_next[k - 1] if k else 1)):
+                    m.d.sync += [
+                        slots[k].write.eq(self.i_write),
+                        slots[k].bank.eq(addr_bank),
+                        slots[k].row.eq(addr_row),
+                        slots[k].col.eq(addr_col[burst_bits:]),
+                        slots[k].tag.eq(self.i_tag),
+                        slots[k].wdata.eq(self.i_wdata),
+                        slots[k].age.eq(0),
+                        valid[k].eq(1),
+                    ]
+
+        # Command bus
+        cmd = Signal(Command)
+        ba = Signal(spec.bank_bits)
+        a = Signal(len(self.bus.a))
+        m.d.sync += cmd.eq(Command.NOP)
+        with m.If(issue_act):
+            m.d.sync += [cmd.eq(Command.ACTIVE), ba.eq(act_entry.bank), a.eq(act_entry.row)]
+        with m.If(issue_col):
+            m.d.sync += [
+                cmd.eq(Mux(col_entry.write, Command.WRITE, Command.READ)),
+                ba.eq(col_entry.bank),
+                a.eq(Cat(C(0, burst_bits), col_entry.col)),
+            ]
+        with m.If(issue_pre):
+            m.d.sync += [cmd.eq(Command.PRECHARGE), ba.eq(pre_bank), a.eq(0)]
+        with m.If(issue_pre_all):
+            m.d.sync += [cmd.eq(Command.PRECHARGE), a.eq(1 << spec.auto_precharge_bit)]
+        with m.If(issue_ref):
+            m.d.sync += cmd.eq(Command.REFRESH)
+        with m.If(issue_mode):
+            m.d.sync += [cmd.eq(Command.MODE_REGISTER_SET), ba.eq(0), a.eq(self.mode)]
+
+        # Mask the data bus until initialized
+        dqm = Signal(len(self.bus.dqm), init=(1 << len(self.bus.dqm)) - 1)
+        m.d.sync += dqm.eq(self.o_init_done.replicate(len(dqm)) ^ dqm.init)
+
+        m.d.comb += [
+            self.bus.clk_en.eq(1),
+            self.bus.cs.eq(1),
+            Cat(self.bus.we, self.bus.cas, self.bus.ras).eq(cmd),
+            self.bus.ba.eq(ba),
+            self.bus.a.eq(a),
+            self.bus.dqm.eq(dqm),
+        ]
+
+        # Write data, driven with the command and the following cycles
+        write_data = Signal(spec.data_bits * bl)
+        write_left = Signal(range(bl))
+        with m.If(issue_write):
+            m.d.sync += [
+                self.bus.dq_o.eq(col_entry.wdata[:spec.data_bits]),
+                self.bus.dq_oe.eq(1),
+                write_data.eq(col_entry.wdata >> spec.data_bits),
+                write_left.eq(bl - 1),
+            ]
+        with m.Elif(write_left != 0):
+            m.d.sync += [
+                self.bus.dq_o.eq(write_data[:spec.data_bits]),
+                write_data.eq(write_data >> spec.data_bits),
+                write_left.eq(write_left - 1),
+            ]
+        with m.Else():
+            m.d.sync += self.bus.dq_oe.eq(0)
+
+        m.d.sync += [
+            self.o_wack.eq(issue_write),
+            self.o_wtag.eq(col_entry.tag),
+        ]
+
+        # Read data arrives `cl + read_delay` cycles after the command
+        read_latency = cycles.cl + self.read_delay + 1
+        read_pipe = [Signal(name=f"read_pipe{i}") for i in range(read_latency)]
+        read_tags = [Signal(self.tag_bits, name=f"read_tag{i}") for i in range(read_latency)]
+        m.d.sync += [
+            read_pipe[0].eq(issue_read),
+            read_tags[0].eq(col_entry.tag),
+        ]
+        for i in range(1, read_latency):
+            m.d.sync += [
+                read_pipe[i].eq(read_pipe[i - 1]),
+                read_tags[i].eq(read_tags[i - 1]),
+            ]
+
+        read_left = Signal(range(bl))
+        read_tag = Signal(self.tag_bits)
+        m.d.sync += self.o_rdata.eq(self.bus.dq_i)
+        with m.If(read_pipe[-1]):
+            m.d.sync += [
+                self.o_rvalid.eq(1),
+                self.o_rlast.eq(bl == 1),
+                self.o_rtag.eq(read_tags[-1]),
+                read_tag.eq(read_tags[-1]),
+                read_left.eq(bl - 1),
+            ]
+        with m.Elif(read_left != 0):
+            m.d.sync += [
+                self.o_rvalid.eq(1),
+                self.o_rlast.eq(read_left == 1),
+                self.o_rtag.eq(read_tag),
+                read_left.eq(read_left - 1),
+            ]
+        with m.Else():
+            m.d.sync += [
+                self.o_rvalid.eq(0),
+                self.o_rlast.eq(0),
+            ]
+
+        return m
@@ -0,0 +1,87 @@
+from amaranth import *
+from amaranth.build import Platform
+from amaranth.lib import wiring
+from amaranth.lib.wiring import In, Out
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.timing import compile_timings_cached
+from typing import Optional
+
+# Refreshes JEDEC allows to be postponed, the longest time between two
+# AUTO REFRESH commands is `(jedec_max_postponed + 1) * t_refi`
+jedec_max_postponed = 8
+
+class RefreshScheduler(wiring.Component):
+    """AUTO REFRESH scheduler postponing refreshes during traffic
+
+    spec: SDRAM chip
+    frequency: Frequency of the `sync` domain
+    cl: CAS latency, by default the lowest one supported at `frequency`
+    max_postponed: Refreshes that may be owed before one is forced
+    interval: Cycles between refreshes, by default `t_refi`, the refresh
+        rate `t_ref / 2**row_bits` at `frequency`
+    counter_bits: Width of the statistics counters, which wrap around
+
+    A refresh is owed every `interval` cycles. Owed refreshes are requested
+    when the user is idle, so they are issued opportunistically between
+    accesses, and otherwise postponed until `max_postponed` are owed, then
+    the next one is forced.
+
+        i_idle: No accesses are waiting
+        i_refresh: AUTO REFRESH issued, refreshes issued when none is owed
+            are not credited
+        o_request: Issue a refresh, either while idle or forced
+        o_force: Issue a refresh before any other access
+        o_owed: Refreshes owed
+        o_postponed: Intervals that ended with a refresh still owed
+        o_forced: Refreshes issued while forced
+    """
+
+    def __init__(self, spec: SdramSpec, frequency: float, *, cl: Optional[int] = None,
+            max_postponed: int = jedec_max_postponed, interval: Optional[int] = None,
+            counter_bits: int = 16):
+
+        if not 0 <= max_postponed <= jedec_max_postponed:
+            raise ValueError(f"Bad number of postponed refreshes: {max_postponed}")
+
+        self.interval = interval or compile_timings_cached(spec, frequency, cl=cl).t_refi
+        if self.interval < 1:
+            raise ValueError(f"Bad refresh interval: {self.interval}")
+        self.max_postponed = max_postponed
+
+        super().__init__({
+            "i_idle": In(1),
+            "i_refresh": In(1),
+            "o_request": Out(1),
+            "o_force": Out(1),
+            "o_owed": Out(range(max_postponed + 2)),
+            "o_postponed": Out(counter_bits),
+            "o_forced": Out(counter_bits),
+        })
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        timer = Signal(range(self.interval), init=self.interval - 1)
+        tick = Signal()
+        m.d.comb += tick.eq(timer == 0)
+        m.d.sync += timer.eq(Mux(tick, self.interval - 1, timer - 1))
+
+        owed = self.o_owed
+        full = self.max_postponed + 1
+        credit = self.i_refresh & (owed != 0)
+        with m.If(tick & ~credit & (owed != full)):
+            m.d.sync += owed.eq(owed + 1)
+        with m.Elif(credit & ~tick):
+            m.d.sync += owed.eq(owed - 1)
+
+        m.d.comb += [
+            self.o_force.eq(owed == full),
+            self.o_request.eq(self.o_force | (self.i_idle & (owed != 0))),
+        ]
+
+        with m.If(tick & (owed != 0)):
+            m.d.sync += self.o_postponed.eq(self.o_postponed + 1)
+        with m.If(self.i_refresh & self.o_force):
+            m.d.sync += self.o_forced.eq(self.o_forced + 1)
+
+        return m
@@ -0,0 +1,137 @@
+from blip.cache import Cache
+from blip.component.sdram import SdramSpec, SdramTimings, TimingRange
+from dataclasses import dataclass
+from typing import Optional
+import math
+
+# Timings not described by the specs, JEDEC SDR SDRAM values met by the
+# supported parts: write recovery, activate to activate in different banks
+default_t_wr = 15.0
+default_t_rrd = 15.0
+min_t_wr_cycles = 2
+min_t_rrd_cycles = 2
+
+# Slack for floating point error when converting nanoseconds to cycles
+cycle_epsilon = 1e-6
+
+def cas_latency(mode: str) -> int:
+    """CAS latency of a `SdramSpec.timing` key, eg. `"cl3"` -> 3"""
+    if not mode.startswith("cl"):
+        raise ValueError(f"Bad SDRAM timing mode: {mode}")
+    return int(mode[2:])
+
+def min_cycles(t: Optional[float], t_ck: float, minimum: int = 1) -> int:
+    """Cycles to wait for at least `t` nanoseconds"""
+    if t is None:
+        return minimum
+    return max(math.ceil(t / t_ck - cycle_epsilon), minimum)
+
+def max_cycles(t: Optional[float], t_ck: float) -> Optional[int]:
+    """Cycles that take at most `t` nanoseconds"""
+    if t is None:
+        return None
+    return math.floor(t / t_ck + cycle_epsilon)
+
+def frequency_range(timings: SdramTimings) -> tuple[float, float]:
+    """Range of clock frequencies in Hz allowed by `t_ck`, `(0, inf)` if unlimited"""
+    t_ck = timings.t_ck
+    lo = 1e9 / t_ck.max if t_ck.max else 0.0
+    hi = 1e9 / t_ck.min if t_ck.min else math.inf
+    return lo, hi
+
+def period_in_range(t_ck: float, r: TimingRange) -> bool:
+    if r.min is not None and t_ck < r.min - cycle_epsilon:
+        return False
+    if r.max is not None and t_ck > r.max + cycle_epsilon:
+        return False
+    return True
+
+@dataclass(frozen=True)
+class SdramCycles:
+    """SDRAM timings in cycles of the controller clock
+
+    frequency: Controller and SDRAM clock frequency in Hz
+    cl: CAS latency, cycles from a read command to its first data word
+    t_rc: ACTIVE to ACTIVE in the same bank, also used for AUTO REFRESH
+    t_ras: ACTIVE to PRECHARGE
+    t_ras_max: Longest a row may stay open, `None` if unlimited
+    t_rp: PRECHARGE to ACTIVE
+    t_rcd: ACTIVE to READ/WRITE
+    t_mrd: MODE REGISTER SET to any command
+    t_xsr: Self refresh exit to any command
+    t_wr: Last write data to PRECHARGE
+    t_rrd: ACTIVE to ACTIVE in different banks
+    t_refi: Average interval between AUTO REFRESH commands
+    """
+
+    frequency: float
+    cl: int
+    t_rc: int
+    t_ras: int
+    t_ras_max: Optional[int]
+    t_rp: int
+    t_rcd: int
+    t_mrd: int
+    t_xsr: int
+    t_wr: int
+    t_rrd: int
+    t_refi: int
+
+def compile_timings(spec: SdramSpec, frequency: float, *, cl: Optional[int] = None) -> SdramCycles:
+    """Convert the timings of `spec` to cycles at `frequency`
+
+    cl: CAS latency to use, by default the lowest one supporting `frequency`
+
+    Raises `ValueError` if no timing mode of the spec supports the clock.
+    """
+
+    t_ck = 1e9 / frequency
+    modes = sorted(spec.timing.items(), key=lambda kv: cas_latency(kv[0]))
+    for mode, timings in modes:
+        mode_cl = cas_latency(mode)
+        if cl is not None and mode_cl != cl:
+            continue
+        if not period_in_range(t_ck, timings.t_ck):
+            continue
+
+        rows = 1 << spec.row_bits
+        t_refi = max_cycles(timings.t_ref.max / rows, t_ck) if timings.t_ref.max is not None else None
+        if not t_refi:
+            raise ValueError(f"SDRAM {spec.info.name} has no refresh interval")
+        t_rp = min_cycles(timings.t_rp.min, t_ck)
+        t_ras = min_cycles(timings.t_ras.min, t_ck)
+        return SdramCycles(
+            frequency = frequency,
+            cl = mode_cl,
+            t_rc = max(min_cycles(timings.t_rc.min, t_ck), t_ras + t_rp),
+            t_ras = t_ras,
+            t_ras_max = max_cycles(timings.t_ras.max, t_ck),
+            t_rp = t_rp,
+            t_rcd = min_cycles(timings.t_rcd.min, t_ck),
+            t_mrd = min_cycles(timings.t_mrd.min, t_ck),
+            t_xsr = min_cycles(timings.t_xsr.min, t_ck),
+            t_wr = min_cycles(default_t_wr, t_ck, min_t_wr_cycles),
+            t_rrd = min_cycles(default_t_rrd, t_ck, min_t_rrd_cycles),
+            t_refi = t_refi,
+        )
+
+    cl_text = f" with CL{cl}" if cl is not None else ""
+    raise ValueError(f"SDRAM {spec.info.name} does not support {frequency / 1e6:g}MHz{cl_text}")
+
+# Bump when `compile_timings()` may return different results for the same inputs
+compiler_version = 1
+
+timing_cache = Cache("sdram_timing", compiler_version, max_disk=0)
+
+def timings_key(spec: SdramSpec):
+    return (spec.row_bits, repr(sorted(spec.timing.items())))
+
+def compile_timings_cached(spec: SdramSpec, frequency: float, *, cl: Optional[int] = None) -> SdramCycles:
+    """Memoized `compile_timings()`, see `timing_cache.stats` for hit rates
+
+    Keyed by the timings and not the identity of `spec`, so equivalent
+    specs, eg. merged from the same parts, share entries. Errors are not
+    memoized.
+    """
+    key = (timings_key(spec), float(frequency), cl)
+    return timing_cache.get(key, lambda: compile_timings(spec, frequency, cl=cl))
@@ -0,0 +1,60 @@
+from amaranth import *
+from amaranth.build import Platform
+from amaranth.lib import wiring
+from amaranth.lib.wiring import In, Out
+
+def uart_divisor(frequency: float, baud_rate: int) -> int:
+    """Cycles per bit at `frequency`, raises `ValueError` if the error is over 2%"""
+    divisor = round(frequency / baud_rate)
+    if divisor < 1 or abs(frequency / divisor - baud_rate) > 0.02 * baud_rate:
+        raise ValueError(f"Can't generate {baud_rate} baud from {frequency / 1e6:g}MHz")
+    return divisor
+
+class UartTx(wiring.Component):
+    """8N1 UART transmitter
+
+    divisor: Cycles per bit, see `uart_divisor()`
+
+        i_valid, o_ready: Handshake, a byte is accepted when both are high
+        i_data: Byte to send
+        o_tx: Serial output, high when idle
+    """
+
+    def __init__(self, divisor: int):
+        self.divisor = divisor
+        super().__init__({
+            "i_valid": In(1),
+            "o_ready": Out(1),
+            "i_data": In(8),
+            "o_tx": Out(1, init=1),
+        })
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        # Start bit, data LSB first, stop bit
+        shift = Signal(10, init=1)
+        bits = Signal(range(11))
+        timer = Signal(range(self.divisor))
+
+        m.d.comb += [
+            self.o_ready.eq(bits == 0),
+            self.o_tx.eq(shift[0]),
+        ]
+
+        with m.If(self.i_valid & self.o_ready):
+            m.d.sync += [
+                shift.eq(Cat(0, self.i_data, 1)),
+                bits.eq(10),
+                timer.eq(self.divisor - 1),
+            ]
+        with m.Elif(bits != 0):
+            m.d.sync += timer.eq(timer - 1)
+            with m.If(timer == 0):
+                m.d.sync += [
+                    shift.eq(Cat(shift[1:], 1)),
+                    bits.eq(bits - 1),
+                    timer.eq(self.divisor - 1),
+                ]
+
+        return m
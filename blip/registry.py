@@ -0,0 +1,64 @@
+from typing import Any, Iterator
+import importlib
+
+class LazyRegistry:
+    """Registry of named plugins that are only imported when first used
+
+    group: Package entry point group to look up names missing from `targets`
+    targets: Map from names to `"module:attribute"` import targets
+
+    Registering an object directly, eg. from a decorator in the module the
+    target points to, replaces the import target. Entry points are only
+    scanned if a name is not declared statically, as reading the installed
+    package metadata is slow compared to the rest of the lookup.
+    """
+
+    def __init__(self, group: str, targets: dict[str, str]):
+        self.group = group
+        self.entries: dict[str, Any] = dict(targets)
+        self.entry_points_loaded = False
+
+    def register(self, name: str, value: Any):
+        self.entries[name] = value
+
+    def _load_entry_points(self):
+        if self.entry_points_loaded:
+            return
+        self.entry_points_loaded = True
+
+        from importlib.metadata import entry_points
+        for ep in entry_points(group=self.group):
+            self.entries.setdefault(ep.name, ep.value)
+
+    def _find(self, name: str):
+        if name not in self.entries:
+            self._load_entry_points()
+        return self.entries.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def __getitem__(self, name: str) -> Any:
+        entry = self._find(name)
+        if entry is None:
+            raise KeyError(name)
+        if isinstance(entry, str):
+            module_name, _, attr = entry.partition(":")
+            module = importlib.import_module(module_name)
+            # The module may have registered the name while being imported
+            entry = self.entries[name]
+            if isinstance(entry, str):
+                entry = getattr(module, attr)
+                self.entries[name] = entry
+        return entry
+
+    def get(self, name: str, default=None) -> Any:
+        return self[name] if name in self else default
+
+    def names(self) -> list[str]:
+        """List all names without importing them"""
+        self._load_entry_points()
+        return sorted(self.entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names())
@@ -0,0 +1,3 @@
+from .trace import TraceOptions
+from .simulator import BoardSimulator
+from .profile import ProfileOptions
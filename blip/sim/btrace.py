@@ -0,0 +1,259 @@
+"""Compact binary waveform traces
+
+Traces are stored per signal in chunks of up to `chunk_size` transitions.
+Each chunk holds two zlib compressed columns, delta encoded timestamps and
+values, and an index of the chunks is stored in the footer of the file:
+
+    magic       b"BLIPTRC1"
+    chunks      (u32 times_len, u32 values_len, times, values)*
+    index       zlib compressed JSON, see `TraceWriter.close()`
+    footer      u64 index offset, u64 index length, b"BLIPTRC1"
+
+The index lets `TraceReader` find the value of a signal at any time, or its
+transitions within a window, by decoding only the chunks that overlap it.
+All times are in femtoseconds, like the simulator and VCD files.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+import heapq
+import json
+import struct
+import zlib
+import numpy as np
+
+magic = b"BLIPTRC1"
+version = 1
+
+chunk_header = struct.Struct("<II")
+footer = struct.Struct("<QQ8s")
+
+def encode_values(values: list[int], width: int) -> bytes:
+    if width <= 64:
+        return np.array(values, dtype=np.uint64).tobytes()
+    else:
+        size = (width + 7) // 8
+        return b"".join(v.to_bytes(size, "little") for v in values)
+
+def decode_values(data: bytes, width: int):
+    if width <= 64:
+        return np.frombuffer(data, dtype=np.uint64)
+    else:
+        size = (width + 7) // 8
+        return [int.from_bytes(data[i:i+size], "little") for i in range(0, len(data), size)]
+
+@dataclass
+class ChunkInfo:
+    t_first: int
+    t_last: int
+    offset: int
+    length: int
+    count: int
+
+@dataclass
+class SignalInfo:
+    name: str
+    width: int
+    chunks: list[ChunkInfo]
+
+class TraceWriter:
+    """Writes transitions of a fixed set of signals to a binary trace
+
+    file: Path or binary file object to write to
+    signals: `(name, width)` of each signal, referred to by index
+    chunk_size: Maximum number of transitions in a chunk
+    """
+
+    def __init__(self, file, signals: list[tuple[str, int]], *, chunk_size: int = 4096):
+        self.close_file = isinstance(file, str)
+        self.file: BinaryIO = open(file, "wb") if self.close_file else file
+        self.signals = [SignalInfo(name, width, []) for name, width in signals]
+        self.masks = [(1 << width) - 1 for _, width in signals]
+        self.chunk_size = chunk_size
+        self.times: list[list[int]] = [[] for _ in signals]
+        self.values: list[list[int]] = [[] for _ in signals]
+        self.last_values: list[Optional[int]] = [None for _ in signals]
+        self.start: Optional[int] = None
+        self.file.write(magic)
+
+    def change(self, index: int, timestamp: int, value: int):
+        if self.start is None:
+            self.start = timestamp
+        times, values = self.times[index], self.values[index]
+        value &= self.masks[index]
+        if times and times[-1] == timestamp:
+            # Only keep the settled value of each timestamp
+            values[-1] = value
+            prev = values[-2] if len(values) >= 2 else self.last_values[index]
+            if prev == value:
+                times.pop()
+                values.pop()
+            return
+        prev = values[-1] if values else self.last_values[index]
+        if prev == value:
+            return
+        # Full chunks are only written once the timestep of their last change
+        # is over, so it can still be settled or dropped above
+        if len(times) >= self.chunk_size:
+            self.flush(index)
+        times.append(timestamp)
+        values.append(value)
+
+    def flush(self, index: int):
+        times, values = self.times[index], self.values[index]
+        if not times:
+            return
+        signal = self.signals[index]
+
+        deltas = np.diff(np.array(times, dtype=np.int64), prepend=np.int64(0))
+        times_data = zlib.compress(deltas.tobytes())
+        values_data = zlib.compress(encode_values(values, signal.width))
+
+        offset = self.file.tell()
+        self.file.write(chunk_header.pack(len(times_data), len(values_data)))
+        self.file.write(times_data)
+        self.file.write(values_data)
+        signal.chunks.append(ChunkInfo(times[0], times[-1], offset, self.file.tell() - offset, len(times)))
+
+        # Keep the last value so changes in the next chunk can be deduplicated
+        self.last_values[index] = values[-1]
+        times.clear()
+        values.clear()
+
+    def close(self, timestamp: int):
+        for index in range(len(self.signals)):
+            self.flush(index)
+
+        index = {
+            "version": version,
+            "start": self.start if self.start is not None else timestamp,
+            "end": timestamp,
+            "signals": [{
+                "name": signal.name,
+                "width": signal.width,
+                "chunks": [[c.t_first, c.t_last, c.offset, c.length, c.count] for c in signal.chunks],
+            } for signal in self.signals],
+        }
+        index_data = zlib.compress(json.dumps(index).encode("utf-8"))
+        index_offset = self.file.tell()
+        self.file.write(index_data)
+        self.file.write(footer.pack(index_offset, len(index_data), magic))
+
+        if self.close_file:
+            self.file.close()
+
+class TraceReader:
+    """Random access to a binary trace written by `TraceWriter`
+
+    Only the index is read on open, chunks are decoded on demand with the
+    most recently used one of each signal kept around for repeated queries.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        if self.file.read(len(magic)) != magic:
+            raise ValueError(f"Not a binary trace: {path}")
+
+        self.file.seek(-footer.size, 2)
+        index_offset, index_length, end_magic = footer.unpack(self.file.read(footer.size))
+        if end_magic != magic:
+            raise ValueError(f"Truncated binary trace: {path}")
+        self.file.seek(index_offset)
+        index = json.loads(zlib.decompress(self.file.read(index_length)))
+        if index["version"] != version:
+            raise ValueError(f"Unsupported binary trace version: {index['version']}")
+
+        self.start: int = index["start"]
+        self.end: int = index["end"]
+        self.signals: dict[str, SignalInfo] = { }
+        for s in index["signals"]:
+            chunks = [ChunkInfo(*c) for c in s["chunks"]]
+            self.signals[s["name"]] = SignalInfo(s["name"], s["width"], chunks)
+        self._chunk_starts = { name: [c.t_first for c in s.chunks] for name, s in self.signals.items() }
+        self._decoded: dict[str, tuple[int, np.ndarray, object]] = { }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def _decode(self, name: str, chunk_index: int):
+        decoded = self._decoded.get(name)
+        if decoded and decoded[0] == chunk_index:
+            return decoded[1], decoded[2]
+
+        signal = self.signals[name]
+        chunk = signal.chunks[chunk_index]
+        self.file.seek(chunk.offset)
+        times_len, values_len = chunk_header.unpack(self.file.read(chunk_header.size))
+        times = np.cumsum(np.frombuffer(zlib.decompress(self.file.read(times_len)), dtype=np.int64))
+        values = decode_values(zlib.decompress(self.file.read(values_len)), signal.width)
+
+        self._decoded[name] = (chunk_index, times, values)
+        return times, values
+
+    def value_at(self, name: str, time: int) -> Optional[int]:
+        """Value of signal `name` at `time`, `None` if before the trace starts"""
+
+        chunk_index = bisect_right(self._chunk_starts[name], time) - 1
+        if chunk_index < 0:
+            return None
+        times, values = self._decode(name, chunk_index)
+        ix = int(np.searchsorted(times, time, side="right")) - 1
+        return int(values[ix])
+
+    def transitions(self, name: str, start: Optional[int] = None, stop: Optional[int] = None) -> Iterator[tuple[int, int]]:
+        """Iterate `(time, value)` transitions of signal `name` within `[start, stop]`"""
+
+        signal = self.signals[name]
+        first = 0
+        if start is not None:
+            first = max(bisect_right(self._chunk_starts[name], start) - 1, 0)
+        for chunk_index in range(first, len(signal.chunks)):
+            chunk = signal.chunks[chunk_index]
+            if stop is not None and chunk.t_first > stop:
+                break
+            if start is not None and chunk.t_last < start:
+                continue
+            times, values = self._decode(name, chunk_index)
+            lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            hi = len(times) if stop is None else int(np.searchsorted(times, stop, side="right"))
+            for ix in range(lo, hi):
+                yield int(times[ix]), int(values[ix])
+
+    def to_vcd(self, vcd_file):
+        """Convert the trace to a VCD file for waveform viewers"""
+
+        import vcd
+
+        close_file = isinstance(vcd_file, str)
+        if close_file:
+            vcd_file = open(vcd_file, "w")
+
+        try:
+            writer = vcd.VCDWriter(vcd_file, timescale="1 fs", comment="Generated by blip",
+                init_timestamp=self.start)
+            def stream(n, name, var):
+                for time, value in self.transitions(name):
+                    yield time, n, value, var
+
+            streams = []
+            for n, (name, signal) in enumerate(self.signals.items()):
+                *scope, var_name = name.split(".")
+                init = self.value_at(name, self.start)
+                var = writer.register_var(scope=scope, name=var_name, var_type="wire",
+                    size=signal.width, init=init if init is not None else "x")
+                streams.append(stream(n, name, var))
+
+            for time, _, value, var in heapq.merge(*streams, key=lambda t: (t[0], t[1])):
+                if time > self.start:
+                    writer.change(var, time, value)
+            writer.close(self.end)
+        finally:
+            if close_file:
+                vcd_file.close()
@@ -0,0 +1,85 @@
+"""Access to simulator engine internals
+
+Every private amaranth (and pyvcd) API used by the simulation code goes
+through this module, the releases it was checked against are listed in
+`tested_versions`. The toolchain lookups of `blip.build` are the only other
+private amaranth APIs used.
+
+Amaranth only exposes waveform writing through `Simulator.write_vcd()`, which
+can't be started once the simulation has advanced and always traces every
+signal. The pysim engine however supports any number of observers with the
+same interface as its VCD writer, which is what everything here builds on:
+
+    fs_per_delta: int
+    update_signal(timestamp: int, signal: Signal)
+    update_memory(timestamp: int, memory: MemoryData, addr: int)
+    close(timestamp: int)
+"""
+
+from amaranth.sim import Simulator
+from amaranth.sim.pysim import PySimEngine, _VCDWriter
+from amaranth.hdl._ast import SignalDict
+from amaranth.hdl._mem import MemoryInstance
+import amaranth
+import re
+import warnings
+
+def parse_version(version: str) -> tuple[int, int]:
+    match = re.match(r"(\d+)\.(\d+)", version)
+    return (int(match[1]), int(match[2])) if match else (0, 0)
+
+# Amaranth releases the internals used here have been checked against, see
+# the amaranth requirement in CI
+tested_versions = {(0, 5)}
+amaranth_version = parse_version(amaranth.__version__)
+
+def internals_tested() -> bool:
+    """Whether the installed amaranth is a release the internals were checked against"""
+    return amaranth_version in tested_versions
+
+def check_engine(sim: Simulator):
+    if not isinstance(sim._engine, PySimEngine):
+        raise TypeError(f"Unsupported simulator engine: {type(sim._engine).__name__}")
+    if not internals_tested() and not getattr(check_engine, "warned", False):
+        check_engine.warned = True
+        warnings.warn(f"Simulator internals are untested with amaranth {amaranth.__version__}, "
+            "tracing and sampling may not work", RuntimeWarning, stacklevel=3)
+
+def attach_observer(sim: Simulator, observer):
+    check_engine(sim)
+    sim._engine._vcd_writers.append(observer)
+
+def detach_observer(sim: Simulator, observer):
+    sim._engine._vcd_writers.remove(observer)
+
+def engine_state(sim: Simulator):
+    return sim._engine.state
+
+def design(sim: Simulator):
+    return sim._design
+
+def now_fs(sim: Simulator) -> int:
+    return sim._engine.now
+
+def get_value(sim: Simulator, value) -> int:
+    return sim._engine.get_value(value)
+
+def domain(sim: Simulator, name: str):
+    return sim._design.fragment.domains[name]
+
+def is_memory(fragment) -> bool:
+    return isinstance(fragment, MemoryInstance)
+
+def create_vcd_writer(sim: Simulator, design, path: str):
+    """VCD observer of the signals of `design`, starting at the current time
+
+    `design` may be a filtered view as returned by `blip.sim.trace.filter_design()`.
+    """
+
+    check_engine(sim)
+    # Initial values are sampled when the writer is created
+    writer = _VCDWriter(sim._engine.state, design, vcd_file=path)
+    if writer.vcd_writer:
+        # Dump the initial values at the start of the window instead of time 0
+        writer.vcd_writer._timestamp = sim._engine.now
+    return writer
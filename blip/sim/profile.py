@@ -0,0 +1,254 @@
+"""Simulation profiling
+
+`SimProfiler` is attached to a `BoardSimulator` created with `ProfileOptions`
+and attributes the wall time spent in `advance()` to:
+
+    processes   each process and testbench added to the simulator, including
+                the clock scheduler of `SimArch`, timed per resumption
+    observers   trace writers and other engine observers
+    rtl         the rest, evaluating the design and native clocks
+
+Optionally the simulation thread can be sampled to find hot Python functions
+within any of these, without the overhead of a deterministic profiler.
+"""
+
+from dataclasses import dataclass
+from collections import Counter
+from typing import Optional
+import json
+import os
+import sys
+import threading
+import time
+
+@dataclass
+class ProfileOptions:
+    """Simulation profiling options
+
+    sample_interval: Interval in seconds to sample the simulation thread
+        stack at, `None` to disable sampling
+    count_updates: Count signal updates, requires observing every change
+    top: Number of hottest functions to report from sampling
+    """
+
+    sample_interval: Optional[float] = None
+    count_updates: bool = True
+    top: int = 20
+
+@dataclass
+class TaskStats:
+    name: str
+    kind: str
+    wall_time: float = 0.0
+    resumes: int = 0
+
+class TimedAwait:
+    """Await a coroutine timing every resumption of it"""
+
+    def __init__(self, coroutine, stats: TaskStats):
+        self.coroutine = coroutine
+        self.stats = stats
+
+    def __await__(self):
+        it = self.coroutine.__await__()
+        stats = self.stats
+        value, error = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                yielded = it.throw(error) if error is not None else it.send(value)
+            except StopIteration as e:
+                stats.wall_time += time.perf_counter() - start
+                stats.resumes += 1
+                return e.value
+            stats.wall_time += time.perf_counter() - start
+            stats.resumes += 1
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+class TimedObserver:
+    """Engine observer proxy timing the wrapped observer"""
+
+    def __init__(self, observer, stats: TaskStats):
+        self.observer = observer
+        self.stats = stats
+        self.fs_per_delta = observer.fs_per_delta
+
+    def update_signal(self, timestamp, signal):
+        start = time.perf_counter()
+        self.observer.update_signal(timestamp, signal)
+        self.stats.wall_time += time.perf_counter() - start
+        self.stats.resumes += 1
+
+    def update_memory(self, timestamp, memory, addr):
+        start = time.perf_counter()
+        self.observer.update_memory(timestamp, memory, addr)
+        self.stats.wall_time += time.perf_counter() - start
+        self.stats.resumes += 1
+
+    def close(self, timestamp):
+        start = time.perf_counter()
+        self.observer.close(timestamp)
+        self.stats.wall_time += time.perf_counter() - start
+
+class UpdateCounter:
+    """Engine observer counting signal and memory updates"""
+
+    fs_per_delta = 0
+
+    def __init__(self):
+        self.updates = 0
+
+    def update_signal(self, timestamp, signal):
+        self.updates += 1
+
+    def update_memory(self, timestamp, memory, addr):
+        self.updates += 1
+
+    def close(self, timestamp):
+        pass
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Samples the stack of a thread from a background thread"""
+
+    def __init__(self, interval: float, thread_id: int):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.active = False
+        self.samples = 0
+        self.self_counts: Counter[str] = Counter()
+        self.total_counts: Counter[str] = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="blip-sim-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[frame_name(frame)] += 1
+            seen = set()
+            while frame is not None:
+                name = frame_name(frame)
+                if name not in seen:
+                    seen.add(name)
+                    self.total_counts[name] += 1
+                frame = frame.f_back
+
+class SimProfiler:
+    """Collects the profile of a `BoardSimulator`, see the module docstring"""
+
+    def __init__(self, options: ProfileOptions):
+        self.options = options
+        self.tasks: list[TaskStats] = []
+        self.observers: list[TaskStats] = []
+        self.steps = 0
+        self.wall_time = 0.0
+        self.sim_time_fs = 0
+        self.counter = UpdateCounter() if options.count_updates else None
+        self.sampler = None
+        if options.sample_interval:
+            self.sampler = StackSampler(options.sample_interval, threading.get_ident())
+            self.sampler.start()
+
+    def wrap_process(self, constructor, kind: str):
+        stats = TaskStats(getattr(constructor, "__qualname__", repr(constructor)), kind)
+        self.tasks.append(stats)
+        async def timed(ctx):
+            return await TimedAwait(constructor(ctx), stats)
+        return timed
+
+    def wrap_observer(self, observer, name: str) -> TimedObserver:
+        stats = TaskStats(name, "observer")
+        self.observers.append(stats)
+        return TimedObserver(observer, stats)
+
+    def begin_step(self):
+        if self.sampler:
+            self.sampler.active = True
+        return time.perf_counter()
+
+    def end_step(self, start: float, now_fs: int):
+        self.wall_time += time.perf_counter() - start
+        self.steps += 1
+        self.sim_time_fs = now_fs
+        if self.sampler:
+            self.sampler.active = False
+
+    def close(self):
+        if self.sampler:
+            self.sampler.stop()
+
+    def report(self) -> dict:
+        """Machine readable profile, times are in seconds"""
+
+        wall_time = self.wall_time
+        sim_time = self.sim_time_fs / 1e15
+        process_time = sum(t.wall_time for t in self.tasks)
+        observer_time = sum(t.wall_time for t in self.observers)
+        report = {
+            "wall_time": wall_time,
+            "sim_time": sim_time,
+            "sim_to_wall": sim_time / wall_time if wall_time else 0.0,
+            "steps": self.steps,
+            "steps_per_second": self.steps / wall_time if wall_time else 0.0,
+            "signal_updates": self.counter.updates if self.counter else None,
+            "signal_updates_per_second": (self.counter.updates / wall_time
+                if self.counter and wall_time else None),
+            "processes": [vars(t) for t in self.tasks],
+            "observers": [vars(t) for t in self.observers],
+            "breakdown": {
+                "processes": process_time,
+                "tracing": observer_time,
+                "rtl": max(wall_time - process_time - observer_time, 0.0),
+            },
+        }
+        if self.sampler:
+            top = self.options.top
+            report["samples"] = {
+                "interval": self.sampler.interval,
+                "count": self.sampler.samples,
+                "self": self.sampler.self_counts.most_common(top),
+                "total": self.sampler.total_counts.most_common(top),
+            }
+        return report
+
+    def write_json(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self) -> str:
+        r = self.report()
+        wall_time = r["wall_time"] or 1e-12
+        lines = [
+            f"Simulated {r['sim_time'] * 1e6:.3f}us in {r['wall_time']:.3f}s"
+            f" ({r['sim_to_wall']:.3g} sim/wall), {r['steps']} steps ({r['steps_per_second']:.0f}/s)",
+        ]
+        if r["signal_updates"] is not None:
+            lines.append(f"{r['signal_updates']} signal updates ({r['signal_updates_per_second']:.0f}/s)")
+        for name, t in r["breakdown"].items():
+            lines.append(f"  {name:<12} {t:>8.3f}s {100 * t / wall_time:>5.1f}%")
+        for t in r["processes"] + r["observers"]:
+            lines.append(f"    {t['kind']:<10} {t['name']:<48} {t['wall_time']:>8.3f}s {t['resumes']:>9} resumes")
+        if "samples" in r:
+            lines.append(f"Hottest functions ({r['samples']['count']} samples):")
+            for name, count in r["samples"]["self"][:10]:
+                lines.append(f"  {count:>6} {name}")
+        return "\n".join(lines)
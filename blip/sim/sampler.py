@@ -0,0 +1,94 @@
+from amaranth.hdl import Value, ClockDomain
+from amaranth.sim import Simulator
+from typing import Callable, Optional, Union
+import numpy as np
+from blip.sim import engine
+
+class Sampler:
+    """Records signals at every active edge of a clock domain into arrays
+
+    sim: Simulator to record from
+    domain: Clock domain name or object to sample on
+    signals: Values to record by name
+    capacity: Number of samples to preallocate
+    on_chunk: Called with `(times, data)` whenever `capacity` samples have been
+        recorded, after which recording continues from the start of the arrays.
+        If not set, samples past `capacity` are dropped and counted in `dropped`.
+
+    Values are recorded as seen by the registers of the domain at the edge,
+    ie. before any of them update. Recording is done by a background Python
+    process resumed at every active edge of the domain, which costs about as
+    much per edge as a testbench waiting on the clock, but keeps the samples
+    in arrays instead of Python objects. As with other processes, samplers
+    must be added before the simulation is started. Values up to 64 bits are
+    stored as `int64`, wider ones as Python integers.
+    """
+
+    def __init__(self, sim: Simulator, domain: Union[str, ClockDomain], signals: dict[str, Value], *,
+            capacity: int = 65536, on_chunk: Optional[Callable[[np.ndarray, dict[str, np.ndarray]], None]] = None):
+        if isinstance(domain, str):
+            domain = engine.domain(sim, domain)
+
+        self.sim = sim
+        self.domain = domain
+        self.capacity = capacity
+        self.on_chunk = on_chunk
+        self.count = 0
+        self.dropped = 0
+        self.attached = True
+
+        self.time_column = np.zeros(capacity, dtype=np.int64)
+        self.columns: dict[str, np.ndarray] = { }
+        self.values = []
+        for name, value in signals.items():
+            value = Value.cast(value)
+            dtype = np.int64 if len(value) <= 63 or (len(value) == 64 and value.shape().signed) else object
+            self.columns[name] = np.zeros(capacity, dtype=dtype)
+            self.values.append(value)
+
+        sim.add_process(self.process)
+
+    async def process(self, ctx):
+        sim = self.sim
+        time_column = self.time_column
+        columns = list(self.columns.values())
+        async for clk_edge, _, *values in ctx.tick(self.domain).sample(*self.values):
+            if not self.attached:
+                return
+            if not clk_edge:
+                # Asynchronous reset
+                continue
+
+            index = self.count
+            if index == self.capacity:
+                self.dropped += 1
+                continue
+
+            time_column[index] = engine.now_fs(sim)
+            for column, value in zip(columns, values):
+                column[index] = value
+
+            self.count = index + 1
+            if self.count == self.capacity and self.on_chunk:
+                self.flush()
+
+    def flush(self):
+        """Pass recorded samples to `on_chunk` and start over"""
+        if self.on_chunk and self.count > 0:
+            self.on_chunk(self.times, self.data)
+            self.count = 0
+
+    @property
+    def times(self) -> np.ndarray:
+        """Timestamps of the recorded samples in femtoseconds"""
+        return self.time_column[:self.count]
+
+    @property
+    def data(self) -> dict[str, np.ndarray]:
+        """Recorded samples of each signal, views into the preallocated arrays"""
+        return { name: column[:self.count] for name, column in self.columns.items() }
+
+    def detach(self):
+        """Stop recording and pass any remaining samples to `on_chunk`"""
+        self.attached = False
+        self.flush()
@@ -0,0 +1,340 @@
+"""Behavioral SDRAM model
+
+`SdramModel` stands in for an SDR SDRAM chip on the pins of a
+`SdramBusSignature`, it is attached to simulations by `SimBoard.get_sdram()`.
+
+Storage is allocated one row at a time on the first write to it, so only the
+touched parts of even a large chip take memory. The model only wakes up on
+every clock edge while commands or bursts are active on the bus, when idle it
+waits for the command lines to change.
+
+Commands are checked against the `SdramTimings` of the CAS latency set in the
+mode register, in simulation time rather than cycles, and every row has to be
+refreshed within `t_ref`, late by at most the refreshes JEDEC allows to be
+postponed.
+"""
+
+from amaranth.sim import Simulator
+from blip.component.sdram import SdramSpec, SdramTimings
+from blip.component.sdram.refresh import jedec_max_postponed
+from blip.sim import engine
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+fs_per_ns = 10**6
+
+# Commands as `(ras, cas, we)`, matching `blip.component.sdram.controller.Command`
+NOP = 0b000
+BURST_TERMINATE = 0b001
+READ = 0b010
+WRITE = 0b011
+ACTIVE = 0b100
+PRECHARGE = 0b101
+REFRESH = 0b110
+MODE_REGISTER_SET = 0b111
+
+command_names = {
+    NOP: "NOP", BURST_TERMINATE: "BURST TERMINATE", READ: "READ", WRITE: "WRITE",
+    ACTIVE: "ACTIVE", PRECHARGE: "PRECHARGE", REFRESH: "AUTO REFRESH",
+    MODE_REGISTER_SET: "MODE REGISTER SET",
+}
+
+@dataclass
+class TimingViolation:
+    """Command issued too early, or too late for `t_ras` and `t_ref`
+
+    time: Simulation time of the command in seconds
+    timing: Name of the violated timing, eg. `"t_rcd"`
+    command: Name of the command
+    bank: Bank of the command, `None` for commands to every bank
+    required: Required time in nanoseconds
+    actual: Time since the constraining command in nanoseconds
+    """
+
+    time: float
+    timing: str
+    command: str
+    bank: Optional[int]
+    required: float
+    actual: float
+
+    def __str__(self):
+        bank = f" bank {self.bank}" if self.bank is not None else ""
+        return (f"{self.timing} violated by {self.command}{bank} at {format_time(round(self.time * 1e15))}: "
+            f"{self.actual:.3f}ns, required {self.required:.3f}ns")
+
+def format_time(fs: int) -> str:
+    return f"{fs / 1e9:.3f}us"
+
+class SdramTimingError(AssertionError):
+    pass
+
+class SdramModel:
+    """Behavioral model of the SDRAM chip `spec` driven through `bus`
+
+    bus: Interface with the members of `SdramBusSignature`, as seen by the chip
+    domain: Clock domain the chip is clocked by
+    strict: Raise `SdramTimingError` on violations instead of only recording
+        them in `violations`, commands the chip can't execute, eg. to a bank
+        without an open row, always raise
+    max_postponed: Average refresh intervals a row may be refreshed late by
+
+    Refresh deadlines are only checked when the chip is woken up by a
+    command, so a missed deadline is reported by the next one. Everything
+    but the storage is reset when a simulation starts, `write()` and
+    `read()` access the storage directly, eg. to preload data or check
+    results, `reset()` clears it.
+    """
+
+    def __init__(self, spec: SdramSpec, bus, *, domain: str = "sync", strict: bool = True,
+            max_postponed: int = jedec_max_postponed):
+        self.spec = spec
+        self.bus = bus
+        self.domain = domain
+        self.strict = strict
+        self.max_postponed = max_postponed
+        self.dtype = np.uint8 if spec.data_bits <= 8 else np.uint16 if spec.data_bits <= 16 else np.uint32
+        self.banks = 1 << spec.bank_bits
+        self.rows = 1 << spec.row_bits
+        self.reset()
+
+    def reset(self):
+        self.pages: dict[int, np.ndarray] = { }
+        self.reset_state()
+
+    def reset_state(self):
+        self.violations: list[TimingViolation] = []
+        self.commands: dict[str, int] = { name: 0 for name in command_names.values() }
+        self.mode: Optional[int] = None
+        self.burst_length = 1
+        self.cl: Optional[int] = None
+        self.timings: Optional[SdramTimings] = None
+        self.wake_ups = 0
+
+    # Storage
+
+    def page_key(self, bank: int, row: int) -> int:
+        return bank << self.spec.row_bits | row
+
+    def split(self, addr: int) -> tuple[int, int, int]:
+        """Split a word address as `row | bank | column` like `SdramController`"""
+        spec = self.spec
+        col = addr & ((1 << spec.col_bits) - 1)
+        bank = (addr >> spec.col_bits) & (self.banks - 1)
+        row = addr >> (spec.col_bits + spec.bank_bits)
+        return bank, row, col
+
+    def page(self, bank: int, row: int, *, create: bool) -> Optional[np.ndarray]:
+        key = self.page_key(bank, row)
+        page = self.pages.get(key)
+        if page is None and create:
+            page = np.zeros(1 << self.spec.col_bits, dtype=self.dtype)
+            self.pages[key] = page
+        return page
+
+    def write(self, addr: int, words):
+        """Store `words` from word address `addr` within a row"""
+        words = np.asarray(words, dtype=self.dtype)
+        bank, row, col = self.split(addr)
+        self.page(bank, row, create=True)[col:col + len(words)] = words
+
+    def read(self, addr: int, count: int) -> np.ndarray:
+        """Load `count` words from word address `addr` within a row"""
+        bank, row, col = self.split(addr)
+        page = self.page(bank, row, create=False)
+        if page is None:
+            return np.zeros(count, dtype=self.dtype)
+        return page[col:col + count].copy()
+
+    # Timing checks
+
+    def violation(self, now_fs: int, timing: str, command: int, bank: Optional[int],
+            required_ns: float, actual_fs: int):
+        v = TimingViolation(now_fs / 1e15, timing, command_names[command], bank,
+            required_ns, actual_fs / fs_per_ns)
+        self.violations.append(v)
+        if self.strict:
+            raise SdramTimingError(str(v))
+
+    def check_min(self, now_fs: int, timing: str, command: int, bank: Optional[int], since_fs: Optional[int]):
+        if since_fs is None or self.timings is None:
+            return
+        required = getattr(self.timings, timing).min
+        if required is not None and now_fs - since_fs < round(required * fs_per_ns):
+            self.violation(now_fs, timing, command, bank, required, now_fs - since_fs)
+
+    def check_max(self, now_fs: int, timing: str, command: int, bank: Optional[int], since_fs: Optional[int],
+            slack_fs: int = 0):
+        if since_fs is None or self.timings is None:
+            return
+        required = getattr(self.timings, timing).max
+        if required is not None and now_fs - since_fs > round(required * fs_per_ns) + slack_fs:
+            self.violation(now_fs, timing, command, bank, required, now_fs - since_fs)
+
+    def set_mode(self, mode: int):
+        self.mode = mode
+        self.burst_length = 1 << (mode & 0b111)
+        self.cl = (mode >> 4) & 0b111
+        self.timings = self.spec.timing.get(f"cl{self.cl}")
+        if self.timings is None:
+            raise SdramTimingError(f"SDRAM {self.spec.info.name} does not support CL{self.cl}")
+
+    def check_clock(self, now_fs: int, period_fs: int):
+        t_ck = self.timings.t_ck
+        if t_ck.min is not None and period_fs < round(t_ck.min * fs_per_ns):
+            self.violation(now_fs, "t_ck", MODE_REGISTER_SET, None, t_ck.min, period_fs)
+        if t_ck.max is not None and period_fs > round(t_ck.max * fs_per_ns):
+            self.violation(now_fs, "t_ck", MODE_REGISTER_SET, None, t_ck.max, period_fs)
+
+    # Simulation
+
+    def attach(self, sim: Simulator):
+        """Add the model to `sim` as a background testbench"""
+        async def testbench(ctx):
+            await self.run(ctx, sim)
+        sim.add_testbench(testbench, background=True)
+
+    async def run(self, ctx, sim: Simulator):
+        self.reset_state()
+        spec = self.spec
+        bus = self.bus
+        banks = self.banks
+        ap_mask = 1 << spec.auto_precharge_bit if spec.auto_precharge_bit is not None else 0
+        col_mask = (1 << spec.col_bits) - 1
+
+        open_rows: dict[int, int] = { }
+        last_act: dict[int, int] = { }
+        last_pre: dict[int, int] = { }
+        last_ref: Optional[int] = None
+        last_mode: Optional[int] = None
+        row_refreshed: Optional[np.ndarray] = None
+        refresh_slack = 0
+        refresh_row = 0
+
+        # Words to drive on `dq_i` after this and the following edges, and
+        # the targets of the words to sample from `dq_o` on the next edges
+        read_words: deque = deque()
+        write_words: deque = deque()
+
+        tick = ctx.tick(self.domain).sample(bus.cs, bus.ras, bus.cas, bus.we, bus.ba, bus.a,
+            bus.dq_o, bus.dq_oe)
+        command_lines = (bus.cs, bus.ras, bus.cas, bus.we)
+        prev_edge_fs: Optional[int] = None
+        period_fs: Optional[int] = None
+        clock_checked = False
+
+        while True:
+            if not read_words and not write_words:
+                # Nothing in flight, sleep until the controller issues a command
+                cs, *cmd_bits = (ctx.get(s) for s in command_lines)
+                while not (cs and any(cmd_bits)):
+                    cs, *cmd_bits = await ctx.changed(*command_lines)
+                prev_edge_fs = None
+            _, _, cs, ras, cas, we, ba, a, dq_o, dq_oe = await tick
+            self.wake_ups += 1
+            now = engine.now_fs(sim)
+            if prev_edge_fs is not None:
+                period_fs = now - prev_edge_fs
+                if self.timings is not None and not clock_checked:
+                    self.check_clock(now, period_fs)
+                    clock_checked = True
+            prev_edge_fs = now
+
+            # Write data of earlier commands is sampled on this edge
+            if write_words:
+                target = write_words.popleft()
+                if target is not None:
+                    page, col = target
+                    if not dq_oe:
+                        raise SdramTimingError(f"Write data not driven at {format_time(now)}")
+                    page[col] = dq_o
+
+            cmd = (ras << 2 | cas << 1 | we) if cs else NOP
+            if cmd != NOP:
+                self.commands[command_names[cmd]] += 1
+                if self.mode is None and cmd in (ACTIVE, READ, WRITE):
+                    raise SdramTimingError(f"{command_names[cmd]} before MODE REGISTER SET")
+                self.check_min(now, "t_mrd", cmd, None, last_mode)
+
+            if cmd == ACTIVE:
+                if ba in open_rows:
+                    raise SdramTimingError(f"ACTIVE to open bank {ba} at {format_time(now)}")
+                self.check_min(now, "t_rp", cmd, ba, last_pre.get(ba))
+                self.check_min(now, "t_rc", cmd, ba, last_act.get(ba))
+                self.check_min(now, "t_rc", cmd, ba, last_ref)
+                open_rows[ba] = a
+                last_act[ba] = now
+
+            elif cmd in (READ, WRITE):
+                if ba not in open_rows:
+                    raise SdramTimingError(f"{command_names[cmd]} to idle bank {ba} at {format_time(now)}")
+                self.check_min(now, "t_rcd", cmd, ba, last_act[ba])
+                page = self.page(ba, open_rows[ba], create=cmd == WRITE)
+                bl = self.burst_length
+                start = a & col_mask & ~(bl - 1)
+                # Sequential bursts wrap within the burst length
+                cols = [start | ((a + i) & (bl - 1)) for i in range(bl)]
+                if cmd == READ:
+                    # Any remaining words of an interrupted burst are dropped
+                    while len(read_words) > self.cl - 1:
+                        read_words.pop()
+                    while len(read_words) < self.cl - 1:
+                        read_words.append(None)
+                    read_words.extend(int(page[c]) if page is not None else 0 for c in cols)
+                    write_words.clear()
+                else:
+                    read_words.clear()
+                    write_words.clear()
+                    page[cols[0]] = dq_o
+                    write_words.extend((page, c) for c in cols[1:])
+                if a & ap_mask:
+                    del open_rows[ba]
+                    last_pre[ba] = now + bl * (period_fs or 0)
+
+            elif cmd == PRECHARGE:
+                for b in (range(banks) if a & ap_mask else [ba]):
+                    if b in open_rows:
+                        self.check_min(now, "t_ras", cmd, b, last_act[b])
+                        self.check_max(now, "t_ras", cmd, b, last_act[b])
+                        del open_rows[b]
+                        last_pre[b] = now
+
+            elif cmd == REFRESH:
+                if open_rows:
+                    raise SdramTimingError(f"AUTO REFRESH with open banks at {format_time(now)}")
+                for b in range(banks):
+                    self.check_min(now, "t_rp", cmd, b, last_pre.get(b))
+                self.check_min(now, "t_rc", cmd, None, last_ref)
+                last_ref = now
+                if row_refreshed is not None:
+                    self.check_max(now, "t_ref", cmd, None, int(row_refreshed[refresh_row]), refresh_slack)
+                    row_refreshed[refresh_row] = now
+                    refresh_row = (refresh_row + 1) % self.rows
+
+            elif cmd == MODE_REGISTER_SET:
+                if open_rows:
+                    raise SdramTimingError(f"MODE REGISTER SET with open banks at {format_time(now)}")
+                self.set_mode(a)
+                t_ref = self.timings.t_ref.max
+                if t_ref is not None:
+                    refresh_slack = round(self.max_postponed * t_ref / self.rows * fs_per_ns)
+                clock_checked = False
+                last_mode = now
+                if row_refreshed is None:
+                    # Refresh deadlines start when the chip has been initialized
+                    row_refreshed = np.full(self.rows, now, dtype=np.int64)
+
+            elif cmd == BURST_TERMINATE:
+                read_words.clear()
+                write_words.clear()
+
+            # The deadline of the next row in refresh order is the earliest
+            if row_refreshed is not None and cmd != REFRESH:
+                self.check_max(now, "t_ref", REFRESH, None, int(row_refreshed[refresh_row]), refresh_slack)
+
+            # Drive the read data for the next edge
+            if read_words:
+                word = read_words.popleft()
+                ctx.set(bus.dq_i, word or 0)
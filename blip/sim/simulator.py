@@ -0,0 +1,94 @@
+from amaranth.sim import Simulator
+from contextlib import contextmanager
+from typing import Callable, Optional
+import heapq
+import inspect
+import itertools
+import os
+from blip.sim import engine
+from blip.sim.trace import TraceOptions, tracers
+from blip.sim.sampler import Sampler
+from blip.sim.profile import ProfileOptions, SimProfiler
+
+class BoardSimulator(Simulator):
+    """Simulator returned by `Board.simulate()`
+
+    Adds tracing based on `TraceOptions`, sampling of signals into arrays and
+    scheduling callbacks between simulation steps, eg. to start tracing after
+    some time has passed. With `ProfileOptions` the simulation is profiled by
+    `profiler`, see `blip.sim.profile`.
+    """
+
+    def __init__(self, toplevel, *, engine="pysim", trace: Optional[TraceOptions] = None,
+            profile: Optional[ProfileOptions] = None):
+        super().__init__(toplevel, engine=engine)
+        self._init_board(trace, profile)
+
+    def _init_board(self, trace: Optional[TraceOptions], profile: Optional[ProfileOptions]):
+        # Separate from `__init__()` where `engine` is the engine name
+        self.trace_options = trace
+        self._events: list = []
+        self._event_seq = itertools.count()
+        self.profiler = SimProfiler(profile) if profile else None
+        if self.profiler and self.profiler.counter:
+            engine.attach_observer(self, self.profiler.counter)
+
+    def add_process(self, process):
+        if self.profiler and inspect.iscoroutinefunction(process):
+            process = self.profiler.wrap_process(process, "process")
+        super().add_process(process)
+
+    def add_testbench(self, constructor, *, background=False):
+        if self.profiler and inspect.iscoroutinefunction(constructor):
+            constructor = self.profiler.wrap_process(constructor, "testbench")
+        super().add_testbench(constructor, background=background)
+
+    def at(self, time: float, callback: Callable[[], None]):
+        """Call `callback` before advancing the simulation past `time` seconds"""
+        heapq.heappush(self._events, (int(time * 1e15), next(self._event_seq), callback))
+
+    def advance(self):
+        events = self._events
+        while events and engine.now_fs(self) >= events[0][0]:
+            heapq.heappop(events)[2]()
+        if self.profiler:
+            start = self.profiler.begin_step()
+            result = super().advance()
+            self.profiler.end_step(start, engine.now_fs(self))
+            return result
+        return super().advance()
+
+    def add_sampler(self, signals: dict, *, domain="sync", capacity: int = 65536, on_chunk=None) -> Sampler:
+        """Record `signals` on every edge of `domain`, see `Sampler`"""
+        return Sampler(self, domain, signals, capacity=capacity, on_chunk=on_chunk)
+
+    @contextmanager
+    def trace(self, options: Optional[TraceOptions] = None):
+        """Trace waveforms within the context, like `write_vcd()`
+
+        Uses the options passed to `Board.simulate()` by default. Unlike
+        `write_vcd()` this only traces signals matching the options, can be
+        limited to a time window and can write binary traces.
+        """
+
+        options = options or self.trace_options
+        if not options or not options.enabled:
+            yield
+            return
+
+        assert options.path, "no trace output path set"
+        os.makedirs(os.path.dirname(options.path) or ".", exist_ok=True)
+
+        wrap_observer = self.profiler.wrap_observer if self.profiler else None
+        tracer = tracers[options.trace_format()](self, options, wrap_observer=wrap_observer)
+        if options.start is None or options.start * 1e15 <= engine.now_fs(self):
+            tracer.start()
+        else:
+            self.at(options.start, tracer.start)
+        if options.stop is not None:
+            self.at(options.stop, tracer.stop)
+
+        try:
+            yield
+        finally:
+            tracer.stop()
@@ -0,0 +1,145 @@
+from amaranth.sim import Simulator
+from dataclasses import dataclass, field
+from typing import Optional
+from types import SimpleNamespace
+from fnmatch import fnmatchcase
+from blip.sim import engine
+from blip.sim.btrace import TraceWriter
+
+@dataclass
+class TraceOptions:
+    """Waveform tracing options
+
+    path: Output file path
+    include: Glob patterns of hierarchical signal names to trace, eg. `top.pll.*`,
+        everything is traced if empty
+    exclude: Glob patterns of signal names to not trace, applied after `include`
+    start: Simulation time in seconds to start tracing at
+    stop: Simulation time in seconds to stop tracing at
+    enabled: Set to `False` to disable tracing altogether
+    format: Either `"vcd"` or `"btrace"` for a compact indexed binary trace,
+        see `blip.sim.btrace`, inferred from the `path` extension by default
+    """
+
+    path: Optional[str] = None
+    include: list[str] = field(default_factory=list)
+    exclude: list[str] = field(default_factory=list)
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    enabled: bool = True
+    format: Optional[str] = None
+
+    def trace_format(self) -> str:
+        if self.format:
+            return self.format
+        return "btrace" if self.path and self.path.endswith(".btrace") else "vcd"
+
+    def matches(self, name: str) -> bool:
+        if self.include and not any(fnmatchcase(name, p) for p in self.include):
+            return False
+        return not any(fnmatchcase(name, p) for p in self.exclude)
+
+def filter_design(design, options: TraceOptions):
+    """Returns a view of `design` with only the traced signals and memories
+
+    Resolved once before tracing so the writers only ever see the signals
+    they need to write, instead of filtering every change.
+    """
+
+    fragments = { }
+    for fragment, info in design.fragments.items():
+        if engine.is_memory(fragment):
+            if not options.matches(".".join(info.name)):
+                continue
+        signal_names = engine.SignalDict()
+        for signal, name in info.signal_names.items():
+            if options.matches(".".join((*info.name, name))):
+                signal_names[signal] = name
+        fragments[fragment] = SimpleNamespace(name=info.name, signal_names=signal_names)
+    return SimpleNamespace(fragments=fragments)
+
+def traced_signals(design, options: TraceOptions):
+    """Iterate `(path, signal)` for the signals that `options` would trace"""
+    for info in filter_design(design, options).fragments.values():
+        for signal, name in info.signal_names.items():
+            yield ".".join((*info.name, name)), signal
+
+class Tracer:
+    """Base class for tracers that are started and stopped between steps"""
+
+    def __init__(self, sim: Simulator, options: TraceOptions, *, wrap_observer=None):
+        self.sim = sim
+        self.options = options
+        self.design = filter_design(engine.design(sim), options)
+        self.wrap_observer = wrap_observer
+        self.writer = None
+        self.closed = False
+
+    def create_writer(self):
+        raise NotImplementedError
+
+    def start(self):
+        if self.closed:
+            return
+        self.writer = self.create_writer()
+        if self.wrap_observer:
+            # Eg. timing the writer when profiling
+            self.writer = self.wrap_observer(self.writer, f"trace ({self.options.trace_format()})")
+        engine.attach_observer(self.sim, self.writer)
+
+    def stop(self):
+        self.closed = True
+        if self.writer:
+            engine.detach_observer(self.sim, self.writer)
+            self.writer.close(engine.now_fs(self.sim))
+            self.writer = None
+
+class VcdTracer(Tracer):
+    """Writes a VCD file of the traced signals of a running simulation"""
+
+    def create_writer(self):
+        return engine.create_vcd_writer(self.sim, self.design, self.options.path)
+
+class BtraceObserver:
+    """Engine observer forwarding signal changes to a `TraceWriter`"""
+
+    fs_per_delta = 0
+
+    def __init__(self, sim: Simulator, design, path: str):
+        state = engine.engine_state(sim)
+        self.slots = state.slots
+        self.indices = engine.SignalDict()
+        signals = []
+        for info in design.fragments.values():
+            for signal, name in info.signal_names.items():
+                if signal in self.indices:
+                    continue
+                self.indices[signal] = (len(signals), state.get_signal(signal))
+                signals.append((".".join((*info.name, name)), len(signal)))
+
+        self.writer = TraceWriter(path, signals)
+        now = engine.now_fs(sim)
+        for signal, (index, slot) in self.indices.items():
+            self.writer.change(index, now, self.slots[slot].curr)
+
+    def update_signal(self, timestamp, signal):
+        entry = self.indices.get(signal)
+        if entry:
+            self.writer.change(entry[0], timestamp, self.slots[entry[1]].curr)
+
+    def update_memory(self, timestamp, memory, addr):
+        pass
+
+    def close(self, timestamp):
+        self.writer.close(timestamp)
+
+class BtraceTracer(Tracer):
+    """Writes a binary trace of the traced signals of a running simulation"""
+
+    def create_writer(self):
+        return BtraceObserver(self.sim, self.design, self.options.path)
+
+tracers = {
+    "vcd": VcdTracer,
+    "btrace": BtraceTracer,
+}
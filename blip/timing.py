@@ -0,0 +1,197 @@
+"""Post-build timing results
+
+The Fmax of every clock is parsed from the nextpnr log of a build, matched
+to the `PllClock` that requested it and recorded in a `TimingDatabase`,
+which tracks Fmax across commits to detect regressions.
+"""
+
+from amaranth.build import Platform
+from blip.arch.pll import Pll, PllClock
+from dataclasses import dataclass
+from typing import Iterable, Optional
+import os
+import re
+import sqlite3
+import subprocess
+
+MHz = 1e6
+
+# Eg. `Info: Max frequency for clock 'pll.o_clk[0]': 141.38 MHz (PASS at 100.00 MHz)`
+fmax_pattern = re.compile(
+    r"Max frequency for clock\s+'(?P<name>[^']+)':\s+(?P<fmax>[\d.]+) MHz"
+    r"(?:\s+\((?P<status>PASS|FAIL) at (?P<target>[\d.]+) MHz\))?")
+
+# Decorations added to net names by nextpnr and yosys
+net_prefixes = ("$glbnet$",)
+net_suffixes = ("$TRELLIS_IO_IN", "$TRELLIS_IO_OUT")
+
+@dataclass
+class ClockTiming:
+    """Timing of a clock net
+
+    name: Net name as reported by nextpnr
+    fmax: Maximum frequency in Hz
+    target: Constrained frequency in Hz if any
+    clock: Requested PLL clock driving the net, if known
+    """
+
+    name: str
+    fmax: float
+    target: Optional[float] = None
+    clock: Optional[PllClock] = None
+
+    @property
+    def slack(self) -> Optional[float]:
+        """Slack of the critical path in seconds, negative if the constraint is not met"""
+        return 1 / self.target - 1 / self.fmax if self.target else None
+
+    @property
+    def passed(self) -> bool:
+        return self.target is None or self.fmax >= self.target
+
+def parse_nextpnr_log(text: str) -> list[ClockTiming]:
+    """Fmax of every clock in a nextpnr log
+
+    nextpnr reports Fmax after placement and after routing, only the last
+    report of every clock is kept.
+    """
+
+    timings = { }
+    for match in fmax_pattern.finditer(text):
+        target = match["target"]
+        timings[match["name"]] = ClockTiming(match["name"], float(match["fmax"]) * MHz,
+            float(target) * MHz if target else None)
+    return list(timings.values())
+
+def net_name(name: str) -> str:
+    for prefix in net_prefixes:
+        name = name.removeprefix(prefix)
+    for suffix in net_suffixes:
+        name = name.removesuffix(suffix)
+    return name
+
+def constraint_name(platform: Platform, signal) -> Optional[str]:
+    """Name of `signal` in the clock constraints of the design prepared for `platform`
+
+    Amaranth has no public API for the names of the nets of a prepared
+    design, this uses the same private name map as the `hierarchy` filter of
+    the constraint file templates. Returns `None` if it isn't available.
+    """
+
+    name_map = getattr(platform, "_name_map", None)
+    if name_map is None or signal not in name_map:
+        return None
+    # Without the toplevel
+    return ".".join(name_map[signal][1:])
+
+def match_clocks(timings: list[ClockTiming], platform: Platform, plls: Iterable[Pll]):
+    """Set the `clock` of `timings` driven by `plls` built on `platform`
+
+    A timing is matched to a PLL output by the name of the constrained
+    signal, see `constraint_name()`, or if nextpnr reports the net under
+    another name, by being the only constraint with its frequency. Must be
+    called after the design has been prepared for `platform`.
+    """
+
+    constraints = { id(signal): frequency for signal, frequency in platform.iter_signal_clock_constraints() }
+    outputs = []
+    for pll in plls:
+        for clock, signal in pll.clock_outputs():
+            if id(signal) in constraints:
+                outputs.append((constraint_name(platform, signal), constraints[id(signal)], clock))
+
+    for timing in timings:
+        name = net_name(timing.name)
+        found = [clock for output, _, clock in outputs if output == name]
+        if not found and timing.target:
+            found = [clock for _, frequency, clock in outputs
+                if abs(frequency - timing.target) < 0.01 * MHz]
+        if len(found) == 1:
+            timing.clock = found[0]
+
+def git_commit(path: str = ".") -> str:
+    """Current commit of the repository at `path`, suffixed with `-dirty` if modified"""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty", "--abbrev=40"], cwd=path,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+@dataclass
+class Regression:
+    name: str
+    fmax: float
+    baseline: float
+    commit: str
+
+    @property
+    def change(self) -> float:
+        return self.fmax / self.baseline - 1
+
+class TimingDatabase:
+    """SQLite database of clock timings by example, config, board and commit
+
+    path: Database file, created if it doesn't exist
+
+    Building the same example and config again at a commit replaces the
+    timings previously recorded for it.
+    """
+
+    def __init__(self, path: str = os.path.join("build", "timing.sqlite")):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS timing (
+                    example TEXT, config TEXT, board TEXT, commit_id TEXT, clock TEXT,
+                    fmax REAL, target REAL, requested REAL, time REAL DEFAULT (julianday('now')),
+                    PRIMARY KEY (example, config, board, commit_id, clock)
+                )
+            """)
+
+    def close(self):
+        self.db.close()
+
+    def record(self, example: str, config: str, board: str, commit: str, timings: list[ClockTiming]):
+        with self.db:
+            self.db.execute("DELETE FROM timing WHERE example = ? AND config = ? AND board = ? AND commit_id = ?",
+                (example, config, board, commit))
+            self.db.executemany("INSERT INTO timing (example, config, board, commit_id, clock, fmax, target, requested)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+                    (example, config, board, commit, timing.name, timing.fmax, timing.target,
+                        timing.clock.frequency if timing.clock else None)
+                    for timing in timings
+                ])
+
+    def baseline(self, example: str, config: str, board: str, commit: str) -> dict[str, tuple[float, str]]:
+        """`(fmax, commit)` by clock of the latest build at another commit"""
+        row = self.db.execute("SELECT commit_id FROM timing WHERE example = ? AND config = ? AND board = ?"
+            " AND commit_id != ? ORDER BY rowid DESC LIMIT 1", (example, config, board, commit)).fetchone()
+        if not row:
+            return { }
+        return { clock: (fmax, row[0]) for clock, fmax in self.db.execute(
+            "SELECT clock, fmax FROM timing WHERE example = ? AND config = ? AND board = ? AND commit_id = ?",
+            (example, config, board, row[0])) }
+
+    def regressions(self, example: str, config: str, board: str, commit: str,
+            timings: list[ClockTiming], threshold: float) -> list[Regression]:
+        """Clocks of `timings` with an Fmax lower than the baseline by more than `threshold`"""
+        baseline = self.baseline(example, config, board, commit)
+        regressions = []
+        for timing in timings:
+            if timing.name in baseline:
+                fmax, baseline_commit = baseline[timing.name]
+                if timing.fmax < fmax * (1 - threshold):
+                    regressions.append(Regression(timing.name, timing.fmax, fmax, baseline_commit))
+        return regressions
+
+def format_timings(timings: list[ClockTiming]) -> str:
+    lines = [f"{'clock':<32} {'requested':>10} {'target':>10} {'fmax':>10} {'slack':>9}"]
+    for timing in timings:
+        requested = f"{timing.clock.frequency / MHz:.2f}" if timing.clock else "-"
+        target = f"{timing.target / MHz:.2f}" if timing.target else "-"
+        slack = f"{timing.slack * 1e9:.2f}ns" if timing.target else "-"
+        status = "" if timing.passed else " FAIL"
+        lines.append(f"{timing.name:<32} {requested:>10} {target:>10} {timing.fmax / MHz:>10.2f} {slack:>9}{status}")
+    return "\n".join(lines)
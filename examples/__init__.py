@@ -1,5 +1,10 @@
 from amaranth import Elaboratable
 from blip import Board
+from typing import Optional
+import ast
+import importlib
+import json
+import os
 
 all_examples = { }
 
@@ -11,3 +16,90 @@ def example(name):
 
 class Example(Elaboratable):
     board: Board
+
+# Bump when the format of the manifest changes
+manifest_version = 1
+
+def manifest_path() -> str:
+    import blip.cache
+    return os.path.join(blip.cache.get_cache_root(), "examples.json")
+
+def scan_example_names(source: str) -> list[str]:
+    """Find the names of `@example("name")` decorated definitions without running the module"""
+
+    names = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            if not isinstance(decorator, ast.Call) or not decorator.args:
+                continue
+            func = decorator.func
+            func_name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+            arg = decorator.args[0]
+            if func_name == "example" and isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                names.append(arg.value)
+    return names
+
+def find_examples() -> dict[str, str]:
+    """Map from example names to the modules defining them
+
+    Example sources are scanned statically and the results are cached in a
+    manifest keyed by file modification times and sizes, so only new or
+    changed files are parsed and no example modules are imported.
+    """
+
+    self_path = os.path.dirname(__file__)
+    try:
+        with open(manifest_path()) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != manifest_version:
+            manifest = None
+    except (OSError, ValueError):
+        manifest = None
+    files = manifest["files"] if manifest else { }
+
+    changed = manifest is None
+    found = { }
+    for root, dirs, names in os.walk(self_path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        if root == self_path:
+            continue
+        for name in sorted(names):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, self_path).replace("\\", "/")
+            st = os.stat(path)
+            entry = files.get(rel_path)
+            if not entry or entry[:2] != [st.st_mtime_ns, st.st_size]:
+                with open(path, "rb") as f:
+                    entry = [st.st_mtime_ns, st.st_size, scan_example_names(f.read())]
+                changed = True
+            found[rel_path] = entry
+
+    if changed or found.keys() != files.keys():
+        try:
+            os.makedirs(os.path.dirname(manifest_path()), exist_ok=True)
+            tmp_path = f"{manifest_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({ "version": manifest_version, "files": found }, f)
+            os.replace(tmp_path, manifest_path())
+        except OSError:
+            pass
+
+    examples = { }
+    for rel_path, (_, _, names) in found.items():
+        module = "examples." + rel_path[:-len(".py")].replace("/", ".")
+        for name in names:
+            examples[name] = module
+    return examples
+
+def load_example(name: str, examples: Optional[dict[str, str]] = None):
+    """Import only the module defining example `name`, returns `None` if not found"""
+
+    if name not in all_examples:
+        module = (examples or find_examples()).get(name)
+        if module:
+            importlib.import_module(module)
+    return all_examples.get(name)
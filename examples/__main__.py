@@ -1,30 +1,24 @@
 import argparse
 import os
 import types
-import importlib.util
+import copy
+import csv
 import dataclasses
+import itertools
+import json
 import tomllib
 import subprocess
+import sys
+import time
+import traceback
+import concurrent.futures
 from blip import Board
-from examples import all_examples
+from blip.sim import TraceOptions, ProfileOptions
+from examples import find_examples, load_example
 from amaranth.sim import Simulator
 
 g_config = { }
 
-def import_examples():
-    self_path = os.path.dirname(__file__)
-    for root, dirs, files in os.walk(self_path):
-        rel_root = os.path.relpath(root, self_path)
-        if rel_root == ".":
-            continue
-
-        for file in files:
-            path = os.path.join(root, file)
-            name = os.path.basename(file)
-            spec = importlib.util.spec_from_file_location(name, path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-
 def get_config(example_type, argv_s):
     config_type = None
     if hasattr(example_type, "Config"):
@@ -41,16 +35,33 @@ def get_config(example_type, argv_s):
             s_values[s_name] = int(s_value)
         elif s_field.type == float:
             s_values[s_name] = float(s_value)
+        elif s_field.type == bool:
+            s_values[s_name] = s_value.lower() in ("1", "true", "yes")
+        elif s_field.type == str:
+            s_values[s_name] = s_value
     config = config_type(**s_values)
     return config
 
-def cmd_sim(argv):
-    example_name = argv.name
+# Number of clock cycles to simulate between time budget checks
+sim_budget_slice = 1000
+
+class SimTimeout(Exception):
+    def __init__(self, message, sim_time):
+        super().__init__(message)
+        self.sim_time = sim_time
+
+def do_sim(argv, example_name, *, time_budget=None):
+    """Simulate an example with its testbenches for `argv.duration` cycles
+
+    time_budget: Maximum wall time in seconds, raises `SimTimeout` if exceeded
+
+    Returns the simulated time in seconds.
+    """
 
     vcd_path = argv.o
     if not vcd_path:
-        vcd_path = os.path.join("build", "sim", f"{example_name}.vcd")
-    os.makedirs(os.path.dirname(vcd_path), exist_ok=True)
+        ext = argv.trace_format or "vcd"
+        vcd_path = os.path.join("build", "sim", f"{example_name}.{ext}")
 
     board_name = argv.board
     if not board_name:
@@ -58,7 +69,7 @@ def cmd_sim(argv):
         assert board_name, "no default sim_board set"
     board: Board = Board.load(board_name, sim=True)
 
-    example_type = all_examples.get(example_name)
+    example_type = load_example(example_name)
     assert example_type, f"no example found for name '{example_name}'"
     config = get_config(example_type, argv.s)
 
@@ -66,15 +77,140 @@ def cmd_sim(argv):
 
     t_ck = 1.0 / board.spec.clk_freq
 
-    sim = board.simulate(example)
+    trace = TraceOptions(
+        path=vcd_path,
+        include=argv.trace_include,
+        exclude=argv.trace_exclude,
+        start=t_ck * argv.trace_start if argv.trace_start is not None else None,
+        stop=t_ck * argv.trace_stop if argv.trace_stop is not None else None,
+        enabled=not argv.no_trace,
+        format=argv.trace_format,
+    )
+
+    profile = None
+    if argv.profile:
+        profile = ProfileOptions(sample_interval=argv.profile_interval)
+
+    sim = board.simulate(example, trace=trace, profile=profile)
     sim.add_clock(t_ck)
-    with sim.write_vcd(vcd_path):
-        sim.run_until(t_ck * argv.duration)
+    if hasattr(example, "add_testbenches"):
+        example.add_testbenches(sim)
+
+    try:
+        with sim.trace():
+            if time_budget is None:
+                sim.run_until(t_ck * argv.duration)
+            else:
+                # Run in slices to check the budget between them
+                deadline = time.perf_counter() + time_budget
+                for cycle in range(0, argv.duration, sim_budget_slice):
+                    sim.run_until(t_ck * min(cycle + sim_budget_slice, argv.duration))
+                    if time.perf_counter() > deadline:
+                        cycles = min(cycle + sim_budget_slice, argv.duration)
+                        raise SimTimeout(f"exceeded time budget of {time_budget}s"
+                            f" at cycle {cycles}/{argv.duration}", t_ck * cycles)
+    finally:
+        # Stops the sampling thread even if the simulation failed
+        if sim.profiler:
+            sim.profiler.close()
+
+    if sim.profiler:
+        profile_path = os.path.join("build", "sim", f"{example_name}.profile.json")
+        sim.profiler.write_json(profile_path)
+        print(sim.profiler.summary())
+        print(f"Profile written to {profile_path}")
+
+    return t_ck * argv.duration
+
+def sim_worker(argv, example_name):
+    """Simulate an example collecting the result for the regression report"""
+
+    start = time.perf_counter()
+    result = { "name": example_name, "status": "pass", "error": None, "sim_time": 0.0 }
+    try:
+        result["sim_time"] = do_sim(argv, example_name, time_budget=argv.timeout)
+    except SimTimeout as e:
+        result["status"] = "timeout"
+        result["error"] = str(e)
+        result["sim_time"] = e.sim_time
+    except Exception:
+        result["status"] = "fail"
+        result["error"] = traceback.format_exc()
+    wall_time = time.perf_counter() - start
+    result["wall_time"] = wall_time
+    result["throughput"] = result["sim_time"] / wall_time if wall_time > 0 else 0.0
+    return result
+
+def sim_all(argv, example_names):
+    """Simulate examples in a process pool and write a JSON report"""
+
+    start = time.perf_counter()
+    results = []
+    def report(result):
+        results.append(result)
+        name, status = result["name"], result["status"]
+        print(f"[{name}] {status} in {result['wall_time']:.1f}s")
+        if result["error"]:
+            for line in result["error"].rstrip().splitlines():
+                print(f"[{name}] {line}")
+
+    if argv.j:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=argv.j,
+                initializer=init_worker, initargs=(g_config,)) as pool:
+            futures = [pool.submit(sim_worker, argv, name) for name in example_names]
+            for future in concurrent.futures.as_completed(futures):
+                report(future.result())
+    else:
+        for name in example_names:
+            report(sim_worker(argv, name))
+    total_time = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["name"])
+    print()
+    print(f"{'example':<24} {'status':<8} {'time':>8} {'sim/wall':>10}")
+    for r in results:
+        print(f"{r['name']:<24} {r['status']:<8} {r['wall_time']:>7.1f}s {r['throughput']:>10.3g}")
+    failed = [r["name"] for r in results if r["status"] != "pass"]
+    print(f"Simulated {len(results)} examples in {total_time:.1f}s with {argv.j or 1} jobs,"
+        f" {len(results) - len(failed)} passed, {len(failed)} failed")
+
+    report_path = argv.report or os.path.join("build", "sim", "report.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({
+            "jobs": argv.j or 1,
+            "duration_cycles": argv.duration,
+            "wall_time": total_time,
+            "passed": len(results) - len(failed),
+            "failed": len(failed),
+            "examples": results,
+        }, f, indent=2)
+    print(f"Report written to {report_path}")
+
+    if failed:
+        raise SystemExit(f"Failed simulations: {', '.join(failed)}")
 
-def do_build(argv, example_name):
+def cmd_sim(argv):
+    if argv.name and argv.sweep:
+        run_sweep("sim", argv, argv.name)
+    elif argv.name:
+        assert not argv.all
+        do_sim(argv, argv.name, time_budget=argv.timeout)
+    elif argv.all:
+        assert not argv.o, "-o not supported with --all"
+        assert not argv.s, "-s not supported with --all"
+        sim_all(argv, list(find_examples()))
+    else:
+        raise RuntimeError("Either specify example to simulate or --all")
+
+def get_build_path(argv, example_name):
     build_path = argv.o
     if not build_path:
         build_path = os.path.join("build", "build", example_name)
+    return build_path
+
+def do_build(argv, example_name):
+    build_path = get_build_path(argv, example_name)
     os.makedirs(build_path, exist_ok=True)
 
     board_name = argv.board
@@ -85,29 +221,241 @@ def do_build(argv, example_name):
 
     print(f"Building {example_name} for {board.spec.info.name}")
 
-    example_type = all_examples.get(example_name)
+    example_type = load_example(example_name)
     assert example_type, f"no example found for name '{example_name}'"
     config = get_config(example_type, argv.s)
 
     example = example_type(board, config)
 
-    platform = board.platform
-    assert platform, "attempting to run without a platform"
-
-    platform.build(example, build_dir=build_path)
+    board.build(example, build_dir=build_path, cache=not argv.no_cache)
+    check_timing(argv, example_name, board, config, build_path)
+
+def check_timing(argv, example_name, board: Board, config, build_path):
+    """Record the Fmax of the build and compare it to the previous commit
+
+    Regressions over `argv.fmax_threshold` percent are reported, and fail
+    the build with `argv.fail_on_regression`.
+    """
+
+    from blip.timing import TimingDatabase, format_timings, git_commit
+
+    timings = board.timing(build_path)
+    if not timings:
+        print("No timing report found")
+        return
+    print(format_timings(timings))
+
+    config_key = json.dumps(dataclasses.asdict(config), sort_keys=True)
+    board_name = board.spec.info.name
+    commit = git_commit(os.path.dirname(__file__))
+    db = TimingDatabase(argv.timing_db or os.path.join("build", "timing.sqlite"))
+    try:
+        regressions = db.regressions(example_name, config_key, board_name, commit, timings,
+            argv.fmax_threshold / 100)
+        db.record(example_name, config_key, board_name, commit, timings)
+    finally:
+        db.close()
+
+    for r in regressions:
+        print(f"Fmax regression on {r.name}: {r.fmax / 1e6:.2f}MHz, {r.change:+.1%}"
+            f" from {r.baseline / 1e6:.2f}MHz at {r.commit[:12]}")
+    if regressions and argv.fail_on_regression:
+        raise RuntimeError(f"Fmax regressed by more than {argv.fmax_threshold:g}%"
+            f" on {', '.join(r.name for r in regressions)}")
+
+def init_worker(config):
+    global g_config
+    g_config = config
+
+def build_worker(argv, example_name):
+    """Build an example in a worker process with output captured to a log
+
+    Returns `(example_name, ok, wall_time, log_path)`
+    """
+
+    build_path = get_build_path(argv, example_name)
+    os.makedirs(build_path, exist_ok=True)
+    log_path = os.path.join(build_path, "build.log")
+
+    # Redirect at the file descriptor level to also capture the toolchain
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(1), os.dup(2)]
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            do_build(argv, example_name)
+            ok = True
+        except Exception:
+            traceback.print_exc()
+            ok = False
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+    return example_name, ok, time.perf_counter() - start, log_path
+
+def print_log_tail(example_name, log_path, lines=40):
+    with open(log_path, errors="replace") as f:
+        tail = f.readlines()[-lines:]
+    for line in tail:
+        print(f"[{example_name}] {line}", end="")
+
+def build_parallel(argv, example_names):
+    """Build examples in a process pool, collecting failures"""
+
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=argv.j,
+            initializer=init_worker, initargs=(g_config,)) as pool:
+        futures = [pool.submit(build_worker, argv, name) for name in example_names]
+        for future in concurrent.futures.as_completed(futures):
+            name, ok, wall_time, log_path = future.result()
+            results.append((name, ok, wall_time))
+            if ok:
+                print(f"[{name}] ok in {wall_time:.1f}s, log: {log_path}")
+            else:
+                print(f"[{name}] FAILED in {wall_time:.1f}s, log: {log_path}")
+                print_log_tail(name, log_path)
+    total_time = time.perf_counter() - start
+
+    print()
+    print(f"{'example':<24} {'status':<8} {'time':>8}")
+    for name, ok, wall_time in sorted(results):
+        print(f"{name:<24} {'ok' if ok else 'FAILED':<8} {wall_time:>7.1f}s")
+    serial_time = sum(wall_time for _, _, wall_time in results)
+    print(f"Built {len(results)} examples in {total_time:.1f}s with {argv.j} jobs"
+        f" ({serial_time:.1f}s serial, {serial_time / max(total_time, 1e-9):.1f}x speedup)")
+
+    failed = [name for name, ok, _ in results if not ok]
+    if failed:
+        raise SystemExit(f"Failed to build: {', '.join(sorted(failed))}")
 
 def cmd_build(argv):
-    if argv.name:
+    if argv.name and argv.sweep:
+        run_sweep("build", argv, argv.name)
+    elif argv.name:
         assert not argv.all
         do_build(argv, argv.name)
     elif argv.all:
         assert not argv.o, "-o not supported with --all"
         assert not argv.s, "-s not supported with --all"
-        for example in all_examples:
-            do_build(argv, example)
+        if argv.j:
+            build_parallel(argv, list(find_examples()))
+        else:
+            for example in find_examples():
+                do_build(argv, example)
     else:
         raise RuntimeError("Either specify example to build or --all")
 
+def parse_sweep(text):
+    """Parse a sweep of a config field into `(name, values)`
+
+    Values are either a comma separated list `name=1,2,4` or an inclusive
+    range `name=1..8` with an optional step `name=0.5..2.0:0.5`.
+    """
+
+    name, eq, spec = text.partition("=")
+    if not name or not eq or not spec:
+        raise ValueError(f"Bad sweep '{text}', expected FIELD=VALUES")
+    if ".." not in spec:
+        return name, spec.split(",")
+
+    spec, _, step = spec.partition(":")
+    first, last = spec.split("..", maxsplit=1)
+    if all(v.lstrip("-").isdigit() for v in (first, last, step or "1")):
+        return name, [str(v) for v in range(int(first), int(last) + 1, int(step or "1"))]
+    first, last, step = float(first), float(last), float(step or "1")
+    count = int(round((last - first) / step)) + 1
+    return name, [repr(first + n * step) for n in range(count)]
+
+def sweep_points(sweeps):
+    """Grid of all combinations of the swept values"""
+    fields = [parse_sweep(s) for s in sweeps]
+    names = [name for name, _ in fields]
+    return [dict(zip(names, values)) for values in itertools.product(*(v for _, v in fields))]
+
+def sweep_worker(kind, argv, example_name, index, point):
+    """Simulate or build a single point of a sweep
+
+    Workers are reused across points so imports, loaded specs and solved
+    PLL configurations stay warm between them.
+    """
+
+    point_argv = copy.copy(argv)
+    point_argv.s = argv.s + [f"{k}={v}" for k, v in point.items()]
+    sweep_path = os.path.join("build", "sweep", example_name)
+    if kind == "sim":
+        point_argv.o = os.path.join(sweep_path, f"{index}.{argv.trace_format or 'vcd'}")
+        result = sim_worker(point_argv, example_name)
+    else:
+        point_argv.o = os.path.join(sweep_path, str(index))
+        _, ok, wall_time, log_path = build_worker(point_argv, example_name)
+        result = { "status": "pass" if ok else "fail", "wall_time": wall_time, "log": log_path }
+    result.pop("name", None)
+    return { "index": index, **point, **result }
+
+def run_sweep(kind, argv, example_name):
+    """Run a sweep over the grid of `argv.sweep` and write a results table"""
+
+    assert not argv.o, "-o not supported with --sweep"
+    points = sweep_points(argv.sweep)
+
+    # Reject unknown fields before running any point
+    example_type = load_example(example_name)
+    assert example_type, f"no example found for name '{example_name}'"
+    config_fields = { f.name for f in dataclasses.fields(example_type.Config) }
+    unknown = [name for name in points[0] if name not in config_fields]
+    if unknown:
+        raise ValueError(f"Unknown config fields for {example_name}: {', '.join(unknown)}")
+    print(f"Sweeping {example_name} over {len(points)} points")
+
+    start = time.perf_counter()
+    results = []
+    def report(result):
+        results.append(result)
+        params = " ".join(f"{k}={result[k]}" for k in points[0])
+        print(f"[{result['index']}] {params}: {result['status']} in {result['wall_time']:.1f}s")
+
+    if argv.j:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=argv.j,
+                initializer=init_worker, initargs=(g_config,)) as pool:
+            futures = [pool.submit(sweep_worker, kind, argv, example_name, n, p) for n, p in enumerate(points)]
+            for future in concurrent.futures.as_completed(futures):
+                report(future.result())
+    else:
+        for n, point in enumerate(points):
+            report(sweep_worker(kind, argv, example_name, n, point))
+    total_time = time.perf_counter() - start
+    results.sort(key=lambda r: r["index"])
+
+    out_path = argv.sweep_out or os.path.join("build", "sweep", f"{example_name}.{kind}.csv")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    columns = list(dict.fromkeys(k for r in results for k in r))
+    if out_path.lower().endswith(".json"):
+        with open(out_path, "w") as f:
+            json.dump({ "example": example_name, "wall_time": total_time, "points": results }, f, indent=2)
+    else:
+        with open(out_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+    failed = [r for r in results if r["status"] != "pass"]
+    print(f"Swept {len(results)} points in {total_time:.1f}s with {argv.j or 1} jobs,"
+        f" {len(failed)} failed, results written to {out_path}")
+    if failed:
+        raise SystemExit(1)
+
+def cmd_list(argv):
+    for name, module in sorted(find_examples().items()):
+        print(f"{name:<24} {module}")
+
 def cmd_run(argv):
     example_name = argv.name
 
@@ -122,7 +470,7 @@ def cmd_run(argv):
         assert board_name, "no default run_board set"
     board: Board = Board.load(board_name)
 
-    example_type = all_examples.get(example_name)
+    example_type = load_example(example_name)
     assert example_type, f"no example found for name '{example_name}'"
     config = get_config(example_type, argv.s)
 
@@ -138,7 +486,8 @@ def cmd_run(argv):
                 subprocess.check_call([program_tool, bitstream_filename])
         platform.toolchain_program = types.MethodType(toolchain_program, platform)
 
-    platform.build(example, do_program=True, build_dir=build_path)
+    products = board.build(example, build_dir=build_path, cache=not argv.no_cache)
+    platform.toolchain_program(products, "top")
 
 
 if __name__ == "__main__":
@@ -148,11 +497,25 @@ if __name__ == "__main__":
     subparsers = parser.add_subparsers(dest="cmd", help="Commands")
 
     sim_parser = subparsers.add_parser("simulate", aliases=["sim"], help="Simulate an example")
-    sim_parser.add_argument("name", help="Example name to simulate")
+    sim_parser.add_argument("name", nargs="?", help="Example name to simulate")
     sim_parser.add_argument("--board", help="Board to use")
     sim_parser.add_argument("-s", nargs="*", default=[], action="extend", help="Set configuration")
-    sim_parser.add_argument("-o", metavar="path.vcd", help="VXD output path")
+    sim_parser.add_argument("-o", metavar="path.vcd", help="VCD (or .btrace) output path")
     sim_parser.add_argument("--duration", type=int, default=100, help="Number of clock cycles to run")
+    sim_parser.add_argument("--trace-include", metavar="GLOB", nargs="*", default=[], action="extend", help="Only trace matching signals, eg. 'top.pll.*'")
+    sim_parser.add_argument("--trace-exclude", metavar="GLOB", nargs="*", default=[], action="extend", help="Do not trace matching signals")
+    sim_parser.add_argument("--trace-start", metavar="CYCLES", type=int, help="Clock cycle to start tracing at")
+    sim_parser.add_argument("--trace-stop", metavar="CYCLES", type=int, help="Clock cycle to stop tracing at")
+    sim_parser.add_argument("--no-trace", action="store_true", help="Do not write a waveform trace")
+    sim_parser.add_argument("--trace-format", choices=["vcd", "btrace"], help="Trace format, inferred from -o by default")
+    sim_parser.add_argument("--profile", action="store_true", help="Profile the simulation and print a summary")
+    sim_parser.add_argument("--profile-interval", metavar="SECONDS", type=float, default=0.001, help="Stack sampling interval with --profile, 0 to disable")
+    sim_parser.add_argument("--all", action="store_true", help="Simulate all examples and write a report")
+    sim_parser.add_argument("-j", metavar="N", type=int, help="Simulate examples or sweep points in N parallel processes")
+    sim_parser.add_argument("--timeout", metavar="SECONDS", type=float, help="Wall time budget per example")
+    sim_parser.add_argument("--report", metavar="path.json", help="Report output path with --all, defaults to build/sim/report.json")
+    sim_parser.add_argument("--sweep", metavar="FIELD=VALUES", nargs="*", default=[], action="extend", help="Sweep a config field over values, eg. 'bits=4..8' or 'mhz=10,20'")
+    sim_parser.add_argument("--sweep-out", metavar="path.csv", help="Sweep results table output path, .csv or .json")
     sim_parser.set_defaults(cmd=cmd_sim)
 
     sim_parser = subparsers.add_parser("build", help="Build an example")
@@ -161,6 +524,13 @@ if __name__ == "__main__":
     sim_parser.add_argument("-s", nargs="*", default=[], action="extend", help="Set configuration")
     sim_parser.add_argument("-o", metavar="build/path", help="Output build path")
     sim_parser.add_argument("--all", action="store_true", help="Build all examples")
+    sim_parser.add_argument("-j", metavar="N", type=int, help="Build examples or sweep points in N parallel processes")
+    sim_parser.add_argument("--no-cache", action="store_true", help="Always run the toolchain instead of reusing cached builds")
+    sim_parser.add_argument("--sweep", metavar="FIELD=VALUES", nargs="*", default=[], action="extend", help="Sweep a config field over values, eg. 'bits=4..8' or 'mhz=10,20'")
+    sim_parser.add_argument("--sweep-out", metavar="path.csv", help="Sweep results table output path, .csv or .json")
+    sim_parser.add_argument("--timing-db", metavar="path.sqlite", help="Timing results database, defaults to build/timing.sqlite")
+    sim_parser.add_argument("--fmax-threshold", metavar="PERCENT", type=float, default=5.0, help="Report Fmax regressions larger than this from the previous commit")
+    sim_parser.add_argument("--fail-on-regression", action="store_true", help="Fail the build on an Fmax regression instead of warning")
     sim_parser.set_defaults(cmd=cmd_build)
 
     sim_parser = subparsers.add_parser("run", help="Run an example")
@@ -168,11 +538,13 @@ if __name__ == "__main__":
     sim_parser.add_argument("--board", help="Board to use")
     sim_parser.add_argument("-s", nargs="*", default=[], action="extend", help="Set configuration")
     sim_parser.add_argument("-o", metavar="build/path", help="Output build path")
+    sim_parser.add_argument("--no-cache", action="store_true", help="Always run the toolchain instead of reusing cached builds")
     sim_parser.set_defaults(cmd=cmd_run)
 
-    argv = parser.parse_args()
+    sim_parser = subparsers.add_parser("list", help="List examples")
+    sim_parser.set_defaults(cmd=cmd_list)
 
-    import_examples()
+    argv = parser.parse_args()
 
     self_path = os.path.dirname(__file__)
     config_local_path = os.path.join(self_path, "config.local.toml")
@@ -4,6 +4,7 @@ from examples import example
 from dataclasses import dataclass
 import blip
 from blip.arch.pll import PllClock
+from blip.component.perf import PerfCounters, PerfUart
 
 MHz = 1e6
 
@@ -17,10 +18,16 @@ class TripleBlinky(Elaboratable):
         mhz_a: int = 10
         mhz_b: int = 20
         mhz_c: int = 30
+        # Count the cycles of every domain, sent over the UART every `blink_interval`
+        perf: bool = False
+        baud_rate: int = 115200
 
     def __init__(self, board: blip.Board, config: Config):
         self.board = board
         self.config = config
+        self.perf = PerfCounters(enabled=config.perf)
+        for domain in ("sync", "a", "b", "c"):
+            self.perf.counter(domain, domain=domain)
 
     def elaborate(self, platform: Platform) -> Module:
         m = Module()
@@ -89,4 +96,46 @@ class TripleBlinky(Elaboratable):
             board.get_led(6).o.eq(fc[-1]),
         ]
 
+        m.submodules.perf = perf = self.perf
+        if config.perf:
+            m.submodules.perf_uart = perf_uart = PerfUart(perf, board.spec.clk_freq,
+                baud_rate=config.baud_rate, interval=config.blink_interval)
+            m.d.comb += board.get_uart().tx.o.eq(perf_uart.o_tx)
+
         return m
+
+    def add_testbenches(self, sim):
+        board = self.board
+        config = self.config
+        max_count = int(1_000_000 * config.blink_interval)
+
+        def blink_testbench(led, mhz):
+            # Counters wrap after `max_count + 1` cycles so the LEDs drift
+            # slightly apart from `blink_interval` and each other
+            async def inner(ctx):
+                interval = (mhz * max_count + 1) / (mhz * MHz)
+                await ctx.delay(interval / 2)
+                while True:
+                    assert ctx.get(led.o) == 0
+                    await ctx.delay(interval)
+                    assert ctx.get(led.o) == 1
+                    await ctx.delay(interval)
+            return inner
+
+        def desync_testbench(led, mhz):
+            async def inner(ctx):
+                interval = 1e-6 / mhz * (1 << (config.desync_bits - 1))
+                await ctx.delay(interval / 2)
+                while True:
+                    assert ctx.get(led.o) == 0
+                    await ctx.delay(interval)
+                    assert ctx.get(led.o) == 1
+                    await ctx.delay(interval)
+            return inner
+
+        sim.add_testbench(blink_testbench(board.get_led(0), config.mhz_a))
+        sim.add_testbench(blink_testbench(board.get_led(1), config.mhz_b))
+        sim.add_testbench(blink_testbench(board.get_led(2), config.mhz_c))
+        sim.add_testbench(desync_testbench(board.get_led(4), config.mhz_a))
+        sim.add_testbench(desync_testbench(board.get_led(5), config.mhz_b))
+        sim.add_testbench(desync_testbench(board.get_led(6), config.mhz_c))
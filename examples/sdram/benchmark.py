@@ -0,0 +1,278 @@
+from amaranth import *
+from amaranth.build import Platform
+from amaranth.lib import wiring
+from examples import example
+from blip.arch.pll import PllClock
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.clock import AccessPattern, optimize_sdram_clock
+from blip.component.sdram.controller import SdramController
+from dataclasses import dataclass
+import blip
+
+MHz = 1e6
+
+patterns = ("sequential", "strided", "random")
+clocks = ("board", "bandwidth", "latency")
+
+# Galois LFSR x^32 + x^22 + x^2 + x + 1
+lfsr_taps = 0x80200003
+
+class BenchmarkCore(Elaboratable):
+    """Traffic generator and counters around an `SdramController`
+
+    Requests are issued as fast as the controller accepts them, at most one
+    every `request_interval` cycles, the latency of a read is counted from
+    its request being accepted to its first data word. All counters are in
+    cycles of the `sync` domain.
+    """
+
+    tag_bits = 4
+    counter_bits = 32
+
+    def __init__(self, spec: SdramSpec, frequency: float, config: "SdramBenchmark.Config"):
+        self.config = config
+        self.ctrl = SdramController(spec, frequency, burst_length=config.burst_length,
+            queue_depth=config.queue_depth, tag_bits=self.tag_bits)
+
+        bits = self.counter_bits
+        self.done = Signal()
+        self.cycles = Signal(bits)
+        self.words = Signal(bits)
+        self.reads = Signal(bits)
+        self.latency_sum = Signal(bits)
+        self.latency_min = Signal(bits, init=(1 << bits) - 1)
+        self.latency_max = Signal(bits)
+        self.latency_bins = [Signal(bits, name=f"latency_bin{n}") for n in range(config.latency_bins)]
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        config = self.config
+        m.submodules.ctrl = ctrl = self.ctrl
+        spec = ctrl.spec
+        bl = config.burst_length
+        addr_bits = len(ctrl.i_addr)
+        tags = 1 << self.tag_bits
+
+        now = Signal(self.counter_bits)
+        m.d.sync += now.eq(now + 1)
+
+        # Request generator
+        addr = Signal(addr_bits)
+        lfsr = Signal(32, init=1)
+        issued = Signal(range(config.requests + 1))
+        completed = Signal(range(config.requests + 1))
+        tag = Signal(self.tag_bits)
+        pending = Signal(tags)
+        started = Signal()
+        read_threshold = round(config.read_percent * 256 / 100)
+        write = Signal()
+        m.d.comb += write.eq(lfsr[24:32] >= read_threshold)
+        wait = Signal(range(config.request_interval + 1))
+        with m.If(wait != 0):
+            m.d.sync += wait.eq(wait - 1)
+
+        m.d.comb += [
+            ctrl.i_valid.eq(ctrl.o_init_done & (issued != config.requests) & (wait == 0)
+                & ~pending.bit_select(tag, 1)),
+            ctrl.i_addr.eq(addr),
+            ctrl.i_write.eq(write),
+            ctrl.i_tag.eq(tag),
+            ctrl.i_wdata.eq(Cat(addr + k for k in range(bl))),
+        ]
+
+        accept = ctrl.i_valid & ctrl.o_ready
+        with m.If(accept):
+            if config.pattern == "sequential":
+                next_addr = addr + bl
+            elif config.pattern == "strided":
+                next_addr = addr + config.stride
+            else:
+                next_addr = lfsr[:addr_bits] & ~(bl - 1)
+            m.d.sync += [
+                addr.eq(next_addr),
+                lfsr.eq(Mux(lfsr[0], (lfsr >> 1) ^ lfsr_taps, lfsr >> 1)),
+                issued.eq(issued + 1),
+                tag.eq(tag + 1),
+                started.eq(1),
+            ]
+            if config.request_interval:
+                m.d.sync += wait.eq(config.request_interval - 1)
+
+        # Read responses, the latency is taken on the first word of a burst
+        start = Array(Signal(self.counter_bits, name=f"start{t}") for t in range(tags))
+        in_burst = Signal()
+        first = Signal()
+        latency = Signal(self.counter_bits)
+        m.d.comb += [
+            first.eq(ctrl.o_rvalid & ~in_burst),
+            latency.eq(now - start[ctrl.o_rtag]),
+        ]
+        with m.If(ctrl.o_rvalid):
+            m.d.sync += in_burst.eq(~ctrl.o_rlast)
+
+        for t in range(tags):
+            with m.If(accept & ~write & (tag == t)):
+                m.d.sync += [
+                    pending[t].eq(1),
+                    start[t].eq(now),
+                ]
+            with m.Elif(first & (ctrl.o_rtag == t)):
+                m.d.sync += pending[t].eq(0)
+
+        # Counters
+        read_done = ctrl.o_rvalid & ctrl.o_rlast
+        m.d.sync += [
+            completed.eq(completed + read_done + ctrl.o_wack),
+            self.words.eq(self.words + ctrl.o_rvalid + Mux(ctrl.o_wack, bl, 0)),
+        ]
+        m.d.comb += self.done.eq(started & (completed == config.requests))
+        with m.If(started & ~self.done):
+            m.d.sync += self.cycles.eq(self.cycles + 1)
+
+        with m.If(first):
+            m.d.sync += [
+                self.reads.eq(self.reads + 1),
+                self.latency_sum.eq(self.latency_sum + latency),
+            ]
+            with m.If(latency < self.latency_min):
+                m.d.sync += self.latency_min.eq(latency)
+            with m.If(latency > self.latency_max):
+                m.d.sync += self.latency_max.eq(latency)
+            shift = config.bin_cycles.bit_length() - 1
+            last_bin = len(self.latency_bins) - 1
+            for n, counter in enumerate(self.latency_bins):
+                if n == last_bin:
+                    hit = (latency >> shift) >= n
+                else:
+                    hit = (latency >> shift) == n
+                with m.If(hit):
+                    m.d.sync += counter.eq(counter + 1)
+
+        return m
+
+def format_report(core: BenchmarkCore, frequency: float, values: dict) -> str:
+    """Bandwidth and latency distribution from the counter `values` read from `core`"""
+
+    config = core.config
+    spec = core.ctrl.spec
+    cycles = max(values["cycles"], 1)
+    reads = values["reads"]
+    seconds = cycles / frequency
+    word_bytes = spec.data_bits // 8
+
+    lines = [
+        f"{config.requests} {config.pattern} requests of {config.burst_length} words,"
+        f" {config.read_percent}% reads at {frequency / MHz:g}MHz CL{core.ctrl.cycles.cl}",
+        f"bandwidth: {values['words'] * word_bytes / seconds / 1e6:.1f}MB/s,"
+        f" {values['words'] / cycles:.1%} of the data bus in {cycles} cycles",
+    ]
+    if reads:
+        lines.append(f"read latency: min {values['latency_min']}, mean {values['latency_sum'] / reads:.1f},"
+            f" max {values['latency_max']} cycles")
+        for n, count in enumerate(values["latency_bins"]):
+            lo = n * config.bin_cycles
+            label = f"{lo}+" if n == len(values["latency_bins"]) - 1 else f"{lo}-{lo + config.bin_cycles - 1}"
+            lines.append(f"  {label:>8}: {count:>6} {'#' * round(40 * count / reads)}")
+    return "\n".join(lines)
+
+@example("sdram_benchmark")
+class SdramBenchmark(Elaboratable):
+    """SDRAM bandwidth and latency benchmark
+
+    Drives `requests` accesses through an `SdramController` to the SDRAM of
+    the board, in simulation the results are printed when the run is done,
+    on hardware LEDs 0-6 show the fraction of the data bus used in eighths
+    once LED 7 lights up.
+    """
+
+    @dataclass
+    class Config:
+        # `sequential`, `strided` by `stride` words or `random`
+        pattern: str = "sequential"
+        burst_length: int = 8
+        stride: int = 512
+        read_percent: int = 100
+        requests: int = 512
+        # Minimum cycles between requests, to measure the latency without queueing
+        request_interval: int = 0
+        queue_depth: int = 4
+        # `board` clock or the clock chosen by `optimize_sdram_clock()` for
+        # the `bandwidth` or `latency` objective, at most `max_mhz` if set
+        clock: str = "board"
+        max_mhz: float = 0.0
+        latency_bins: int = 16
+        bin_cycles: int = 4
+
+    def __init__(self, board: blip.Board, config: Config):
+        if config.pattern not in patterns:
+            raise ValueError(f"Bad pattern: {config.pattern}")
+        if config.clock not in clocks:
+            raise ValueError(f"Bad clock: {config.clock}")
+        if config.stride % config.burst_length:
+            raise ValueError(f"Stride {config.stride} is not a multiple of the burst length")
+        if config.bin_cycles & (config.bin_cycles - 1):
+            raise ValueError(f"Latency bin width {config.bin_cycles} is not a power of 2")
+
+        self.board = board
+        self.config = config
+        spec: SdramSpec = board.spec.components["sdram"]
+
+        if config.clock == "board":
+            self.frequency = board.spec.clk_freq
+            self.domain = "sync"
+        else:
+            pattern = AccessPattern(
+                burst_length=config.burst_length,
+                row_hit_rate=0.9 if config.pattern == "sequential" else 0.0,
+                read_fraction=config.read_percent / 100,
+            )
+            self.plan = optimize_sdram_clock(spec, board.spec.clk_freq, pattern,
+                objective=config.clock, max_frequency=config.max_mhz * MHz or None)
+            self.frequency = self.plan.frequency
+            self.domain = "sdram"
+
+        self.core = BenchmarkCore(spec, self.frequency, config)
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        board = self.board
+        if self.domain != "sync":
+            m.submodules.pll = pll = board.arch.create_pll(board.spec.clk_freq, [
+                PllClock(self.frequency, (-0.001, 0.0)),
+            ])
+            m.domains.sdram = ClockDomain("sdram")
+            m.d.comb += [
+                pll.i_clk.eq(ClockSignal()),
+                ClockSignal("sdram").eq(pll.o_clk[0]),
+            ]
+
+        core = self.core
+        m.submodules.core = DomainRenamer({ "sync": self.domain })(core)
+        m.submodules.sdram = sdram = board.get_sdram(domain=self.domain)
+        wiring.connect(m, core.ctrl.bus, sdram.bus)
+
+        # Results only change until the run is done
+        for n in range(7):
+            m.d.comb += board.get_led(n).o.eq(core.done & (core.words * 8 >= core.cycles * (n + 1)))
+        m.d.comb += board.get_led(7).o.eq(core.done)
+
+        return m
+
+    def counter_values(self, ctx) -> dict:
+        core = self.core
+        values = { name: ctx.get(getattr(core, name))
+            for name in ("cycles", "words", "reads", "latency_sum", "latency_min", "latency_max") }
+        values["latency_bins"] = [ctx.get(counter) for counter in core.latency_bins]
+        return values
+
+    def add_testbenches(self, sim):
+        core = self.core
+
+        async def testbench(ctx):
+            while not ctx.get(core.done):
+                await ctx.tick()
+            print(format_report(core, self.frequency, self.counter_values(ctx)))
+
+        sim.add_testbench(testbench)
@@ -2,6 +2,7 @@ from amaranth import *
 from amaranth.build import Platform
 from examples import example
 from dataclasses import dataclass
+import itertools
 import blip
 
 @example("blinky")
@@ -31,3 +32,15 @@ class Blinky(Elaboratable):
         ]
 
         return m
+
+    def add_testbenches(self, sim):
+        led = self.board.get_led(self.config.led_index)
+        counter_bits = self.config.counter_bits
+
+        async def testbench(ctx):
+            for n in itertools.count(0):
+                ref = (n >> (counter_bits - 1)) & 1
+                assert ctx.get(led.o) == ref
+                await ctx.tick()
+
+        sim.add_testbench(testbench)
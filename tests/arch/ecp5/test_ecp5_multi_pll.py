@@ -0,0 +1,102 @@
+from blip.arch.ecp5 import Ecp5Arch
+from blip.arch.ecp5.ecp5_multi_pll import *
+from blip.arch.ecp5.ecp5_pll import MHz, config_vco_hz, find_config_op, vco_hzs
+
+def check_plan(plan, clkos):
+    indices = sorted(i for group in plan.groups for i in group.clko_indices)
+    assert indices == list(range(len(clkos)))
+    for group in plan.groups:
+        for index, hz in zip(group.clko_indices, group.config.clko_hzs):
+            clko = clkos[index]
+            err = (hz - clko.frequency) / clko.frequency
+            assert clko.tolerance_below() <= err <= clko.tolerance_above()
+
+def test_set_partitions():
+    partitions = list(set_partitions(5, 3, 2))
+    assert len(partitions) == 10
+    for partition in partitions:
+        assert sorted(i for block in partition for i in block) == list(range(5))
+        assert all(len(block) <= 3 for block in partition)
+
+def test_op_feedback():
+    clkos = [PllClock(50.0*MHz), PllClock(25.0*MHz), PllClock(100.0*MHz), PllClock(10.0*MHz)]
+    config = find_config_op(25.0*MHz, clkos)
+    assert config
+    assert config.error == 0.0
+    assert config.clko_hzs[0] == 25.0*MHz / config.ref_div * config.fb_div
+    vco_hz = config_vco_hz(25.0*MHz, config, feedback="op")
+    assert vco_hz == config.clko_hzs[0] * config.clko_divs[0]
+    assert vco_hz in vco_hzs
+    for hz, div in zip(config.clko_hzs, config.clko_divs):
+        assert hz == vco_hz / div
+
+def test_plan_four_clocks():
+    clkos = [PllClock(125.0*MHz), PllClock(25.0*MHz), PllClock(100.0*MHz), PllClock(50.0*MHz)]
+    plan = plan_plls(25.0*MHz, clkos)
+    assert len(plan.groups) == 1
+    check_plan(plan, clkos)
+
+    plan = plan_plls(25.0*MHz, clkos, use_os3=False)
+    assert len(plan.groups) == 2
+    check_plan(plan, clkos)
+
+def test_plan_eight_clocks():
+    clkos = [
+        PllClock(125.0*MHz), PllClock(125.0*MHz), PllClock(25.0*MHz), PllClock(100.0*MHz),
+        PllClock(10.0*MHz), PllClock(133.0*MHz, tolerance=0.01),
+        PllClock(48.0*MHz, tolerance=0.01), PllClock(65.0*MHz, tolerance=0.02),
+    ]
+    plan = plan_plls(25.0*MHz, clkos)
+    assert len(plan.groups) == 2
+    check_plan(plan, clkos)
+
+def test_plan_many_clocks():
+    # Feasible requests that need a few hundred group solves before a plan is found
+    for mhzs in ((143, 143, 25, 125, 50, 12), (100, 100, 25, 125, 50, 12, 40, 65)):
+        clkos = [PllClock(mhz*MHz) for mhz in mhzs]
+        plan = plan_plls(25.0*MHz, clkos)
+        assert plan and len(plan.groups) == 3
+        check_plan(plan, clkos)
+        assert isinstance(Ecp5Arch().create_pll(25.0*MHz, clkos), Ecp5MultiPll)
+
+def test_create_multi_pll():
+    clkos = [PllClock(mhz*MHz) for mhz in (10, 20, 30, 40, 50)]
+    pll = Ecp5Arch().create_pll(25.0*MHz, clkos)
+    assert isinstance(pll, Ecp5MultiPll)
+    assert len(pll.o_clk) == 5
+    assert len(pll.plls) == len(pll.plan.groups)
+
+def test_group_source():
+    # Solutions are shared between sources of the same frequency
+    clkos = [PllClock(100.0*MHz), PllClock(100.0*MHz), PllClock(48.0*MHz)]
+    planner = PllPlanner(25.0*MHz, clkos)
+    a = planner.solve_group((2,), 100.0*MHz, 0)
+    b = planner.solve_group((2,), 100.0*MHz, 1)
+    assert (a.source, b.source) == (0, 1)
+    assert a.config == b.config
+
+def test_create_pll_fallback():
+    # One PLL can't generate both clocks but two can
+    clkos = [PllClock(100.0*MHz), PllClock(65.0*MHz)]
+    arch = Ecp5Arch()
+    pll = arch.create_pll(25.0*MHz, clkos)
+    assert isinstance(pll, Ecp5MultiPll)
+    check_plan(pll.plan, clkos)
+    assert arch.plls == [pll]
+
+    assert isinstance(arch.create_pll(25.0*MHz, clkos[:1]), Ecp5Pll)
+
+def test_plan_infeasible():
+    clkos = [PllClock(mhz*MHz, tolerance=0.0001) for mhz in (10, 20, 30, 40, 50, 60, 70.1234, 81.777)]
+    planner = PllPlanner(25.0*MHz, clkos)
+    assert planner.plan() is None
+    # The last two clocks need cascading, cascaded groups with them are ruled
+    # out by their singles and pairs instead of being solved
+    assert planner.indirect == {6, 7}
+    assert all(group or len(block) <= 2 or ref_hz == 25.0*MHz
+        for (block, ref_hz), group in planner.solutions.items())
+
+    # Without cascading the clocks are ruled out before searching
+    planner = PllPlanner(25.0*MHz, clkos, cascade=False)
+    assert planner.plan() is None
+    assert all(len(block) <= 2 for block, _ in planner.solutions)
@@ -31,3 +31,82 @@ def test_asymmetric_tolerances():
     assert config
     assert config.clko_hzs[1] < 25*MHz
     assert config.clko_hzs[2] > 25*MHz
+
+def find_config_reference(ref_hz, clkos):
+    best_config = None
+    for ref_div in ref_divs:
+        for fb_div in fb_divs:
+            fb_hz = ref_hz / ref_div
+            vco_hz = fb_hz * fb_div
+            if fb_hz not in fb_hzs or vco_hz not in vco_hzs:
+                continue
+            clk_divs, clk_hzs, error = [], [], 0.0
+            for clko in clkos:
+                best_div, best_hz, best_err2 = 0, 0, 0
+                for div_fudge in range(-2, 2 + 1):
+                    out_div = min(max(round(vco_hz / clko.frequency) + div_fudge, 1), 128)
+                    out_hz = vco_hz / out_div
+                    out_err = (out_hz - clko.frequency) / clko.frequency
+                    if clko.tolerance_below() <= out_err <= clko.tolerance_above():
+                        if best_div == 0 or out_err * out_err < best_err2:
+                            best_div, best_hz, best_err2 = out_div, out_hz, out_err * out_err
+                if best_div == 0:
+                    break
+                clk_divs.append(best_div)
+                clk_hzs.append(best_hz)
+                error += best_err2 * clko.error_weight
+            else:
+                config = Config(error, ref_div, fb_div, clk_divs, clk_hzs)
+                if not best_config or config < best_config:
+                    best_config = config
+    return best_config
+
+def test_matches_reference():
+    cases = [
+        (25.0*MHz, [PllClock(25.0*MHz), PllClock(12.5*MHz), PllClock(75.0*MHz)]),
+        (25.0*MHz, [PllClock(133.0*MHz, tolerance=0.01), PllClock(200.0*MHz, tolerance=0.1)]),
+        (25.0*MHz, [PllClock(10.0*MHz), PllClock(20.0*MHz), PllClock(30.0*MHz)]),
+        (12.0*MHz, [PllClock(48.0*MHz, error_weight=2.0), PllClock(65.0*MHz, tolerance=(-0.05, 0.0))]),
+        (100.0*MHz, [PllClock(333.0*MHz, tolerance=0.0001)]),
+        (25.0*MHz, [PllClock(123.456*MHz, tolerance=0.0)]),
+    ]
+    for ref_hz, clkos in cases:
+        assert find_config(ref_hz, clkos) == find_config_reference(ref_hz, clkos)
+
+def test_cached_config():
+    clkos = [PllClock(25.0*MHz), PllClock(50.0*MHz, tolerance=0.01)]
+    config_cache.clear()
+    assert find_config_cached(25.0*MHz, clkos) == find_config(25.0*MHz, clkos)
+    assert find_config_cached(25.0*MHz, list(clkos)) == find_config(25.0*MHz, clkos)
+    assert config_cache.stats.memory_hits == 1
+
+def test_find_configs_top_k():
+    clkos = [PllClock(10.0*MHz), PllClock(20.0*MHz), PllClock(30.0*MHz)]
+    configs = find_configs(25.0*MHz, clkos, k=8)
+    assert configs[0] == find_config(25.0*MHz, clkos)
+    assert configs == sorted(configs)
+    assert configs == find_configs(25.0*MHz, clkos, k=1000)[:8]
+
+def test_find_configs_tolerance_edge():
+    # Requires an output divisor far from the nearest one
+    clkos = [PllClock(5.0*MHz, tolerance=(0.05, 0.1))]
+    best = find_configs(25.0*MHz, clkos)[0]
+    assert best.error <= find_config(25.0*MHz, clkos).error
+    assert 1.05 <= best.clko_hzs[0] / (5.0*MHz) <= 1.1
+
+def test_find_configs_pareto():
+    clkos = [PllClock(33.0*MHz, tolerance=0.01), PllClock(77.0*MHz, tolerance=0.01)]
+    front = find_configs(25.0*MHz, clkos, pareto=True)
+    assert front
+    def errs(config):
+        return [((hz - c.frequency) / c.frequency)**2 for hz, c in zip(config.clko_hzs, clkos)]
+    for a in front:
+        for b in front:
+            assert not dominates(errs(a), errs(b))
+
+def test_select_config():
+    clkos = [PllClock(25.0*MHz), PllClock(50.0*MHz)]
+    pll = Ecp5Pll(25.0*MHz, clkos,
+        select=lambda cs: max(cs, key=lambda c: config_vco_hz(25.0*MHz, c)))
+    assert config_vco_hz(25.0*MHz, pll.config) == 800.0*MHz
+    assert pll.config.error == 0.0
@@ -0,0 +1,62 @@
+from blip import Board
+from blip.arch.sim import SimArch, half_period_fs, fs_per_s
+from blip.sim import engine
+from blip.arch.pll import PllClock
+from amaranth import *
+from amaranth.sim import Simulator
+
+MHz = 1e6
+
+def test_half_period():
+    assert half_period_fs(10*MHz) == 50_000_000
+    assert half_period_fs(25*MHz) == 20_000_000
+    assert half_period_fs(30*MHz) is None
+
+def test_clock_edges():
+    arch = SimArch()
+    freqs = [10, 30, 30, 33, 25]
+    pll = arch.create_pll(25*MHz, [PllClock(mhz*MHz) for mhz in freqs])
+
+    sim = Simulator(pll)
+    arch.setup_simulator(sim)
+
+    counts = [0] * len(freqs)
+    def counter(index):
+        async def inner(ctx):
+            async for _ in ctx.posedge(pll.o_clk[index]):
+                counts[index] += 1
+        return inner
+    for index in range(len(freqs)):
+        sim.add_process(counter(index))
+
+    sim.run_until(10e-6)
+    assert counts == [mhz * 10 for mhz in freqs]
+
+def test_scheduled_edge_times():
+    arch = SimArch()
+    pll = arch.create_pll(25*MHz, [PllClock(30*MHz), PllClock(33*MHz)])
+    sim = Simulator(pll)
+    arch.setup_simulator(sim)
+
+    edges = [[], []]
+    def recorder(index):
+        async def inner(ctx):
+            async for _ in ctx.posedge(pll.o_clk[index]):
+                edges[index].append(engine.now_fs(sim))
+        return inner
+    for index in range(2):
+        sim.add_process(recorder(index))
+
+    # Every edge is at the nearest femtosecond of its exact time, without drift
+    sim.run_until(20e-6)
+    for mhz, times in zip((30, 33), edges):
+        half_fs = fs_per_s / (2 * mhz * MHz)
+        assert len(times) == mhz * 20
+        assert times == [round((2 * n + 1) * half_fs) for n in range(len(times))]
+
+def test_instance_hooks():
+    a = Board.load("mini3s", sim=True)
+    b = Board.load("mini3s", sim=True)
+    a.arch.hooks.append(lambda sim: None)
+    assert a.arch.hooks is not b.arch.hooks
+    assert not b.arch.hooks
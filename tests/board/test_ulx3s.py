@@ -0,0 +1,57 @@
+from amaranth import *
+from amaranth.build import Resource, Subsignal, Pins, PinsN, Clock
+from amaranth.lib import wiring
+from amaranth.vendor import LatticeECP5Platform
+from blip.board import resolve_board_path
+from blip.board.ulx3s import Ulx3sBoard
+from blip.component import ComponentSpec
+from blip.component.sdram.controller import SdramController
+import pytest
+
+class Ecp5SdramPlatform(LatticeECP5Platform):
+    device = "LFE5U-85F"
+    package = "BG381"
+    speed = "6"
+    default_clk = "clk25"
+    connectors = [ ]
+    resources = [
+        Resource("clk25", 0, Pins("G2", dir="i"), Clock(25e6)),
+        Resource("sdram", 0,
+            Subsignal("clk", Pins("F19", dir="o")),
+            Subsignal("clk_en", Pins("F20", dir="o")),
+            Subsignal("cs", PinsN("P20", dir="o")),
+            Subsignal("we", PinsN("T20", dir="o")),
+            Subsignal("ras", PinsN("R20", dir="o")),
+            Subsignal("cas", PinsN("T19", dir="o")),
+            Subsignal("ba", Pins("P19 N20", dir="o")),
+            Subsignal("a", Pins("M20 M19 L20 L19 K20 K19 K18 J20 J19 H20 N19 G20 G19", dir="o")),
+            Subsignal("dq", Pins("J16 L18 M18 N18 P18 T18 T17 U20 E19 D20 D19 C20 E18 F18 J18 J17",
+                dir="io")),
+            Subsignal("dqm", Pins("U19 E20", dir="o")),
+        ),
+    ]
+
+@pytest.fixture
+def board():
+    spec = ComponentSpec.load(resolve_board_path("ulx3s_85f"))
+    return Ulx3sBoard(Ecp5SdramPlatform(), spec)
+
+def test_get_sdram_cached(board):
+    sdram = board.get_sdram()
+    assert board.get_sdram() is sdram
+    with pytest.raises(ValueError):
+        board.get_sdram(domain="other")
+    with pytest.raises(LookupError):
+        board.get_sdram("other")
+
+def test_sdram_ddr_clock(board):
+    sdram = board.get_sdram()
+    m = Module()
+    m.submodules.sdram = sdram
+    m.submodules.ctrl = ctrl = SdramController(board.spec.components["sdram"], 25e6)
+    wiring.connect(m, ctrl.bus, sdram.bus)
+
+    rtlil = board.platform.prepare(m).files["top.il"]
+    assert "ODDRX1F" in rtlil
+    # Read data is captured on the falling edge
+    assert "CLK_POLARITY 0" in rtlil
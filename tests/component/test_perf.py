@@ -0,0 +1,205 @@
+# amaranth: UnusedElaboratable=no
+
+from amaranth import *
+from amaranth.sim import Simulator
+from blip import Board
+from blip.component.perf import PerfCounters, PerfUart
+from blip.component.uart import UartTx, uart_divisor
+from examples.pll.triple_blinky import TripleBlinky
+import io
+import pytest
+
+class PerfTop(Elaboratable):
+    """Counters in `sync` and a slower `slow` domain around `perf`"""
+
+    def __init__(self, perf: PerfCounters, uart: bool = False):
+        self.perf = perf
+        self.uart = uart
+        self.value = Signal(8)
+        self.stop = Signal()
+        self.tx = Signal(init=1)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.domains.slow = ClockDomain("slow")
+
+        m.d.sync += self.value.eq(self.value + 1)
+        m.submodules.perf = self.perf
+        if self.uart:
+            m.submodules.perf_uart = perf_uart = PerfUart(self.perf, 1e6, baud_rate=250000,
+                interval=200e-6)
+            m.d.comb += self.tx.eq(perf_uart.o_tx)
+        return m
+
+def register(perf: PerfCounters, top: PerfTop):
+    run = ~top.stop
+    perf.counter("cycles", run)
+    perf.counter("slow_cycles", run, domain="slow")
+    perf.counter("odd", run & top.value[0])
+    perf.histogram("low_bits", top.value[:3], valid=run, bins=3, bin_width=2)
+    perf.value("value", top.value)
+    perf.trace("trace", top.value, valid=run & (top.value[:2] == 0), depth=4)
+
+def simulate(top: PerfTop, testbench, **processes):
+    sim = Simulator(top)
+    sim.add_clock(1e-6)
+    sim.add_clock(3e-6, domain="slow")
+    sim.add_testbench(testbench)
+    for process in processes.values():
+        sim.add_testbench(process, background=True)
+    sim.run()
+
+def test_perf_read():
+    perf = PerfCounters()
+    top = PerfTop(perf)
+    register(perf, top)
+    snapshots = []
+
+    async def testbench(ctx):
+        await ctx.tick().repeat(30)
+        ctx.set(top.stop, 1)
+        await ctx.tick().repeat(10)
+        snapshots.append(await perf.read(ctx))
+        # Counters keep counting but the snapshot doesn't change
+        await ctx.tick().repeat(10)
+        snapshots.append(await perf.read(ctx))
+
+    simulate(top, testbench)
+    first, second = snapshots
+    for name in ("cycles", "slow_cycles", "odd"):
+        assert first.counters[name] == second.counters[name]
+    assert first.counters["cycles"] == 30
+    assert first.counters["slow_cycles"] == 10
+    assert first.counters["odd"] == 15
+    assert first.histograms["low_bits"] == [8, 8, 14]
+    # Sampled values and traces
+    assert second.counters["value"] > first.counters["value"]
+    assert first["trace"] == [16, 20, 24, 28]
+
+def test_perf_trace_partial():
+    perf = PerfCounters()
+    top = PerfTop(perf)
+    perf.trace("trace", top.value, valid=top.value[:2] == 1, depth=4)
+    snapshots = []
+
+    async def testbench(ctx):
+        await ctx.tick().repeat(6)
+        snapshots.append(await perf.read(ctx))
+
+    simulate(top, testbench)
+    assert snapshots[0]["trace"] == [1, 5]
+
+def test_perf_disabled():
+    perf = PerfCounters(enabled=["cycles"])
+    top = PerfTop(perf)
+    register(perf, top)
+    snapshots = []
+
+    async def testbench(ctx):
+        await ctx.tick().repeat(20)
+        ctx.set(top.stop, 1)
+        snapshots.append(await perf.read(ctx))
+
+    simulate(top, testbench)
+    snapshot = snapshots[0]
+    assert snapshot.counters["cycles"] == 20
+    assert snapshot.counters["slow_cycles"] == 0
+    assert snapshot.histograms["low_bits"] == [0, 0, 0]
+    assert snapshot["trace"] == []
+
+    # Nothing is elaborated without enabled counters, not even synchronizers
+    perf = PerfCounters(enabled=False)
+    register(perf, PerfTop(perf))
+    m = Fragment.get(perf, None)
+    assert not m.subfragments
+    assert not m.statements.get("sync")
+
+    with pytest.raises(ValueError):
+        perf.counter("cycles")
+
+def receive_uart(tx, divisor: int, data: bytearray):
+    """Append the bytes sent on `tx` to `data`"""
+    async def receiver(ctx):
+        while True:
+            while ctx.get(tx):
+                await ctx.tick()
+            # Sample in the middle of every bit
+            samples = []
+            for bit in range(10):
+                for _ in range(divisor if bit else divisor // 2):
+                    await ctx.tick()
+                samples.append(ctx.get(tx))
+            assert samples[0] == 0 and samples[9] == 1
+            data.append(sum(bit << n for n, bit in enumerate(samples[1:9])))
+    return receiver
+
+def test_uart_tx():
+    divisor = uart_divisor(1e6, 125000)
+    assert divisor == 8
+    with pytest.raises(ValueError):
+        uart_divisor(1e6, 400000)
+
+    dut = UartTx(divisor)
+    data = bytearray()
+
+    async def testbench(ctx):
+        for byte in b"\x00\xffblip":
+            ctx.set(dut.i_data, byte)
+            ctx.set(dut.i_valid, 1)
+            await ctx.tick().until(dut.o_ready)
+        ctx.set(dut.i_valid, 0)
+        await ctx.tick().repeat(divisor * 11)
+
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_testbench(testbench)
+    sim.add_testbench(receive_uart(dut.o_tx, divisor, data), background=True)
+    sim.run()
+    assert data == b"\x00\xffblip"
+
+def test_perf_uart():
+    perf = PerfCounters()
+    top = PerfTop(perf, uart=True)
+    register(perf, top)
+    data = bytearray()
+
+    async def testbench(ctx):
+        await ctx.tick().repeat(30)
+        ctx.set(top.stop, 1)
+        await ctx.tick().repeat(4800)
+
+    simulate(top, testbench, receiver=receive_uart(top.tx, 4, data))
+    stream = io.BytesIO(bytes(data))
+    frames = [perf.read_stream(stream), perf.read_stream(stream)]
+    with pytest.raises(EOFError):
+        perf.read_stream(stream)
+
+    # Frames are taken back to back from cycle 200, after the run
+    for frame in frames:
+        assert frame.counters["cycles"] == 30
+        assert frame.counters["slow_cycles"] == 10
+        assert frame.histograms["low_bits"] == [8, 8, 14]
+        assert frame["trace"] == [16, 20, 24, 28]
+    assert frames[1].counters["value"] != frames[0].counters["value"]
+
+def test_triple_blinky_perf():
+    board: Board = Board.load("mini3s", sim=True)
+    config = TripleBlinky.Config(blink_interval=2e-6, desync_bits=4, perf=True, baud_rate=2_500_000)
+    dut = TripleBlinky(board, config)
+    sim = board.simulate(dut)
+    sim.add_clock(1.0 / board.spec.clk_freq)
+    data = bytearray()
+
+    async def testbench(ctx):
+        await ctx.delay(200e-6)
+
+    sim.add_testbench(testbench)
+    sim.add_testbench(receive_uart(board.get_uart().tx.o, 10, data), background=True)
+    sim.run()
+
+    stream = io.BytesIO(bytes(data))
+    frames = [dut.perf.read_stream(stream), dut.perf.read_stream(stream)]
+    counters = frames[-1].counters
+    # Cycle counts follow the PLL frequencies
+    for domain, mhz in (("a", config.mhz_a), ("b", config.mhz_b), ("c", config.mhz_c)):
+        assert counters[domain] / counters["sync"] == pytest.approx(mhz * 1e6 / board.spec.clk_freq, rel=0.05)
@@ -0,0 +1,77 @@
+from blip.component import SpecRegistry, BoardSpec
+from blip.component.registry import default_specs_path
+import blip.component
+import os
+import shutil
+
+def test_find_board():
+    registry = SpecRegistry(index_path=os.devnull)
+    assert registry.find("ulx3s_85f", kind="board") == ["board/vendor/ulx3s_85f.toml"]
+    assert registry.find("mini3s.toml") == ["board/sim/mini3s.toml"]
+    assert registry.find("mini_issi", kind="board") == []
+
+def test_cached_loads(monkeypatch):
+    registry = SpecRegistry(index_path=os.devnull)
+    monkeypatch.setattr(blip.component, "spec_registry", registry)
+    a: BoardSpec = registry.load("board/sim/mini3s")
+    b: BoardSpec = registry.load("board/test/mini3s_merge")
+    assert registry.load("board/sim/mini3s") is a
+
+    # mini_issi is shared by both boards but only parsed once
+    assert registry.load_stats.misses == 4
+    assert registry.load_stats.memory_hits == 2
+
+    # Merged spec is reused for the same list
+    merged = registry.resolve(["sdram/sim/mini_issi", "sdram/sim/slow_issi"])
+    assert merged is b.components["sdram"]
+    assert registry.resolve_stats.misses == 1
+    assert registry.resolve_stats.memory_hits == 1
+
+def test_invalidate_on_change(tmp_path, monkeypatch):
+    specs_path = tmp_path / "specs"
+    shutil.copytree(default_specs_path, specs_path)
+    registry = SpecRegistry(str(specs_path), index_path=os.devnull)
+    monkeypatch.setattr(blip.component, "spec_registry", registry)
+
+    board = registry.load("board/test/mini3s_merge")
+    path = specs_path / "sdram" / "sim" / "slow_issi.toml"
+    path.write_text(path.read_text().replace("Slow", "Slower"))
+    os.utime(path, ns=(0, 0))
+
+    # Board is reloaded as one of its components changed
+    reloaded = registry.load("board/test/mini3s_merge")
+    assert reloaded is not board
+    assert reloaded.components["sdram"] is not board.components["sdram"]
+    assert registry.load("sdram/sim/slow_issi").info.name == "Slower ISSI"
+    assert registry.resolve_stats.misses == 2
+
+def test_compiled_index(tmp_path, monkeypatch):
+    specs_path = tmp_path / "specs"
+    shutil.copytree(default_specs_path, specs_path)
+    index_path = str(tmp_path / "specs.index")
+    SpecRegistry(str(specs_path)).compile(index_path)
+
+    registry = SpecRegistry(str(specs_path), index_path=index_path)
+    monkeypatch.setattr(blip.component, "spec_registry", registry)
+    board = registry.load("board/test/mini3s_merge")
+    assert registry.load_stats.disk_hits == 1
+    assert registry.load_stats.misses == 0
+    assert board == SpecRegistry(str(specs_path), index_path=os.devnull).load("board/test/mini3s_merge")
+
+    # Touching a file without changing it keeps the index valid
+    path = specs_path / "sdram" / "sim" / "slow_issi.toml"
+    os.utime(path, ns=(0, 0))
+    registry = SpecRegistry(str(specs_path), index_path=index_path)
+    monkeypatch.setattr(blip.component, "spec_registry", registry)
+    registry.load("board/test/mini3s_merge")
+    assert registry.load_stats.disk_hits == 1
+
+    # Changed dependencies fall back to parsing
+    path.write_text(path.read_text().replace("Slow", "Slower"))
+    registry = SpecRegistry(str(specs_path), index_path=index_path)
+    monkeypatch.setattr(blip.component, "spec_registry", registry)
+    board = registry.load("board/test/mini3s_merge")
+    assert registry.load_stats.disk_hits == 1
+    assert registry.load_stats.misses == 2
+    assert board.components["sdram"].info.name == "Mini ISSI"
+    assert registry.load("sdram/sim/slow_issi").info.name == "Slower ISSI"
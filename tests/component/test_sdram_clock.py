@@ -0,0 +1,68 @@
+from blip.arch.ecp5.ecp5_pll import find_config
+from blip.arch.pll import PllClock
+from blip.component import BoardSpec, ComponentSpec
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.clock import AccessPattern, optimize_sdram_clock
+from blip.component.sdram.timing import compile_timings_cached, timing_cache
+import pytest
+
+MHz = 1e6
+
+def test_compile_timings_cached():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    timing_cache.clear()
+    first = compile_timings_cached(spec, 100 * MHz)
+    assert compile_timings_cached(spec, 100 * MHz) is first
+    assert compile_timings_cached(spec, 100 * MHz, cl=3) is not first
+    assert timing_cache.stats.memory_hits == 1
+    assert timing_cache.stats.misses == 2
+
+    with pytest.raises(ValueError):
+        compile_timings_cached(spec, 200 * MHz)
+
+def test_optimize_objectives():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+
+    # CL3 allows the fastest clock, CL2 gets the data out sooner
+    plan = optimize_sdram_clock(spec, 25 * MHz, objective="bandwidth", solver=find_config)
+    assert plan.cl == 3
+    assert plan.frequency == pytest.approx(166.667 * MHz, rel=1e-3)
+    assert plan.frequency <= 1e9 / 6
+
+    plan = optimize_sdram_clock(spec, 25 * MHz, objective="latency", solver=find_config)
+    assert plan.cl == 2
+    assert plan.frequency == pytest.approx(133.333 * MHz, rel=1e-3)
+
+def test_optimize_board_constraints():
+    board: BoardSpec = ComponentSpec.load("board/vendor/ulx3s_85f")
+    spec: SdramSpec = board.components["sdram"]
+
+    # Merged timings are limited by the slower part
+    plan = optimize_sdram_clock(spec, board.clk_freq, solver=find_config)
+    assert plan.frequency <= 1e9 / 7
+
+    plan = optimize_sdram_clock(spec, board.clk_freq, max_frequency=100 * MHz, solver=find_config)
+    assert plan.frequency <= 100 * MHz
+    assert plan.cl == 2
+
+    # Sharing the PLL with a system clock
+    plan = optimize_sdram_clock(spec, board.clk_freq, clkos=[PllClock(50 * MHz)], solver=find_config)
+    assert plan.config.clko_hzs[1] == pytest.approx(50 * MHz, rel=1e-3)
+
+def test_optimize_pattern():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    streaming = optimize_sdram_clock(spec, 25 * MHz, solver=find_config)
+    scattered = optimize_sdram_clock(spec, 25 * MHz, solver=find_config,
+        pattern=AccessPattern(burst_length=1, row_hit_rate=0.0, read_fraction=0.5, interleaved=False))
+    assert scattered.bandwidth < streaming.bandwidth
+    assert scattered.latency > streaming.latency
+
+def test_optimize_errors():
+    spec: SdramSpec = ComponentSpec.load("sdram/sim/mini_issi")
+    # Below the lowest PLL output frequency
+    with pytest.raises(ValueError):
+        optimize_sdram_clock(spec, 25 * MHz, max_frequency=1 * MHz, solver=find_config)
+    with pytest.raises(ValueError):
+        optimize_sdram_clock(spec, 25 * MHz, objective="power", max_frequency=100 * MHz, solver=find_config)
+    with pytest.raises(ValueError):
+        optimize_sdram_clock(spec, 25 * MHz, max_frequency=100 * MHz, solver=lambda *args: None)
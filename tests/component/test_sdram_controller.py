@@ -0,0 +1,215 @@
+from amaranth import *
+from amaranth.sim import Simulator
+from blip.component import ComponentSpec
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.controller import Command, SdramController
+from blip.component.sdram.timing import compile_timings
+import pytest
+import random
+
+frequency = 100e6
+
+class ChipModel:
+    """Cycle-level SDRAM checking the timings of the commands it receives"""
+
+    def __init__(self, dut: SdramController):
+        self.dut = dut
+        self.cycles = dut.cycles
+        self.bl = dut.burst_length
+        self.mem = { }
+        self.commands = []
+        self.refreshes = 0
+
+    def check(self, cycle, last, t, what):
+        assert cycle - last >= t, f"{what} violated at cycle {cycle}: {cycle - last} < {t}"
+
+    async def run(self, ctx):
+        bus = self.dut.bus
+        spec = self.dut.spec
+        c = self.cycles
+        never = -1000
+        open_rows = { }
+        last_act = { }
+        last_pre = { }
+        last_write = { }
+        last_act_any = never
+        mode_set = False
+        read_data = { }
+        write_addrs = { }
+
+        cycle = 0
+        while True:
+            await ctx.tick()
+            cycle += 1
+
+            cmd = Command(ctx.get(bus.ras) << 2 | ctx.get(bus.cas) << 1 | ctx.get(bus.we))
+            ba, a = ctx.get(bus.ba), ctx.get(bus.a)
+            if cmd != Command.NOP:
+                self.commands.append((cycle, cmd, ba, a))
+            all_pre = bool(a >> spec.auto_precharge_bit & 1)
+
+            if cmd == Command.NOP:
+                pass
+            elif cmd == Command.ACTIVE:
+                assert mode_set
+                assert ba not in open_rows
+                self.check(cycle, last_act.get(ba, never), c.t_rc, "tRC")
+                self.check(cycle, last_pre.get(ba, never), c.t_rp, "tRP")
+                self.check(cycle, last_act_any, c.t_rrd, "tRRD")
+                open_rows[ba] = a
+                last_act[ba] = last_act_any = cycle
+            elif cmd in (Command.READ, Command.WRITE):
+                assert ba in open_rows
+                self.check(cycle, last_act[ba], c.t_rcd, "tRCD")
+                base = (open_rows[ba] << spec.bank_bits | ba) << spec.col_bits | a
+                for k in range(self.bl):
+                    if cmd == Command.READ:
+                        assert cycle + c.cl + k not in read_data
+                        assert cycle + c.cl + k not in write_addrs
+                        read_data[cycle + c.cl + k] = self.mem.get(base + k, 0)
+                    else:
+                        assert cycle + k not in write_addrs
+                        assert cycle + k not in read_data
+                        write_addrs[cycle + k] = base + k
+                if cmd == Command.WRITE:
+                    last_write[ba] = cycle + self.bl - 1
+            elif cmd == Command.PRECHARGE:
+                for b in (range(1 << spec.bank_bits) if all_pre else [ba]):
+                    if b in open_rows:
+                        self.check(cycle, last_act[b], c.t_ras, "tRAS")
+                        self.check(cycle, last_write.get(b, never), c.t_wr, "tWR")
+                        del open_rows[b]
+                    last_pre[b] = cycle
+            elif cmd == Command.REFRESH:
+                assert not open_rows
+                for b in range(1 << spec.bank_bits):
+                    self.check(cycle, last_pre.get(b, never), c.t_rp, "tRP")
+                    self.check(cycle, last_act.get(b, never), c.t_rc, "tRC")
+                    last_act[b] = cycle
+                self.refreshes += 1
+            elif cmd == Command.MODE_REGISTER_SET:
+                assert not open_rows
+                assert a == self.dut.mode
+                mode_set = True
+            else:
+                assert False, f"unexpected command {cmd}"
+
+            if cycle in write_addrs:
+                assert ctx.get(bus.dq_oe)
+                self.mem[write_addrs.pop(cycle)] = ctx.get(bus.dq_o)
+            ctx.set(bus.dq_i, read_data.pop(cycle, 0))
+
+def run_controller(spec: SdramSpec, requests, **kwargs):
+    """Issue `(write, addr)` requests, returns `(chip, responses, cycles)`"""
+
+    dut = SdramController(spec, frequency, init_wait=100, tag_bits=8, **kwargs)
+    chip = ChipModel(dut)
+    bl = dut.burst_length
+    rng = random.Random(0)
+    expected = { }
+    responses = { }
+    ref = { }
+    done = { }
+
+    async def driver(ctx):
+        while not ctx.get(dut.o_init_done):
+            await ctx.tick()
+        for index, (write, addr) in enumerate(requests):
+            tag = index % 256
+            words = [rng.getrandbits(spec.data_bits) for _ in range(bl)]
+            ctx.set(dut.i_valid, 1)
+            ctx.set(dut.i_write, write)
+            ctx.set(dut.i_addr, addr)
+            ctx.set(dut.i_tag, tag)
+            ctx.set(dut.i_wdata, sum(w << (k * spec.data_bits) for k, w in enumerate(words)))
+            while not ctx.get(dut.o_ready):
+                await ctx.tick()
+            if write:
+                for k, w in enumerate(words):
+                    ref[addr + k] = w
+            else:
+                expected[tag] = [ref.get(addr + k, 0) for k in range(bl)]
+            await ctx.tick()
+        ctx.set(dut.i_valid, 0)
+
+    async def monitor(ctx):
+        cycle = 0
+        while True:
+            await ctx.tick()
+            cycle += 1
+            if ctx.get(dut.o_rvalid):
+                tag = ctx.get(dut.o_rtag)
+                responses.setdefault(tag, []).append(ctx.get(dut.o_rdata))
+                assert ctx.get(dut.o_rlast) == (len(responses[tag]) == bl)
+                done.setdefault("first", cycle)
+                done["last"] = cycle
+
+    sim = Simulator(dut)
+    sim.add_clock(1 / frequency)
+    sim.add_testbench(chip.run, background=True)
+    sim.add_testbench(monitor, background=True)
+    sim.add_testbench(driver, background=True)
+    reads = sum(1 for write, _ in requests if not write)
+    async def wait_done(ctx):
+        while sum(len(r) for r in responses.values()) < reads * bl:
+            await ctx.tick()
+        chip.owed = ctx.get(dut.refresh.o_owed)
+        chip.postponed = ctx.get(dut.refresh.o_postponed)
+        chip.forced = ctx.get(dut.refresh.o_forced)
+    sim.add_testbench(wait_done)
+    sim.run()
+
+    assert responses == expected
+    return chip, responses, done.get("last", 0) - done.get("first", 0) + 1
+
+def test_sdram_cycles():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    cycles = compile_timings(spec, 143e6)
+    assert cycles.cl == 3
+    assert cycles.t_rcd == 3
+    assert cycles.t_rp == 3
+    # Rounding up tRAS and tRP separately makes them longer than tRC
+    assert cycles.t_rc == cycles.t_ras + cycles.t_rp == 10
+    assert cycles.t_refi == 1117
+
+    assert compile_timings(spec, 100e6).cl == 2
+    assert compile_timings(spec, 100e6, cl=3).cl == 3
+    with pytest.raises(ValueError):
+        compile_timings(spec, 200e6)
+
+@pytest.mark.parametrize("spec_name", ["sdram/sim/mini_issi", "sdram/vendor/w9825g6kh-6"])
+def test_sdram_controller_random(spec_name):
+    spec: SdramSpec = ComponentSpec.load(spec_name)
+    rng = random.Random(1)
+    bl = 4
+    addr_bits = spec.row_bits + spec.bank_bits + spec.col_bits
+    # Few distinct rows so that requests both hit and conflict
+    addrs = [rng.getrandbits(addr_bits) & ~(bl - 1) & ((1 << (spec.col_bits + spec.bank_bits + 2)) - 1)
+        for _ in range(24)]
+    requests = [(rng.random() < 0.5, rng.choice(addrs)) for _ in range(150)]
+    chip, _, _ = run_controller(spec, requests, burst_length=bl)
+    assert any(cmd == Command.ACTIVE for _, cmd, _, _ in chip.commands)
+
+def test_sdram_controller_refresh():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    requests = [(i % 3 == 0, (i * 8) % 4096) for i in range(200)]
+    chip, _, _ = run_controller(spec, requests, max_postponed=0)
+    assert chip.refreshes >= 8 + 2
+    assert chip.forced == chip.refreshes - 8
+
+    # Refreshes owed during traffic are postponed
+    chip, _, _ = run_controller(spec, requests)
+    assert chip.refreshes + chip.owed >= 8 + 2
+    assert chip.postponed >= 1
+    assert chip.forced == 0
+
+def test_sdram_controller_bank_interleaving():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    bl = 8
+    banks = 1 << spec.bank_bits
+    # Every read opens a new row, in each bank in turn
+    requests = [(False, ((i // banks) << spec.bank_bits | i % banks) << spec.col_bits)
+        for i in range(64)]
+    chip, _, cycles = run_controller(spec, requests, burst_length=bl)
+    # Activates and precharges are hidden behind the bursts of other banks
+    assert len(requests) * bl / cycles > 0.9
@@ -0,0 +1,64 @@
+# amaranth: UnusedElaboratable=no
+
+from amaranth.sim import Simulator
+from blip.component import ComponentSpec
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.refresh import RefreshScheduler
+from blip.component.sdram.timing import compile_timings
+import pytest
+
+def run_scheduler(dut: RefreshScheduler, busy):
+    """Refresh whenever requested, `busy(cycle)` tells if there is traffic"""
+
+    refreshes = []
+    owed = []
+    counters = { }
+
+    async def testbench(ctx):
+        for cycle in range(200):
+            idle = not busy(cycle)
+            ctx.set(dut.i_idle, idle)
+            request = ctx.get(dut.o_request)
+            ctx.set(dut.i_refresh, request)
+            if request:
+                refreshes.append((cycle, idle, ctx.get(dut.o_force)))
+            owed.append(ctx.get(dut.o_owed))
+            await ctx.tick()
+        counters["postponed"] = ctx.get(dut.o_postponed)
+        counters["forced"] = ctx.get(dut.o_forced)
+
+    sim = Simulator(dut)
+    sim.add_clock(1e-8)
+    sim.add_testbench(testbench)
+    sim.run()
+    return refreshes, owed, counters
+
+def test_refresh_idle():
+    dut = RefreshScheduler(None, 100e6, interval=10, max_postponed=2)
+    refreshes, owed, counters = run_scheduler(dut, lambda cycle: False)
+    # Every owed refresh is issued right away, one per interval after the first
+    assert [cycle for cycle, _, _ in refreshes] == list(range(10, 200, 10))
+    assert all(idle and not force for _, idle, force in refreshes)
+    assert max(owed) == 1
+    assert counters == { "postponed": 0, "forced": 0 }
+
+def test_refresh_postponed():
+    dut = RefreshScheduler(None, 100e6, interval=10, max_postponed=2)
+    refreshes, owed, counters = run_scheduler(dut, lambda cycle: cycle < 100)
+    forced = [cycle for cycle, _, force in refreshes if force]
+    # Two refreshes are postponed, then one is forced every interval
+    assert forced == list(range(30, 110, 10))
+    assert max(owed) == 3
+    # The backlog is paid back when idle
+    assert owed[-1] == 0
+    assert len(refreshes) == 19
+    assert counters == { "postponed": 9, "forced": 8 }
+
+def test_refresh_interval():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    dut = RefreshScheduler(spec, 143e6)
+    assert dut.interval == compile_timings(spec, 143e6).t_refi
+    assert dut.max_postponed == 8
+
+    with pytest.raises(ValueError):
+        RefreshScheduler(spec, 143e6, max_postponed=9)
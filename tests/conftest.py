@@ -0,0 +1,14 @@
+import os
+import pytest
+
+@pytest.fixture(autouse=True, scope="session")
+def cache_dir(tmp_path_factory):
+    """Keep on-disk caches of the tests out of the working directory"""
+    path = str(tmp_path_factory.mktemp("cache"))
+    saved = os.environ.get("BLIP_CACHE_DIR")
+    os.environ["BLIP_CACHE_DIR"] = path
+    yield path
+    if saved is None:
+        del os.environ["BLIP_CACHE_DIR"]
+    else:
+        os.environ["BLIP_CACHE_DIR"] = saved
@@ -0,0 +1,37 @@
+import examples
+from examples import find_examples, load_example, scan_example_names
+import blip.cache
+
+def test_scan_example_names():
+    source = """
+from examples import example
+import examples
+
+@example("a")
+class A: pass
+
+@examples.example("b")
+def b(): pass
+
+@other("c")
+class C: pass
+"""
+    assert scan_example_names(source) == ["a", "b"]
+
+def test_find_examples(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path))
+    found = find_examples()
+    assert found["blinky"] == "examples.simple.blinky"
+    assert found["triple_blinky"] == "examples.pll.triple_blinky"
+
+    # Unchanged files are not parsed again
+    def fail(source):
+        raise AssertionError("example parsed again")
+    monkeypatch.setattr(examples, "scan_example_names", fail)
+    assert find_examples() == found
+
+def test_load_example(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path))
+    from examples.simple.blinky import Blinky
+    assert load_example("blinky") is Blinky
+    assert load_example("missing") is None
@@ -0,0 +1,126 @@
+from blip.sim.profile import SimProfiler
+from examples.__main__ import SimTimeout, do_sim, sim_all, sim_budget_slice, parse_sweep, sweep_points, run_sweep
+import argparse
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+def sim_args(**kwargs) -> argparse.Namespace:
+    args = dict(o=None, board="mini3s", s=[], duration=100, trace_include=[], trace_exclude=[],
+        trace_start=None, trace_stop=None, no_trace=True, trace_format=None, profile=False,
+        profile_interval=0.001, j=None, timeout=None, report=None, sweep=[], sweep_out=None)
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+def test_sim_profile_closed(monkeypatch):
+    closed = []
+    close = SimProfiler.close
+    def record_close(self):
+        closed.append(self)
+        close(self)
+    monkeypatch.setattr(SimProfiler, "close", record_close)
+
+    # The sampling thread is stopped even if the simulation fails
+    with pytest.raises(SimTimeout):
+        do_sim(sim_args(duration=5000, profile=True), "blinky", time_budget=0)
+    profiler, = closed
+    assert not profiler.sampler.thread.is_alive()
+
+def test_sim_all_report(tmp_path):
+    report_path = str(tmp_path / "report.json")
+    t_ck = 1 / 25e6
+
+    # In worker processes, with an example that fails to load
+    with pytest.raises(SystemExit, match="missing"):
+        sim_all(sim_args(j=2, report=report_path), ["blinky", "missing"])
+    with open(report_path) as f:
+        report = json.load(f)
+    assert (report["jobs"], report["passed"], report["failed"]) == (2, 1, 1)
+    blinky, missing = report["examples"]
+    assert blinky["name"] == "blinky" and blinky["status"] == "pass"
+    assert blinky["error"] is None
+    assert blinky["sim_time"] == pytest.approx(100 * t_ck)
+    assert 0 < blinky["wall_time"] <= report["wall_time"]
+    assert missing["status"] == "fail"
+    assert "no example found" in missing["error"]
+    assert missing["sim_time"] == 0.0
+
+    # Time budgets are checked between slices
+    with pytest.raises(SystemExit, match="blinky"):
+        sim_all(sim_args(duration=3 * sim_budget_slice, timeout=0, report=report_path), ["blinky"])
+    with open(report_path) as f:
+        report = json.load(f)
+    blinky, = report["examples"]
+    assert blinky["status"] == "timeout"
+    assert "time budget" in blinky["error"]
+    assert blinky["sim_time"] == pytest.approx(sim_budget_slice * t_ck)
+    assert blinky["wall_time"] > 0
+
+def test_parse_sweep():
+    assert parse_sweep("bits=4..8") == ("bits", ["4", "5", "6", "7", "8"])
+    assert parse_sweep("bits=-2..6:4") == ("bits", ["-2", "2", "6"])
+    assert parse_sweep("mhz=0.5..1.5:0.5") == ("mhz", ["0.5", "1.0", "1.5"])
+    assert parse_sweep("mhz=10,20,33.3") == ("mhz", ["10", "20", "33.3"])
+    for text in ("bits", "bits=", "=4..8"):
+        with pytest.raises(ValueError):
+            parse_sweep(text)
+
+def test_sweep_points():
+    points = sweep_points(["a=1..2", "b=x,y,z"])
+    assert points == [{ "a": a, "b": b } for a in ("1", "2") for b in ("x", "y", "z")]
+    assert sweep_points([]) == [{ }]
+
+def test_run_sweep(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    out_path = str(tmp_path / "sweep.json")
+    argv = sim_args(sweep=["counter_bits=2..3", "led_index=0,1"], sweep_out=out_path)
+    run_sweep("sim", argv, "blinky")
+    with open(out_path) as f:
+        results = json.load(f)
+    assert results["example"] == "blinky"
+    assert [(p["index"], p["counter_bits"], p["led_index"], p["status"]) for p in results["points"]] == [
+        (0, "2", "0", "pass"), (1, "2", "1", "pass"), (2, "3", "0", "pass"), (3, "3", "1", "pass"),
+    ]
+
+    # Unknown fields are rejected before simulating
+    argv = sim_args(sweep=["counter_bits=2..3", "bogus=1,2"], sweep_out=out_path)
+    with pytest.raises(ValueError, match="bogus"):
+        run_sweep("sim", argv, "blinky")
+
+build_script = """
+import argparse
+import multiprocessing
+import subprocess
+import examples.__main__ as main
+
+def stub_build(argv, example_name):
+    # Python and toolchain output, which goes to the inherited descriptors
+    print(f"building {example_name}")
+    subprocess.run(f"echo toolchain {example_name} >&2", shell=True, check=True)
+    if example_name == "bad":
+        raise RuntimeError("bad example")
+
+# Workers inherit the stubbed build
+multiprocessing.set_start_method("fork")
+main.do_build = stub_build
+main.build_parallel(argparse.Namespace(o=None, j=2), ["good", "other", "bad"])
+"""
+
+def test_build_parallel_logs(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=root)
+    result = subprocess.run([sys.executable, "-c", build_script], cwd=tmp_path, env=env,
+        capture_output=True, text=True)
+    assert "Failed to build: bad" in result.stderr
+    assert "[good] ok" in result.stdout
+    assert "[bad] RuntimeError: bad example" in result.stdout
+
+    for name in ("good", "other", "bad"):
+        with open(tmp_path / "build" / "build" / name / "build.log") as f:
+            log = f.read()
+        assert f"building {name}\n" in log
+        assert f"toolchain {name}\n" in log
+        assert log.count("building") == 1 and log.count("toolchain") == 1
+        assert ("bad example" in log) == (name == "bad")
@@ -0,0 +1,55 @@
+# amaranth: UnusedElaboratable=no
+
+from blip import Board
+from examples.sdram.benchmark import SdramBenchmark, format_report
+import pytest
+
+def run_benchmark(**kwargs):
+    board: Board = Board.load("mini3s", sim=True)
+    config = SdramBenchmark.Config(requests=64, **kwargs)
+    dut = SdramBenchmark(board, config)
+    sim = board.simulate(dut)
+    sim.add_clock(1.0 / board.spec.clk_freq)
+    values = { }
+
+    async def testbench(ctx):
+        while not ctx.get(dut.core.done):
+            await ctx.tick()
+        values.update(dut.counter_values(ctx))
+        assert ctx.get(board.get_led(7).o)
+
+    sim.add_testbench(testbench)
+    sim.run()
+    assert format_report(dut.core, dut.frequency, values)
+    return dut, values
+
+def test_sdram_benchmark_sequential():
+    dut, values = run_benchmark()
+    assert values["reads"] == 64
+    assert values["words"] == 64 * 8
+    assert values["words"] / values["cycles"] > 0.9
+    assert sum(values["latency_bins"]) == 64
+    assert values["latency_min"] <= values["latency_sum"] / 64 <= values["latency_max"]
+
+def test_sdram_benchmark_mix():
+    _, values = run_benchmark(pattern="random", read_percent=50)
+    assert 0 < values["reads"] < 64
+    assert values["words"] == 64 * 8
+
+    # Without queueing the latency is the controller pipeline
+    _, idle = run_benchmark(pattern="strided", request_interval=32)
+    assert idle["latency_max"] < values["latency_max"]
+    assert idle["latency_max"] < 16
+
+def test_sdram_benchmark_clock_plan():
+    dut, values = run_benchmark(clock="latency", burst_length=4)
+    assert dut.frequency > 100e6
+    assert dut.core.ctrl.cycles.cl == 2
+    assert values["words"] == 64 * 4
+
+def test_sdram_benchmark_config():
+    board: Board = Board.load("mini3s", sim=True)
+    with pytest.raises(ValueError):
+        SdramBenchmark(board, SdramBenchmark.Config(pattern="zigzag"))
+    with pytest.raises(ValueError):
+        SdramBenchmark(board, SdramBenchmark.Config(stride=12))
@@ -0,0 +1,58 @@
+from blip.sim import TraceOptions
+from blip.sim.btrace import TraceWriter, TraceReader
+from tests.sim.test_trace import simulate_blinky
+
+def test_writer_reader(tmp_path):
+    path = str(tmp_path / "test.btrace")
+    writer = TraceWriter(path, [("top.a", 1), ("top.b", 100)], chunk_size=4)
+    for t in range(0, 100, 10):
+        writer.change(0, t, (t // 10) & 1)
+        writer.change(1, t, (1 << 99) | t)
+    # Delta cycles at the same time only keep the settled value
+    writer.change(0, 100, 0)
+    writer.change(0, 100, 1)
+    writer.close(200)
+
+    with TraceReader(path) as reader:
+        assert reader.start == 0
+        assert reader.end == 200
+        assert len(reader.signals["top.a"].chunks) == 3
+        assert reader.value_at("top.a", 15) == 1
+        assert reader.value_at("top.a", 20) == 0
+        assert reader.value_at("top.a", 150) == 1
+        assert reader.value_at("top.b", 55) == (1 << 99) | 50
+        assert list(reader.transitions("top.a", 25, 55)) == [(30, 1), (40, 0), (50, 1)]
+        assert len(list(reader.transitions("top.b"))) == 10
+
+def test_simulate_btrace(tmp_path):
+    path = str(tmp_path / "blinky.btrace")
+    t_ck = simulate_blinky(TraceOptions(path, include=["*led0*"]))
+    t_ck_fs = round(t_ck * 1e15)
+
+    with TraceReader(path) as reader:
+        assert list(reader.signals) == ["top.led0__o"]
+        for n in range(90):
+            ref = (n >> 3) & 1
+            assert reader.value_at("top.led0__o", t_ck_fs * n + t_ck_fs // 4) == ref
+
+        vcd_path = str(tmp_path / "blinky.vcd")
+        reader.to_vcd(vcd_path)
+    with open(vcd_path) as f:
+        assert "led0__o" in f.read()
+
+def test_writer_chunk_timestep(tmp_path):
+    path = str(tmp_path / "test.btrace")
+    writer = TraceWriter(path, [("top.a", 1)], chunk_size=2)
+    # Delta cycles continue after a chunk has been filled
+    writer.change(0, 0, 1)
+    writer.change(0, 10, 0)
+    writer.change(0, 10, 1)
+    writer.change(0, 20, 0)
+    writer.change(0, 30, 1)
+    writer.change(0, 30, 0)
+    writer.change(0, 40, 1)
+    writer.close(50)
+
+    with TraceReader(path) as reader:
+        assert list(reader.transitions("top.a")) == [(0, 1), (20, 0), (40, 1)]
+        assert all(c.count <= 2 for c in reader.signals["top.a"].chunks)
@@ -0,0 +1,39 @@
+from blip import Board
+from blip.sim import ProfileOptions, TraceOptions
+from examples.simple.blinky import Blinky
+import json
+
+def test_profile_report(tmp_path):
+    board: Board = Board.load("mini3s", sim=True)
+    config = Blinky.Config(counter_bits=4)
+    dut = Blinky(board, config)
+    t_ck = 1.0 / board.spec.clk_freq
+
+    trace = TraceOptions(path=str(tmp_path / "blinky.btrace"))
+    sim = board.simulate(dut, trace=trace, profile=ProfileOptions(sample_interval=0.0005))
+    sim.add_clock(t_ck)
+    dut.add_testbenches(sim)
+    with sim.trace():
+        sim.run_until(t_ck * 200)
+    sim.profiler.close()
+
+    report = sim.profiler.report()
+    assert report["steps"] > 0
+    assert abs(report["sim_time"] - t_ck * 200) < t_ck
+    assert report["signal_updates"] > 200
+    assert report["sim_to_wall"] > 0
+
+    testbench, = report["processes"]
+    assert testbench["kind"] == "testbench"
+    assert testbench["resumes"] >= 200
+
+    observer, = report["observers"]
+    assert observer["name"] == "trace (btrace)"
+    assert report["breakdown"]["tracing"] == observer["wall_time"] > 0
+    assert sum(report["breakdown"].values()) <= report["wall_time"] + 1e-9
+    assert "samples" in report
+
+    path = tmp_path / "profile.json"
+    sim.profiler.write_json(str(path))
+    assert json.loads(path.read_text())["steps"] == report["steps"]
+    assert "signal updates" in sim.profiler.summary()
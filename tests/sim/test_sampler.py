@@ -0,0 +1,58 @@
+from blip import Board
+from examples.simple.blinky import Blinky
+from examples.pll.triple_blinky import TripleBlinky
+import numpy as np
+import pytest
+
+def test_sample_blinky():
+    board: Board = Board.load("mini3s", sim=True)
+    config = Blinky.Config(counter_bits=4)
+    t_ck = 1.0 / board.spec.clk_freq
+
+    sim = board.simulate(Blinky(board, config))
+    sim.add_clock(t_ck)
+    led = board.get_led(config.led_index)
+    sampler = sim.add_sampler({ "led": led.o }, capacity=1000)
+    sim.run_until(t_ck * 100)
+
+    n = np.arange(sampler.count)
+    assert sampler.count == 100
+    assert np.array_equal(sampler.data["led"], (n >> (config.counter_bits - 1)) & 1)
+    assert np.all(np.diff(sampler.times) == round(t_ck * 1e15))
+
+def test_sample_chunks():
+    board: Board = Board.load("mini3s", sim=True)
+    config = TripleBlinky.Config(desync_bits=4)
+    t_ck = 1.0 / board.spec.clk_freq
+
+    sim = board.simulate(TripleBlinky(board, config))
+    sim.add_clock(t_ck)
+
+    chunks = []
+    sampler = sim.add_sampler({ "led": board.get_led(5).o }, domain="b", capacity=16,
+        on_chunk=lambda times, data: chunks.append(data["led"].copy()))
+    sim.run_until(t_ck * 100)
+    sampler.flush()
+
+    # 20 MHz domain `b` for 4 us
+    led = np.concatenate(chunks)
+    n = np.arange(len(led))
+    assert len(led) == 80
+    assert np.array_equal(led, (n >> (config.desync_bits - 1)) & 1)
+
+def test_sample_detach():
+    board: Board = Board.load("mini3s", sim=True)
+    config = Blinky.Config(counter_bits=4)
+    t_ck = 1.0 / board.spec.clk_freq
+
+    sim = board.simulate(Blinky(board, config))
+    sim.add_clock(t_ck)
+    sampler = sim.add_sampler({ "led": board.get_led(config.led_index).o })
+    sim.run_until(t_ck * 10)
+    sampler.detach()
+    sim.run_until(t_ck * 20)
+    assert sampler.count == 10
+
+    # Sampling runs as a process, which can't be added once started
+    with pytest.raises(RuntimeError):
+        sim.add_sampler({ "led": board.get_led(config.led_index).o })
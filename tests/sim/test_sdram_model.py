@@ -0,0 +1,178 @@
+from amaranth import *
+from amaranth.lib import wiring
+from amaranth.sim import Simulator
+from blip import Board
+from blip.component import ComponentSpec
+from blip.component.sdram import SdramSpec
+from blip.component.sdram.controller import SdramBusSignature, SdramController
+from blip.sim.sdram import SdramModel, SdramTimingError
+import pytest
+import random
+
+class SdramTop(Elaboratable):
+    def __init__(self, board: Board, **kwargs):
+        self.sdram = board.get_sdram()
+        self.ctrl = SdramController(self.sdram.model.spec, board.spec.clk_freq, init_wait=1000, **kwargs)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.ctrl = self.ctrl
+        m.submodules.sdram = self.sdram
+        wiring.connect(m, self.ctrl.bus, self.sdram.bus)
+        return m
+
+def simulate(top: SdramTop, board: Board, requests, idle_cycles=0):
+    """Issue `(write, addr, words)` requests, returns the read bursts in request order"""
+
+    ctrl = top.ctrl
+    data_bits = ctrl.spec.data_bits
+    reads = { }
+    sim = board.simulate(top)
+    sim.add_clock(1 / board.spec.clk_freq)
+
+    async def monitor(ctx):
+        bursts = { }
+        async for _, _, rvalid, rlast, rtag, rdata in ctx.tick().sample(
+                ctrl.o_rvalid, ctrl.o_rlast, ctrl.o_rtag, ctrl.o_rdata):
+            if rvalid:
+                bursts.setdefault(rtag, []).append(rdata)
+                if rlast:
+                    reads[rtag] = bursts.pop(rtag)
+
+    async def testbench(ctx):
+        while not ctx.get(ctrl.o_init_done):
+            await ctx.tick()
+        if idle_cycles:
+            await ctx.tick().repeat(idle_cycles)
+        for tag, (write, addr, words) in enumerate(requests):
+            ctx.set(ctrl.i_valid, 1)
+            ctx.set(ctrl.i_tag, tag)
+            ctx.set(ctrl.i_write, write)
+            ctx.set(ctrl.i_addr, addr)
+            ctx.set(ctrl.i_wdata, sum(w << (k * data_bits) for k, w in enumerate(words)))
+            while not ctx.get(ctrl.o_ready):
+                await ctx.tick()
+            await ctx.tick()
+        ctx.set(ctrl.i_valid, 0)
+        while len(reads) < sum(not write for write, _, _ in requests):
+            await ctx.tick()
+
+    sim.add_testbench(monitor, background=True)
+    sim.add_testbench(testbench)
+    sim.run()
+    return [burst for _, burst in sorted(reads.items())]
+
+def test_sdram_model_data():
+    board = Board.load("mini3s", sim=True)
+    top = SdramTop(board, burst_length=4, tag_bits=8)
+    model = top.sdram.model
+    model.reset()
+    model.write(0x40, [1, 2, 3, 4])
+
+    rng = random.Random(0)
+    spec = model.spec
+    addr_bits = spec.row_bits + spec.bank_bits + spec.col_bits
+    ref = { }
+    requests = []
+    for _ in range(40):
+        addr = rng.getrandbits(addr_bits) & ~3 & ~0x40
+        words = [rng.getrandbits(16) for _ in range(4)]
+        ref[addr] = words
+        requests.append((True, addr, words))
+    addrs = list(ref) + [0x40]
+    ref[0x40] = [1, 2, 3, 4]
+    requests += [(False, addr, []) for addr in addrs]
+
+    reads = simulate(top, board, requests)
+    assert reads == [ref[addr] for addr in addrs]
+    for addr, words in ref.items():
+        assert list(model.read(addr, 4)) == words
+    assert not model.violations
+    assert model.cl == top.ctrl.cycles.cl
+    assert model.commands["AUTO REFRESH"] >= 8
+
+def test_sdram_model_idle():
+    board = Board.load("mini3s", sim=True)
+    top = SdramTop(board, tag_bits=8)
+    idle = 20_000
+    simulate(top, board, [(False, 0, [])], idle_cycles=idle)
+    model = top.sdram.model
+    # Only refreshes wake the model up while the bus is idle
+    refreshes = model.commands["AUTO REFRESH"]
+    assert refreshes >= 8 + idle // top.ctrl.refresh_interval
+    assert model.wake_ups < 100 + 10 * refreshes
+
+class CommandPlayer(wiring.Component):
+    """Drives `(ras, cas, we, ba, a)` commands on consecutive cycles, `None` for NOP"""
+
+    def __init__(self, spec: SdramSpec, commands):
+        super().__init__({ "bus": wiring.Out(SdramBusSignature(spec)), "o_done": wiring.Out(1) })
+        self.commands = commands
+
+    def elaborate(self, platform):
+        m = Module()
+        bus = self.bus
+        step = Signal(range(len(self.commands) + 1))
+        with m.Switch(step):
+            for i, command in enumerate(self.commands):
+                with m.Case(i):
+                    m.d.sync += step.eq(i + 1)
+                    if command is not None:
+                        ras, cas, we, ba, a = command
+                        m.d.sync += [bus.cs.eq(1), bus.ras.eq(ras), bus.cas.eq(cas), bus.we.eq(we),
+                            bus.ba.eq(ba), bus.a.eq(a)]
+                    else:
+                        m.d.sync += bus.cs.eq(0)
+            with m.Default():
+                m.d.sync += bus.cs.eq(0)
+                m.d.comb += self.o_done.eq(1)
+        return m
+
+def run_commands(spec: SdramSpec, commands, period=10e-9, **kwargs):
+    player = CommandPlayer(spec, commands)
+    model = SdramModel(spec, player.bus, **kwargs)
+    sim = Simulator(player)
+    sim.add_clock(period)
+    model.attach(sim)
+
+    async def testbench(ctx):
+        while not ctx.get(player.o_done):
+            await ctx.tick()
+        await ctx.tick().repeat(4)
+
+    sim.add_testbench(testbench)
+    sim.run()
+    return model
+
+def test_sdram_model_timing_violation():
+    spec: SdramSpec = ComponentSpec.load("sdram/sim/mini_issi")
+    mode = (1, 1, 1, 0, 2 | 2 << 4)
+    active = (1, 0, 0, 0, 3)
+    read = (0, 1, 0, 0, 0)
+    ok = [mode, None, active, None, read, None, None, None]
+    model = run_commands(spec, ok)
+    assert not model.violations
+
+    # READ one cycle after ACTIVE is within tRCD
+    early = [mode, None, active, read, None, None, None]
+    with pytest.raises(SdramTimingError, match="t_rcd"):
+        run_commands(spec, early)
+
+    model = run_commands(spec, early, strict=False)
+    assert [v.timing for v in model.violations] == ["t_rcd"]
+    assert model.violations[0].bank == 0
+
+def test_sdram_model_sparse():
+    spec: SdramSpec = ComponentSpec.load("sdram/vendor/w9825g6kh-6")
+    model = SdramModel(spec, None)
+    last = (1 << (spec.row_bits + spec.bank_bits + spec.col_bits)) - 4
+    model.write(last, [5, 6, 7, 8])
+    model.write(0, [1])
+    assert list(model.read(last, 4)) == [5, 6, 7, 8]
+    assert list(model.read(1 << spec.col_bits, 2)) == [0, 0]
+    assert len(model.pages) == 2
+
+def test_missing_sdram():
+    board = Board.load("mini3s", sim=True)
+    with pytest.raises(LookupError, match="Mini3S"):
+        board.get_sdram("sdram1")
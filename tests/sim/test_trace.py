@@ -0,0 +1,50 @@
+import blip.sim.engine
+import pytest
+from blip import Board
+from blip.sim import TraceOptions
+from examples.simple.blinky import Blinky
+
+def simulate_blinky(trace: TraceOptions):
+    board: Board = Board.load("mini3s", sim=True)
+    config = Blinky.Config(counter_bits=4)
+    t_ck = 1.0 / board.spec.clk_freq
+
+    sim = board.simulate(Blinky(board, config), trace=trace)
+    sim.add_clock(t_ck)
+    with sim.trace():
+        sim.run_until(t_ck * 100)
+    return t_ck
+
+def vcd_vars(path):
+    with open(path) as f:
+        return [line.split()[4] for line in f if line.startswith("$var")]
+
+def test_trace_filter(tmp_path):
+    path = str(tmp_path / "blinky.vcd")
+    simulate_blinky(TraceOptions(path, include=["*led*", "*counter"]))
+    assert sorted(vcd_vars(path)) == ["counter", "led0__o"]
+
+    simulate_blinky(TraceOptions(path, exclude=["*counter"]))
+    assert "counter" not in vcd_vars(path)
+    assert "led0__o" in vcd_vars(path)
+
+def test_trace_window(tmp_path):
+    path = str(tmp_path / "blinky.vcd")
+    t_ck = simulate_blinky(TraceOptions(path, start=20e-6 / 25, stop=60e-6 / 25))
+    with open(path) as f:
+        times = [int(line[1:]) for line in f if line.startswith("#")]
+    assert min(times) == round(20 * t_ck * 1e15)
+    assert max(times) <= round(61 * t_ck * 1e15)
+
+def test_no_trace(tmp_path):
+    path = tmp_path / "blinky.vcd"
+    simulate_blinky(TraceOptions(str(path), enabled=False))
+    assert not path.exists()
+
+def test_untested_amaranth(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.sim.engine, "amaranth_version", (0, 6))
+    monkeypatch.setattr(blip.sim.engine.check_engine, "warned", False, raising=False)
+    path = str(tmp_path / "blinky.vcd")
+    with pytest.warns(RuntimeWarning, match="untested"):
+        simulate_blinky(TraceOptions(path))
+    assert "led0__o" in vcd_vars(path)
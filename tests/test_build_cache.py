@@ -0,0 +1,56 @@
+from amaranth.build.run import BuildPlan
+from blip.build import BuildCache
+import blip.cache
+import os
+
+def make_plan(source: str):
+    plan = BuildPlan("build_top")
+    plan.add_file("top.v", source)
+    plan.add_file("build_top.sh", "cat top.v > top.bit\necho run >> runs.txt\n")
+    return plan
+
+def test_hit_restores_products(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path / "cache"))
+    cache = BuildCache()
+
+    build_dir = str(tmp_path / "a")
+    products = cache.execute(make_plan("module a;"), build_dir)
+    assert products.get("top.bit", "t") == "module a;"
+    assert cache.stats.misses == 1
+
+    # Same plan in a fresh directory is restored without running the script
+    build_dir = str(tmp_path / "b")
+    products = cache.execute(make_plan("module a;"), build_dir)
+    assert products.get("top.bit", "t") == "module a;"
+    assert products.get("runs.txt", "t") == "run\n"
+    assert cache.stats.disk_hits == 1
+
+    # Different sources or extra key miss
+    cache.execute(make_plan("module b;"), build_dir)
+    cache.execute(make_plan("module a;"), build_dir, extra="other board")
+    assert cache.stats.misses == 3
+
+def test_only_products_are_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path / "cache"))
+    cache = BuildCache()
+
+    build_dir = tmp_path / "a"
+    build_dir.mkdir()
+    (build_dir / "stale.txt").write_text("stale")
+    cache.execute(make_plan("module a;"), str(build_dir))
+
+    (_, _, path), = cache.entries()
+    assert sorted(os.listdir(path)) == ["manifest.json", "runs.txt", "top.bit"]
+
+def test_eviction_by_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path / "cache"))
+    cache = BuildCache(max_bytes=64)
+
+    for n in range(8):
+        build_dir = str(tmp_path / f"build{n}")
+        cache.execute(make_plan(f"module m{n}; // {'x' * 16}"), build_dir)
+    assert sum(size for _, size, _ in cache.entries()) <= 64
+
+    # Most recent build is kept
+    cache.execute(make_plan(f"module m7; // {'x' * 16}"), str(tmp_path / "again"))
+    assert cache.stats.disk_hits == 1
@@ -0,0 +1,43 @@
+from blip.cache import Cache
+import blip.cache
+
+def test_memory_and_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path))
+    calls = []
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    cache = Cache("test", 1)
+    assert cache.get(("a", 1.0), compute) == [1, 2, 3]
+    assert cache.get(("a", 1.0), compute) == [1, 2, 3]
+    assert len(calls) == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.memory_hits == 1
+
+    # Fresh process-level cache should hit the disk
+    cache = Cache("test", 1)
+    assert cache.get(("a", 1.0), compute) == [1, 2, 3]
+    assert len(calls) == 1
+    assert cache.stats.disk_hits == 1
+    assert cache.stats.hit_rate == 1.0
+
+    # Changing the version invalidates entries
+    cache = Cache("test", 2)
+    cache.get(("a", 1.0), compute)
+    assert len(calls) == 2
+
+def test_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(blip.cache, "cache_root", str(tmp_path))
+    cache = Cache("test", 1, max_memory=2, max_disk=3)
+    for n in range(10):
+        cache.get(n, lambda: n)
+    assert len(cache.memory) == 2
+    assert len(list((tmp_path / "test").glob("*.pickle"))) == 3
+
+def test_cache_dir_from_environment(tmp_path, monkeypatch):
+    # The environment is read when the cache is used, not when imported
+    monkeypatch.setenv("BLIP_CACHE_DIR", str(tmp_path))
+    cache = Cache("test", 1)
+    cache.get("a", lambda: 1)
+    assert len(list((tmp_path / "test").glob("*.pickle"))) == 1
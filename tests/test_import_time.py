@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+heavy_modules = ["amaranth", "numpy", "blip.sim", "blip.board.ulx3s", "blip.component.sdram", "importlib.metadata"]
+
+def import_profile(statement: str):
+    """Run `statement` in a fresh interpreter, returns `(total_us, loaded_heavy_modules)`"""
+
+    script = f"""
+import sys
+{statement}
+print(",".join(m for m in {heavy_modules!r} if m in sys.modules))
+"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True, text=True, check=True)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "blip":
+            total_us = int(parts[1])
+    return total_us, [m for m in result.stdout.strip().split(",") if m]
+
+def test_import_blip(record_property):
+    total_us, loaded = import_profile("import blip")
+    record_property("import_blip_us", total_us)
+    assert loaded == []
+
+def test_board_load_imports_only_used_modules():
+    _, loaded = import_profile("""
+from blip.board import Board
+board = Board.load("mini3s", sim=True)
+""")
+    assert "blip.component.sdram" in loaded
+    assert "blip.board.ulx3s" not in loaded
@@ -0,0 +1,131 @@
+from amaranth import *
+from amaranth.build import Resource, Pins, Clock
+from amaranth.vendor import LatticeECP5Platform
+from blip import Board
+from blip.arch.ecp5 import Ecp5Arch
+from blip.arch.pll import PllClock
+from blip.timing import TimingDatabase, parse_nextpnr_log, match_clocks, constraint_name
+import blip.build
+import blip.timing
+import pytest
+
+MHz = 1e6
+
+nextpnr_log = """
+Info: Max frequency for clock '$glbnet$pll.o_clk__0': 95.12 MHz (FAIL at 100.00 MHz)
+Info: Max frequency for clock '$glbnet$clk25_0__io$TRELLIS_IO_IN': 180.31 MHz (PASS at 25.00 MHz)
+Info: Max frequency for clock '$glbnet$pll.pll1.o_clk__1': 201.00 MHz (PASS at 50.00 MHz)
+Info: Max delay <async> -> posedge $glbnet$pll.o_clk__0: 2.15 ns
+Info: Routing complete.
+Info: Max frequency for clock '$glbnet$pll.o_clk__0': 104.50 MHz (PASS at 100.00 MHz)
+Info: Max frequency for clock '$glbnet$clk25_0__io$TRELLIS_IO_IN': 170.07 MHz (PASS at 25.00 MHz)
+Info: Max frequency for clock '$glbnet$pll.pll1.o_clk__1': 198.00 MHz (PASS at 50.00 MHz)
+"""
+
+class Ecp5TestPlatform(LatticeECP5Platform):
+    device = "LFE5U-85F"
+    package = "BG381"
+    speed = "6"
+    default_clk = "clk25"
+    resources = [Resource("clk25", 0, Pins("G2", dir="i"), Clock(25e6))]
+    connectors = []
+
+class PllTop(Elaboratable):
+    def __init__(self, arch: Ecp5Arch, clkos: list[PllClock]):
+        self.arch = arch
+        self.clkos = clkos
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.pll = pll = self.arch.create_pll(25e6, self.clkos)
+        m.d.comb += pll.i_clk.eq(ClockSignal())
+        for n, o_clk in enumerate(pll.o_clk):
+            m.domains += ClockDomain(f"d{n}")
+            m.d.comb += ClockSignal(f"d{n}").eq(o_clk)
+            counter = Signal(8, name=f"counter{n}")
+            m.d[f"d{n}"] += counter.eq(counter + 1)
+        return m
+
+def test_parse_nextpnr_log():
+    timings = parse_nextpnr_log(nextpnr_log)
+    # Only the last report of every clock is kept
+    assert [t.name for t in timings] == [
+        "$glbnet$pll.o_clk__0", "$glbnet$clk25_0__io$TRELLIS_IO_IN", "$glbnet$pll.pll1.o_clk__1",
+    ]
+    pll, clk, _ = timings
+    assert pll.fmax == pytest.approx(104.5 * MHz)
+    assert pll.target == pytest.approx(100 * MHz)
+    assert pll.slack == pytest.approx(10e-9 - 1 / (104.5 * MHz))
+    assert pll.passed
+    assert clk.fmax == pytest.approx(170.07 * MHz)
+
+    failed, = parse_nextpnr_log(nextpnr_log.split("Routing complete")[0])[:1]
+    assert not failed.passed
+    assert failed.slack < 0
+
+def test_match_clocks(monkeypatch):
+    arch = Ecp5Arch()
+    clkos = [PllClock(100 * MHz), PllClock(50 * MHz)]
+    platform = Ecp5TestPlatform()
+    plan = platform.prepare(PllTop(arch, clkos), "top")
+
+    # Names match the nets constrained in the LPF file
+    lpf = plan.files["top.lpf"]
+    for pll in arch.plls:
+        for clock, signal in pll.clock_outputs():
+            assert f'FREQUENCY NET "{constraint_name(platform, signal)}" {clock.frequency} HZ' in lpf
+
+    timings = parse_nextpnr_log(nextpnr_log)
+    match_clocks(timings, platform, arch.plls)
+    # By name, not at all for the input clock and by frequency if renamed
+    assert [t.clock for t in timings] == [clkos[0], None, clkos[1]]
+
+    # Only by frequency without the names
+    monkeypatch.setattr(blip.timing, "constraint_name", lambda platform, signal: None)
+    timings = parse_nextpnr_log(nextpnr_log)
+    match_clocks(timings, platform, arch.plls)
+    assert [t.clock for t in timings] == [clkos[0], None, clkos[1]]
+
+class Ecp5TestBoard(Board):
+    def __init__(self):
+        self.arch = Ecp5Arch()
+        self.platform = None
+        self.spec = None
+
+    def get_led(self, index: int):
+        raise LookupError
+
+def test_build_plls(monkeypatch):
+    # Without running the toolchain
+    monkeypatch.setattr(blip.build, "build", lambda platform, m, *, build_dir, **kwargs: platform.prepare(m, "top"))
+    board = Ecp5TestBoard()
+    clkos = [PllClock(100 * MHz), PllClock(50 * MHz)]
+    for _ in range(2):
+        # Platforms can only be prepared once
+        board.platform = Ecp5TestPlatform()
+        board.build(PllTop(board.arch, clkos), build_dir="build")
+    # Only the PLLs of the last build are matched to timings
+    assert len(board.arch.plls) == 1
+
+def test_timing_database(tmp_path):
+    db = TimingDatabase(str(tmp_path / "timing.sqlite"))
+    key = ("blinky", "{}", "ulx3s")
+    base = parse_nextpnr_log(nextpnr_log)
+    db.record(*key, "a", base)
+    assert db.regressions(*key, "a", base, 0.05) == []
+
+    slower = parse_nextpnr_log(nextpnr_log.replace("104.50 MHz", "90.00 MHz").replace("198.00 MHz", "195.00 MHz"))
+    regression, = db.regressions(*key, "b", slower, 0.05)
+    assert regression.name == "$glbnet$pll.o_clk__0"
+    assert regression.commit == "a"
+    assert regression.change == pytest.approx(90 / 104.5 - 1)
+
+    # Rebuilding a commit replaces its results, the baseline is the previous commit
+    db.record(*key, "b", slower)
+    db.record(*key, "b", slower)
+    assert len(db.regressions(*key, "b", slower, 0.05)) == 1
+    assert db.regressions(*key, "c", slower, 0.05) == []
+
+    # Other configs are tracked separately
+    assert db.baseline("blinky", '{"bits": 4}', "ulx3s", "c") == { }
+    db.close()